@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+'''
+bench_parser.py
+
+Measures the per-paste time and peak memory of PastebinPasteListParser.
+
+Usage: python benchmarks/bench_parser.py
+'''
+
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pastebin import PastebinPasteListParser
+
+
+PASTE_XML = (
+    '<paste>\r\n'
+    '<paste_key>{key}</paste_key>\r\n'
+    '<paste_date>1338651990</paste_date>\r\n'
+    '<paste_title>build log {key}</paste_title>\r\n'
+    '<paste_size>{size}</paste_size>\r\n'
+    '<paste_expire_date>0</paste_expire_date>\r\n'
+    '<paste_private>0</paste_private>\r\n'
+    '<paste_format_long>None</paste_format_long>\r\n'
+    '<paste_format_short>text</paste_format_short>\r\n'
+    '<paste_url>https://pastebin.com/{key}</paste_url>\r\n'
+    '<paste_hits>{size}</paste_hits>\r\n'
+    '</paste>\r\n'
+)
+
+
+def paste_list(count):
+    return ''.join(PASTE_XML.format(key='k{:07d}'.format(i), size=i)
+                   for i in range(count))
+
+
+def per_paste_cost(count, repeat=5):
+    '''
+    returns:
+        the best time to parse one paste out of a list of count
+        pastes, in microseconds (float)
+    '''
+    data = paste_list(count)
+    number = max(1, 2000 // count)
+    timer = timeit.Timer(lambda: PastebinPasteListParser().get_pastes(data))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number / count * 1e6
+
+
+def per_paste_peak(count):
+    '''
+    returns:
+        the peak memory allocated while parsing a list of count
+        pastes, divided by count, in bytes (int)
+    '''
+    data = paste_list(count)
+    tracemalloc.start()
+    try:
+        PastebinPasteListParser().get_pastes(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak // count
+
+
+def main():
+    for count in (10, 100, 1000):
+        print('{:>5} pastes: {:8.2f} us/paste {:>6} B/paste peak'.format(
+            count, per_paste_cost(count), per_paste_peak(count)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+'''
+bench_suite.py
+
+Measures the hot paths of the Pastebin API wrapper offline and writes
+the results as JSON, so runs on different versions can be compared:
+
+    payload encoding in Pastebin.create_paste
+    latency and throughput of Pastebin._request against a local
+    FakePastebinServer
+    parse cost of PastebinPasteListParser and PastebinUserParser at
+    10, 100 and 1000 pastes
+
+Usage: python benchmarks/bench_suite.py [--quick] [--output FILE]
+                                        [--compare OLD.json]
+'''
+
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pastebin import (MemoryTransport, Pastebin, PastebinPasteListParser,
+                      PastebinUserParser)
+from pastebin.testing import FakePastebinAPI, FakePastebinServer
+
+from bench_parser import paste_list
+
+
+USER_XML = (
+    '<user>\r\n'
+    '<user_name>wiz_kitty</user_name>\r\n'
+    '<user_format_short>text</user_format_short>\r\n'
+    '<user_expiration>N</user_expiration>\r\n'
+    '<user_avatar_url>https://pastebin.com/i/guest.png</user_avatar_url>\r\n'
+    '<user_private>1</user_private>\r\n'
+    '<user_website>https://example.com</user_website>\r\n'
+    '<user_email>wiz@example.com</user_email>\r\n'
+    '<user_location>Location</user_location>\r\n'
+    '<user_account_type>1</user_account_type>\r\n'
+    '</user>'
+)
+PARSE_COUNTS = (10, 100, 1000)
+PASTE_SIZES = (1024, 64 * 1024, 1024 * 1024)
+
+
+def best_of(func, number, repeat):
+    '''
+    returns:
+        the best time of one call to func, in seconds (float)
+    '''
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def bench_encoding(repeat):
+    results = {}
+    # answers every request at once, so only create_paste is timed
+    transport = MemoryTransport(lambda *request: (200, {}, b''))
+    with Pastebin('dev', transport=transport) as pastebin:
+        for size in PASTE_SIZES:
+            paste_code = b'x = "caf\xc3\xa9 & co"\n' * (size // 20)
+            number = max(1, (4 * 1024 * 1024) // size)
+            seconds = best_of(
+                lambda: pastebin.create_paste(paste_code,
+                                              paste_name=b'bench',
+                                              paste_format=b'python'),
+                number, repeat)
+            results[str(size)] = {
+                'us_per_call' : seconds * 1e6,
+                'mb_per_s' : len(paste_code) / seconds / 1e6,
+            }
+    return results
+
+
+def bench_requests(requests, threads):
+    api = FakePastebinAPI()
+    api.add_paste('x' * 100, hits=1)
+    results = {}
+    with FakePastebinServer(api) as server:
+        with Pastebin(api.dev_key, base_url=server.url) as pastebin:
+            url = server.url + '/api/api_post.php'
+            data = {'api_dev_key' : api.dev_key, 'api_option' : 'trends'}
+
+            def send():
+                pastebin._request(url, data=data).read()
+
+            send()
+            samples = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                send()
+                samples.append(time.perf_counter() - start)
+            results['latency_ms'] = {
+                'p50' : percentile(samples, 0.5) * 1e3,
+                'p90' : percentile(samples, 0.9) * 1e3,
+                'p99' : percentile(samples, 0.99) * 1e3,
+            }
+
+            def worker():
+                for _ in range(requests // threads):
+                    send()
+
+            workers = [threading.Thread(target=worker)
+                       for _ in range(threads)]
+            start = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            results['throughput_rps'] = {
+                str(threads) : (requests // threads) * threads / elapsed
+            }
+    return results
+
+
+def bench_parsing(repeat):
+    results = {'paste_list' : {}, 'user' : {}}
+    for count in PARSE_COUNTS:
+        data = paste_list(count)
+        number = max(1, 2000 // count)
+        seconds = best_of(lambda: PastebinPasteListParser().get_pastes(data),
+                          number, repeat)
+        results['paste_list'][str(count)] = {
+            'us_per_paste' : seconds / count * 1e6,
+        }
+        # one user document per paste, as a client polling count
+        # accounts would parse them
+        seconds = best_of(
+            lambda: [PastebinUserParser().get_user_information(USER_XML)
+                     for _ in range(count)],
+            max(1, number // 10), repeat)
+        results['user'][str(count)] = {
+            'us_per_user' : seconds / count * 1e6,
+        }
+    return results
+
+
+def run(quick=False):
+    repeat = 2 if quick else 5
+    return {
+        'meta' : {
+            'python' : platform.python_version(),
+            'implementation' : platform.python_implementation(),
+            'platform' : platform.platform(),
+            'time' : time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'encoding' : bench_encoding(repeat),
+        'request' : bench_requests(100 if quick else 1000, threads=8),
+        'parsing' : bench_parsing(repeat),
+    }
+
+
+def _flatten(results, prefix=''):
+    for name, value in results.items():
+        if isinstance(value, dict):
+            for item in _flatten(value, prefix + name + '.'):
+                yield item
+        elif isinstance(value, (int, float)):
+            yield prefix + name, value
+
+
+def compare(old, new):
+    '''
+    Print every metric of new next to the same metric of old.
+    '''
+    old_values = dict(_flatten(old))
+    for name, value in _flatten(new):
+        if name in old_values and old_values[name]:
+            print('{:<45} {:>12.2f} {:>12.2f} {:>7.2f}x'.format(
+                name, old_values[name], value, value / old_values[name]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer repetitions, for smoke runs')
+    parser.add_argument('--output', help='write the JSON results here')
+    parser.add_argument('--compare', metavar='OLD',
+                        help='print the change against an earlier run')
+    args = parser.parse_args()
+    results = run(quick=args.quick)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+    if args.compare:
+        with open(args.compare) as old:
+            compare(json.load(old), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,12 +7,118 @@ Pastebin API wrapper using urllib
 '''
 
 
+import codecs
+import time
+import weakref
 from collections import OrderedDict
+from datetime import datetime, timezone
+from enum import IntEnum
 from html.parser import HTMLParser
 from http.client import HTTPException
-from urllib.request import urlopen
 from urllib.parse import urlencode
 
+from .batch import BatchResult, DeleteSummary, run_batch
+from .cache import ResponseCache
+from .compression import ACCEPT_ENCODING, decode_response
+from .dedupe import PasteDedupe, expires_at, paste_digest
+from .exceptions import PastebinHTTPError
+from .hooks import InstrumentedResponse, RequestEvent
+from .metrics import MetricsRegistry
+from .pool import ConnectionPool, PooledResponse
+from .ratelimit import RateLimiter, TokenBucket
+from .rawcache import RawCache
+from .retry import RetryPolicy
+from .search import SearchHit, SearchIndex
+from .session import FileSessionStore, MemorySessionStore, SessionStore
+from .transport import (MemoryResponse, MemoryTransport, Transport,
+                        UrllibTransport)
+from .upload import FormBody, UploadSource, is_streamable
+
+
+PASTEBIN_URL = 'https://pastebin.com'
+USER_AGENT = 'pastebin-api/0.0'
+STREAM_CHUNK_SIZE = 8192
+
+
+def _encode(data):
+    if any(isinstance(value, UploadSource) for value in data.values()):
+        return FormBody(data)
+    return bytes(urlencode(data), encoding='utf-8')
+
+
+_PASTE_FIELDS = frozenset([
+    'paste_key', 'paste_date', 'paste_title', 'paste_size',
+    'paste_expire_date', 'paste_private', 'paste_format_long',
+    'paste_format_short', 'paste_url', 'paste_hits'
+])
+
+
+def _api_option(data):
+    '''
+    The api_option of a request as a str; login requests have none.
+    '''
+    option = data.get('api_option', b'login')
+    if isinstance(option, bytes):
+        option = option.decode(encoding='utf-8')
+    return option
+
+
+def _parse_paste_list(data):
+    '''
+    Parse a list_pastes body, telling an empty account apart from an
+    error so that neither empties a mirror.
+    '''
+    if data.startswith(_BAD_REQUEST.decode(encoding='utf-8')):
+        raise HTTPException(data)
+    if data.startswith('No pastes found'):
+        return []
+    return PastebinPasteListParser().get_pastes(data)
+
+
+def _index_batch(index, results):
+    '''
+    Add the contents fetched by Pastebin.index_pastes to the index,
+    replacing each content in its BatchResult by whether it was added.
+    '''
+    fetched = [result for result in results
+               if result.ok and result.value is not None]
+    try:
+        added = index.add_many(
+            [(getattr(result.item, 'paste_key', result.item), result.value)
+             for result in fetched])
+    except Exception as error:
+        for result in fetched:
+            result.value, result.error = None, error
+    else:
+        for result, value in zip(fetched, added):
+            result.value = value
+    for result in results:
+        if result.ok and result.value is None:
+            result.value = False
+    return results
+
+
+_INVALID_USER_KEY = b'Bad API request, invalid api_user_key'
+_BAD_REQUEST = b'Bad API request'
+
+
+def _rejects_user_key(response):
+    '''
+    Look at the start of a response body, without consuming it, for
+    Pastebin's answer to an expired or unknown user key.
+    '''
+    return response.peek(len(_INVALID_USER_KEY)).startswith(_INVALID_USER_KEY)
+
+
+def _api_keys(data):
+    '''
+    The developer key and, if present, the user key of a request.
+    '''
+    keys = [data['api_dev_key']]
+    if data.get('api_user_key'):
+        keys.append(data['api_user_key'])
+    return keys
+
 
 class Pastebin:
     '''
@@ -21,24 +127,114 @@ class Pastebin:
     attributes:
         api_key (bytes)
         user_key (bytes)
+        transport (Transport): sends every request made through this
+                               instance; defaults to a ConnectionPool,
+                               which uses the proxies of the
+                               environment as urlopen does
+        rate_limiter (RateLimiter): throttles requests before they are
+                                    sent, None to send immediately
+        retry_policy (RetryPolicy): decides which failed requests are
+                                    tried again
+        trending_cache (ResponseCache): if set, parsed trending pastes
+                                        are cached per developer key
+        user_cache (ResponseCache): if set, parsed user information is
+                                    cached per user key
+        session_store (SessionStore): if set, login shares user keys
+                                      through it
+        base_url (str): where the API lives, default is PASTEBIN_URL
+        metrics (MetricsRegistry): if set, every request is counted
+                                   and timed in it
+        raw_cache (RawCache): if set, fetch_raw and iter_raw serve paste
+                              contents from it and store what they
+                              download
+        dedupe (PasteDedupe): if set, create_paste returns the url of
+                              an identical live paste instead of
+                              creating another
 
     methods:
+        close
+        add_hook
+        remove_hook
         login
         create_paste
         create_logged_in_paste
+        create_pastes
         list_pastes
+        sync_account
         list_trending_pastes
+        iter_raw
+        fetch_raw
+        index_pastes
         delete_paste
+        delete_pastes
         get_user_information
+        invalidate_user_information
     '''
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, transport=None, rate_limiter=None,
+                 retry_policy=None, trending_cache=None, user_cache=None,
+                 session_store=None, base_url=PASTEBIN_URL, metrics=None,
+                 raw_cache=None, dedupe=None):
         self.api_key = bytes(api_key, encoding='utf-8')
         self.user_key = None
+        self.base_url = base_url.rstrip('/')
+        self.transport = (transport if transport is not None
+                          else ConnectionPool())
+        self.rate_limiter = rate_limiter
+        self.retry_policy = (retry_policy if retry_policy is not None
+                             else RetryPolicy())
+        self.trending_cache = trending_cache
+        self.user_cache = user_cache
+        self.session_store = session_store
+        self.raw_cache = raw_cache
+        self.dedupe = dedupe
+        self._credentials = None
+        self._hooks = ()
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.attach(self)
 
     def __repr__(self):
         return 'Pastebin(%s)'.format(self.api_key)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        '''
+        Close the transport used by this instance.
+        '''
+        self.transport.close()
+
+    def add_hook(self, hook):
+        '''
+        Call hook with a RequestEvent for every request sent from now
+        on. Hooks run on the thread that made the request, and an
+        exception raised by a hook propagates to that request.
+
+        args:
+            hook (callable): takes one RequestEvent
+        '''
+        self._hooks = self._hooks + (hook,)
+
+    def remove_hook(self, hook):
+        '''
+        Stop calling a hook added with add_hook.
+
+        raises:
+            ValueError if hook was not added
+        '''
+        hooks = list(self._hooks)
+        hooks.remove(hook)
+        self._hooks = tuple(hooks)
+
+    def _emit(self, event):
+        for hook in self._hooks:
+            hook(event)
+
     def _request(self, url, data=None, **kwargs):
         '''
         A custom request method for the Pastebin API wrapper.
@@ -47,41 +243,144 @@ class Pastebin:
             url (str)
 
         kwargs:
+            data (dict): the API fields to POST; a GET is sent if None
+            relogin (bool): if a session store is in use and Pastebin
+                            rejects the user key, login again and resend
+                            the request; default is True
+
+        Responses are asked for gzip or deflate and decompressed as
+        they are read.
 
         returns:
-            http.client.HTTPResponse object
+            the response of self.transport, wrapped in a
+            DecodedResponse if it is compressed and in an
+            InstrumentedResponse while hooks are registered
 
         raises:
-            http.client.HTTPException if the response code is not 200
+            PastebinHTTPError if the response code is not 200 once
+            self.retry_policy has given up
         '''
-        response = urlopen(url, data=data)
-        if response.status == 200:
-            return response
+        headers = {'User-Agent' : USER_AGENT,
+                   'Accept-Encoding' : ACCEPT_ENCODING}
+        if data is None:
+            # raw pastes are fetched with a GET, which carries no
+            # api_option of its own but counts against the developer key
+            method = 'GET'
+            api_option = 'raw'
+            api_keys = [self.api_key]
+            body = None
         else:
-            raise HTTPException
+            method = 'POST'
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            api_option = _api_option(data)
+            api_keys = _api_keys(data)
+            body = _encode(data)
+            if isinstance(body, FormBody):
+                # computed without encoding the body, which is streamed
+                headers['Content-Length'] = str(len(body))
+        instrument = bool(self._hooks)
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(api_option, *api_keys)
+            if instrument:
+                event = RequestEvent(url, api_option, attempt,
+                                     len(body) if body else 0)
+                start = time.perf_counter()
+            try:
+                response = self.transport.request(method, url, body=body,
+                                                  headers=headers)
+                if instrument:
+                    event.ttfb = time.perf_counter() - start
+                    event.status = response.status
+                    event.connect_time = getattr(response, 'connect_time',
+                                                 None)
+                if response.status == 200:
+                    break
+                response.close()
+                raise PastebinHTTPError(response.status, response.reason,
+                                        response.headers)
+            except Exception as error:
+                if instrument:
+                    event.error = error
+                    event.total_time = time.perf_counter() - start
+                    self._emit(event)
+                if not self.retry_policy.is_retryable(api_option, attempt,
+                                                      error):
+                    raise
+                time.sleep(self.retry_policy.backoff(attempt, error))
+        response = decode_response(response)
+        if instrument:
+            response = InstrumentedResponse(response, event, start,
+                                            self._emit)
+        if (self._credentials is not None and kwargs.get('relogin', True)
+                and data is not None and data.get('api_user_key')
+                and _rejects_user_key(response)):
+            response.read()
+            self._relogin(data['api_user_key'])
+            data = dict(data, api_user_key=self.user_key)
+            return self._request(url, data=data, relogin=False)
+        return response
+
+    def _login(self, user_name, user_password):
+        data = {
+            'api_dev_key' : self.api_key,
+            'api_user_name' : user_name,
+            'api_user_password' : user_password
+        }
+        response = self._request(self.base_url + '/api/api_login.php',
+                                 data=data)
+        return response.read()
+
+    def _set_user_key(self, user_key):
+        previous_key, self.user_key = self.user_key, user_key
+        if self.user_cache is not None:
+            # Pastebin may hand out the same key again, so both go
+            self.user_cache.invalidate(previous_key)
+            self.user_cache.invalidate(self.user_key)
+        return self.user_key
+
+    def _login_to_store(self, user_name, user_password):
+        user_key = self._login(user_name, user_password)
+        if user_key.startswith(b'Bad API request'):
+            # never share an error message as a user key
+            raise HTTPException(user_key.decode(encoding='utf-8'))
+        return user_key
+
+    def _relogin(self, rejected_key):
+        user_name, user_password = self._credentials
+        self.session_store.discard(user_name, rejected_key)
+        user_key = self.session_store.get_or_create(
+            user_name, lambda: self._login_to_store(user_name, user_password))
+        return self._set_user_key(user_key)
 
     def login(self, user_name, user_password):
         '''
         Use the Pastebin members system to login.
 
+        If self.session_store is set, a user_key stored for user_name
+        is reused without contacting Pastebin, and a new one is stored
+        for other clients. Should Pastebin later reject the stored key,
+        the next request logs in again and is sent once more.
+
         args:
             user_name (bytes): the user name to login to
             user_password (bytes): the user password to use to login
 
         returns:
            Pastebin API user key (bytes)
+
+        raises:
+            http.client.HTTPException if a session store is set and
+            Pastebin refuses the login
         '''
-        data = {
-            'api_dev_key' : self.api_key,
-            'api_user_name' : user_name,
-            'api_user_password' : user_password
-        }
-        data = urlencode(data)
-        data = bytes(data, encoding='utf-8')
-        response = self._request('https://pastebin.com/api/api_login.php',
-                                 data=data)
-        self.user_key = response.read()
-        return self.user_key
+        if self.session_store is None:
+            return self._set_user_key(self._login(user_name, user_password))
+        self._credentials = (user_name, user_password)
+        user_key = self.session_store.get_or_create(
+            user_name, lambda: self._login_to_store(user_name, user_password))
+        return self._set_user_key(user_key)
 
     def create_paste(self, paste_code, user_key=None, paste_name=None,
                      paste_format=None, paste_private=0,
@@ -89,8 +388,23 @@ class Pastebin:
         '''
         Create a new paste.
 
+        A paste_code given as a file object, an iterable of bytes or a
+        bytes-like object (bytes only from upload.STREAM_THRESHOLD up)
+        is percent-encoded and sent a chunk at a time with a precomputed
+        Content-Length, so memory use does not grow with its size.
+        Files are read from their current position.
+
+        If self.dedupe is set, a paste with the same code, name,
+        format, privacy, expiry option and user key that was created
+        before, and has not used up more of its lifetime than
+        self.dedupe allows, is returned instead, without a request;
+        the response then holds the url of that paste. The
+        body of a response to an upload is read, so that a new paste
+        can be recorded.
+
         args:
-            paste_code (bytes): the code to paste to Pastebin
+            paste_code (bytes): the code to paste to Pastebin; also a
+                                file, bytes-like object or iterable
 
         kwargs:
             user_key (bytes): call the login() method to receive a user
@@ -112,28 +426,65 @@ class Pastebin:
                     1Y = 1 year
 
         returns:
-            http.client.HTTPResponse object
+            the response of self.transport
         '''
-        data = {
-            'api_dev_key' : self.api_key,
-            'api_option' : b'paste',
-            'api_paste_code' : paste_code,
-        }
-        if user_key:
-            data['api_user_key'] = user_key
-        if paste_name:
-            data['api_paste_name'] = paste_name
-        if paste_format:
-            data['api_paste_format'] = paste_format
-        data['api_paste_private'] = paste_private
-        if paste_expire_date:
-            data['api_paste_expire_date'] = paste_expire_date
-        data = urlencode(data)
-        data = bytes(data, encoding='utf-8')
-        response = self._request('https://pastebin.com/api/api_post.php',
-                                 data=data)
+        source = None
+        if is_streamable(paste_code):
+            paste_code = source = UploadSource(paste_code)
+        try:
+            digest, expiry = self._dedupe_digest(
+                paste_code, user_key, paste_name, paste_format,
+                paste_private, paste_expire_date)
+            if digest is not None:
+                paste_url = self.dedupe.lookup(digest, expiry)
+                if paste_url is not None:
+                    return MemoryResponse(200, {}, bytes(paste_url,
+                                                         encoding='utf-8'))
+            data = {
+                'api_dev_key' : self.api_key,
+                'api_option' : b'paste',
+                'api_paste_code' : paste_code,
+            }
+            if user_key:
+                data['api_user_key'] = user_key
+            if paste_name:
+                data['api_paste_name'] = paste_name
+            if paste_format:
+                data['api_paste_format'] = paste_format
+            data['api_paste_private'] = paste_private
+            if paste_expire_date:
+                data['api_paste_expire_date'] = paste_expire_date
+            response = self._request(self.base_url + '/api/api_post.php',
+                                     data=data)
+        finally:
+            if source is not None:
+                source.close()
+        if digest is not None:
+            with response:
+                body = response.read()
+            if response.status == 200 and body.startswith(b'http'):
+                self.dedupe.record(digest, body, expiry)
+            response = MemoryResponse(response.status, {}, body)
         return response
 
+    def _dedupe_digest(self, paste_code, user_key, paste_name, paste_format,
+                       paste_private, paste_expire_date):
+        '''
+        The digest identifying a paste for self.dedupe and when it
+        would expire, or (None, None) if it cannot be deduplicated.
+        '''
+        if self.dedupe is None:
+            return None, None
+        try:
+            expiry = expires_at(paste_expire_date)
+        except KeyError:
+            # Pastebin will reject it, so there is nothing to record
+            return None, None
+        chunks = (paste_code.chunks() if isinstance(paste_code, UploadSource)
+                  else [paste_code])
+        return paste_digest(chunks, paste_name, paste_format, paste_private,
+                            user_key, paste_expire_date), expiry
+
     def create_logged_in_paste(self, paste_code, paste_name=None,
                                paste_format=None, paste_private=0,
                                paste_expire_date=None):
@@ -163,7 +514,7 @@ class Pastebin:
                     1Y = 1 year
 
         returns:
-            http.client.HTTPResponse object
+            the response of self.transport
 
         raises:
             AttributeError if self.user_key is not set
@@ -179,7 +530,85 @@ class Pastebin:
                                     )
         return response
 
-    def list_pastes(self, results_limit=5, parse=False):
+    def _create_batch_paste(self, item):
+        if isinstance(item, dict):
+            response = self.create_paste(**item)
+        else:
+            response = self.create_paste(item)
+        paste_url = response.read()
+        if paste_url.startswith(b'Bad API request'):
+            raise HTTPException(paste_url.decode(encoding='utf-8'))
+        return paste_url
+
+    def create_pastes(self, pastes, max_concurrency=4, ordered=False):
+        '''
+        Create many pastes concurrently over the transport.
+        A failed paste is reported in its result and does not abort
+        the rest of the batch.
+
+        args:
+            pastes (iterable): each item is either a paste_code or a
+                               dict of create_paste keyword arguments
+
+        kwargs:
+            max_concurrency (int): the number of requests in flight
+            ordered (bool): yield results in input order instead of
+                            in order of completion
+
+        returns:
+            a generator of BatchResult objects whose value is the new
+            paste url (bytes)
+        '''
+        return run_batch(self._create_batch_paste, pastes,
+                         max_concurrency=max_concurrency, ordered=ordered)
+
+    def _parse_response(self, response, parse):
+        '''
+        Read a response to the end and return parse(body), reporting
+        the time spent parsing to the hooks.
+        '''
+        if not isinstance(response, InstrumentedResponse):
+            return parse(response.read().decode(encoding='utf-8'))
+        response.defer = True
+        data = response.read().decode(encoding='utf-8')
+        start = time.perf_counter()
+        try:
+            return parse(data)
+        finally:
+            response.finish(time.perf_counter() - start)
+
+    def _stream_pastes(self, response):
+        pastes = self._iter_pastes(response)
+        # a generator dropped before its first iteration never runs its
+        # finally, and the response would hold its pooled connection
+        # for good
+        weakref.finalize(pastes, response.close)
+        return pastes
+
+    def _iter_pastes(self, response):
+        parser = PastebinPasteListParser()
+        instrument = isinstance(response, InstrumentedResponse)
+        if instrument:
+            response.defer = True
+        parse_time = 0.0
+        try:
+            while True:
+                chunk = response.read(STREAM_CHUNK_SIZE)
+                start = time.perf_counter()
+                pastes = (parser.feed_pastes(chunk) if chunk
+                          else parser.close_pastes())
+                parse_time += time.perf_counter() - start
+                for paste in pastes:
+                    yield paste
+                if not chunk:
+                    break
+        finally:
+            # releases the connection of a listing left unfinished
+            response.close()
+            if instrument:
+                response.finish(parse_time)
+
+    def list_pastes(self, results_limit=5, parse=False, stream=False):
         '''
         List all the pastes created by a user.
         Must call Pastebin.login first.
@@ -188,10 +617,14 @@ class Pastebin:
             results_limit (int): default is 5
             parse (bool): If this is true, a list of PastebinPastes
                           objects will be returned instead of the
-                          usual HTTPResponse
+                          usual response
+            stream (bool): If this and parse are true, a generator is
+                           returned that yields each PastebinPaste as
+                           soon as its element has been read from the
+                           socket
 
         returns:
-            http.client.HTTPResponse object
+            the response of self.transport
 
         raises:
             AttributeError if self.user_key is not set
@@ -205,44 +638,270 @@ class Pastebin:
             'api_results_limit' : results_limit,
             'api_option' : b'list'
         }
-        data = urlencode(data)
-        data = bytes(data, encoding='utf-8')
-        response = self._request('https://pastebin.com/api/api_post.php',
+        response = self._request(self.base_url + '/api/api_post.php',
                                  data=data)
+        if parse and stream:
+            return self._stream_pastes(response)
         if parse:
-            response = response.read().decode(encoding='utf-8')
-            parser = PastebinPasteListParser()
-            pastes = parser.get_pastes(response)
-            return pastes
+            return self._parse_response(response,
+                                        PastebinPasteListParser().get_pastes)
         return response
 
-    def list_trending_pastes(self, parse=False):
+    def sync_account(self, mirror, results_limit=1000):
+        '''
+        Mirror the pastes of a user into a local database, writing
+        only what changed since the last sync.
+        Must call Pastebin.login first.
+
+        args:
+            mirror (AccountMirror)
+
+        kwargs:
+            results_limit (int): the most pastes to list, at most 1000;
+                                 if the account has this many, pastes
+                                 missing from the listing are not
+                                 deleted from the mirror
+
+        returns:
+            SyncSummary object
+
+        raises:
+            AttributeError if self.user_key is not set
+            HTTPException if Pastebin refused the listing
+        '''
+        if not self.user_key:
+            raise AttributeError('''user_key is not set.
+                                 Login first to sync an account.''')
+        response = self.list_pastes(results_limit=results_limit)
+        pastes = self._parse_response(response, _parse_paste_list)
+        return mirror.apply(pastes, complete=len(pastes) < results_limit)
+
+    def _request_trending_pastes(self):
+        data = {
+            'api_dev_key' : self.api_key,
+            'api_option' : b'trends'
+        }
+        return self._request(self.base_url + '/api/api_post.php',
+                             data=data)
+
+    def _load_trending_pastes(self):
+        response = self._request_trending_pastes()
+        return tuple(self._parse_response(
+            response, PastebinPasteListParser().get_pastes))
+
+    def list_trending_pastes(self, parse=False, stream=False):
         '''
         List the 18 currently trending pastes.
 
         kwargs:
             parse (bool): If this is true, a list of PastebinPastes
                           objects will be returned instead of the
-                          usual HTTPResponse
+                          usual response
+            stream (bool): If this and parse are true, a generator is
+                           returned that yields each PastebinPaste as
+                           soon as its element has been read
+
+        If self.trending_cache is set, parsed results are served from
+        it and only a cache miss or refresh reaches Pastebin.
 
         returns:
-            http.client.HTTPResponse object
+            the response of self.transport
         '''
+        if parse and self.trending_cache is not None:
+            pastes = self.trending_cache.get(self.api_key,
+                                             self._load_trending_pastes)
+            return iter(pastes) if stream else list(pastes)
+        response = self._request_trending_pastes()
+        if parse and stream:
+            return self._stream_pastes(response)
+        if parse:
+            return self._parse_response(response,
+                                        PastebinPasteListParser().get_pastes)
+        return response
+
+    def _request_raw(self, paste_key, logged_in):
+        if isinstance(paste_key, bytes):
+            paste_key = paste_key.decode(encoding='utf-8')
+        if not logged_in:
+            return self._request(self.base_url + '/raw/' + paste_key)
+        if not self.user_key:
+            raise AttributeError('''user_key is not set.
+                                 Login first to fetch a raw paste.''')
         data = {
             'api_dev_key' : self.api_key,
-            'api_option' : b'trends'
+            'api_user_key' : self.user_key,
+            'api_paste_key' : paste_key,
+            'api_option' : b'show_paste'
         }
-        data = urlencode(data)
-        data = bytes(data, encoding='utf-8')
-        response = self._request('https://pastebin.com/api/api_post.php',
+        response = self._request(self.base_url + '/api/api_raw.php',
                                  data=data)
-        if parse:
-            response = response.read().decode(encoding='utf-8')
-            parser = PastebinPasteListParser()
-            pastes = parser.get_pastes(response)
-            return pastes
+        if response.peek(len(_BAD_REQUEST)).startswith(_BAD_REQUEST):
+            message = response.read()
+            raise HTTPException(message.decode(encoding='utf-8'))
         return response
 
+    def _iter_body(self, response, chunk_size, cache_key=None):
+        complete = False
+        writer = None
+        try:
+            if cache_key is not None:
+                # opened only once iteration starts, as a generator
+                # dropped before then never runs its finally
+                writer = self.raw_cache.writer(cache_key)
+            while True:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                if writer is not None:
+                    writer.write(chunk)
+                yield chunk
+            complete = True
+        finally:
+            response.close()
+            if writer is not None:
+                if complete:
+                    writer.commit()
+                else:
+                    writer.abort()
+
+    def _iter_cached(self, content, chunk_size):
+        if isinstance(content, bytes):
+            for offset in range(0, len(content), chunk_size):
+                yield content[offset:offset + chunk_size]
+            return
+        with content:
+            while True:
+                chunk = content.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def iter_raw(self, paste_key, chunk_size=STREAM_CHUNK_SIZE,
+                 logged_in=False):
+        '''
+        Stream the raw content of a paste over the transport.
+
+        The request is sent before this returns, so errors are raised
+        here rather than on the first iteration.
+
+        If self.raw_cache is set, a cached content is streamed from it
+        instead, and a download read to the end is stored in it. Given
+        a PastebinPaste, as listed by list_pastes or
+        list_trending_pastes, a cached content whose length differs
+        from its paste_size is fetched again.
+
+        args:
+            paste_key (str or PastebinPaste)
+
+        kwargs:
+            chunk_size (int): the most bytes yielded at a time
+            logged_in (bool): If this is true, the paste is fetched
+                              through api_raw.php as the logged in user,
+                              which also works for their private pastes;
+                              otherwise the public /raw/ page is used
+
+        returns:
+            a generator of bytes
+
+        raises:
+            AttributeError if logged_in is true and self.user_key is
+            not set
+            PastebinHTTPError if the paste cannot be found
+            http.client.HTTPException if Pastebin refuses the request
+        '''
+        size = None
+        if isinstance(paste_key, PastebinPaste):
+            paste_key, size = paste_key.paste_key, paste_key.paste_size
+        cache_key = None
+        if self.raw_cache is not None:
+            content = self.raw_cache.open(paste_key, size=size)
+            if content is not None:
+                return self._iter_cached(content, chunk_size)
+            cache_key = paste_key
+        response = self._request_raw(paste_key, logged_in)
+        chunks = self._iter_body(response, chunk_size, cache_key)
+        # a generator dropped before its first iteration never runs its
+        # finally, and the response would hold its pooled connection
+        # for good
+        weakref.finalize(chunks, response.close)
+        return chunks
+
+    def fetch_raw(self, paste_key, file=None, logged_in=False,
+                  chunk_size=STREAM_CHUNK_SIZE):
+        '''
+        Fetch the raw content of a paste; see iter_raw.
+
+        args:
+            paste_key (str or PastebinPaste)
+
+        kwargs:
+            file: a binary file object to write the content into as it
+                  arrives, instead of returning it
+            logged_in (bool): fetch through api_raw.php
+            chunk_size (int)
+
+        returns:
+            the content (bytes), or the number of bytes written to
+            file (int)
+        '''
+        chunks = self.iter_raw(paste_key, chunk_size=chunk_size,
+                               logged_in=logged_in)
+        if file is None:
+            return b''.join(chunks)
+        written = 0
+        for chunk in chunks:
+            file.write(chunk)
+            written += len(chunk)
+        return written
+
+    def index_pastes(self, index, pastes, logged_in=False, max_concurrency=4,
+                     ordered=False, batch_size=50):
+        '''
+        Fetch the contents of pastes with fetch_raw, concurrently over
+        the transport, and add them to a search index.
+
+        A PastebinPaste already indexed with its paste_size is not
+        fetched again; a paste key is always fetched, and indexed only
+        if its content changed. A failed paste is reported in its
+        result and does not abort the rest of the batch.
+
+        args:
+            index (SearchIndex)
+            pastes (iterable): PastebinPastes, as listed by list_pastes,
+                               list_trending_pastes or an AccountMirror,
+                               or paste keys
+
+        kwargs:
+            logged_in (bool): fetch through api_raw.php, for private
+                              pastes of the logged in user
+            max_concurrency (int): the number of requests in flight
+            ordered (bool): yield results in input order instead of
+                            in order of completion
+            batch_size (int): the most contents written to the index
+                              in one transaction
+
+        returns:
+            a generator of BatchResult objects whose value is True if
+            the paste was indexed, False if the index was up to date
+        '''
+        def fetch(paste):
+            if (isinstance(paste, PastebinPaste)
+                    and index.indexed(paste.paste_key, paste.paste_size)):
+                return None
+            return self.fetch_raw(paste, logged_in=logged_in)
+
+        results = run_batch(fetch, pastes, max_concurrency=max_concurrency,
+                            ordered=ordered)
+        batch = []
+        for result in results:
+            batch.append(result)
+            if len(batch) >= batch_size:
+                for indexed in _index_batch(index, batch):
+                    yield indexed
+                batch = []
+        for indexed in _index_batch(index, batch):
+            yield indexed
+
     def delete_paste(self, paste_key):
         '''
         Delete pastes created by a user.
@@ -250,8 +909,12 @@ class Pastebin:
         args:
             paste_key
 
+        If self.dedupe is set, the paste is forgotten by it once
+        Pastebin confirms the deletion, and the body of the response
+        is read to check.
+
         returns:
-            http.client.HTTPResponse object
+            the response of self.transport
 
         raises:
             AttributeError if self.user_key is not set
@@ -265,12 +928,87 @@ class Pastebin:
             'api_paste_key' : paste_key,
             'api_option' : b'delete'
         }
-        data = urlencode(data)
-        data = bytes(data, encoding='utf-8')
-        response = self._request('https://pastebin.com/api/api_post.php',
+        response = self._request(self.base_url + '/api/api_post.php',
                                  data=data)
+        if self.dedupe is not None:
+            with response:
+                body = response.read()
+            if body.startswith(b'Paste Removed'):
+                self.dedupe.discard(paste_key)
+            response = MemoryResponse(response.status, {}, body)
         return response
 
+    def delete_pastes(self, paste_keys, max_concurrency=4, rate=None):
+        '''
+        Delete many pastes created by a user in parallel over the
+        transport. Must call Pastebin.login first.
+
+        rate applies to this call only, with a burst of up to rate
+        deletes. Every delete request also takes a token from the
+        delete bucket of self.rate_limiter, if that is set, so the
+        lower of the two rates wins.
+
+        args:
+            paste_keys (iterable)
+
+        kwargs:
+            max_concurrency (int): the number of requests in flight
+            rate (float): the most delete requests to send per second,
+                          unlimited if None
+
+        returns:
+            DeleteSummary object
+
+        raises:
+            AttributeError if self.user_key is not set
+        '''
+        if not self.user_key:
+            raise AttributeError('''user_key is not set.
+                                 Login first to delete pastes.''')
+        bucket = TokenBucket(rate) if rate else None
+
+        def delete(paste_key):
+            if bucket is not None:
+                bucket.acquire()
+            body = self.delete_paste(paste_key).read()
+            if body.startswith(b'Bad API request'):
+                raise HTTPException(body.decode(encoding='utf-8'))
+            return body
+
+        summary = DeleteSummary()
+        for result in run_batch(delete, paste_keys,
+                                max_concurrency=max_concurrency):
+            if result.ok:
+                summary.deleted.append(result.item)
+            else:
+                summary.failed[result.item] = result.error
+        return summary
+
+    def _request_user_information(self, user_key):
+        data = {
+            'api_dev_key' : self.api_key,
+            'api_user_key' : user_key,
+            'api_option' : b'userdetails'
+        }
+        return self._request(self.base_url + '/api/api_post.php',
+                             data=data)
+
+    def _load_user_information(self, user_key):
+        response = self._request_user_information(user_key)
+        return self._parse_response(
+            response, PastebinUserParser().get_user_information)
+
+    def invalidate_user_information(self, user_key=None):
+        '''
+        Drop the cached PastebinUser of a user_key, so the next
+        get_user_information(parse=True) asks Pastebin again.
+
+        kwargs:
+            user_key (bytes): defaults to self.user_key
+        '''
+        if self.user_cache is not None:
+            self.user_cache.invalidate(user_key or self.user_key)
+
     def get_user_information(self, parse=False):
         '''
         Obtain a user's personal information and settings.
@@ -279,10 +1017,13 @@ class Pastebin:
         kwargs:
             parse (bool): If this is true, a PastebinUser
                           object will be returned instead of the
-                          usual HTTPResponse
+                          usual response
+
+        If self.user_cache is set, parsed results are served from it
+        per user_key.
 
         returns:
-            http.client.HTTPResponse object
+            the response of self.transport
 
         raises:
             AttributeError if self.user_key is not set
@@ -290,20 +1031,14 @@ class Pastebin:
         if not self.user_key:
             raise AttributeError('''user_key is not set.
                                  Login first to get user information.''')
-        data = {
-            'api_dev_key' : self.api_key,
-            'api_user_key' : self.user_key,
-            'api_option' : b'userdetails'
-        }
-        data = urlencode(data)
-        data = bytes(data, encoding='utf-8')
-        response = self._request('https://pastebin.com/api/api_post.php',
-                                 data=data)
+        if parse and self.user_cache is not None:
+            user_key = self.user_key
+            return self.user_cache.get(
+                user_key, lambda: self._load_user_information(user_key))
+        response = self._request_user_information(self.user_key)
         if parse:
-            response = response.read().decode(encoding='utf-8')
-            parser = PastebinUserParser()
-            user = parser.get_user_information(response)
-            return user
+            return self._parse_response(
+                response, PastebinUserParser().get_user_information)
         return response
 
 
@@ -312,47 +1047,84 @@ class PastebinPasteListParser(HTMLParser):
     A custom parser for the list_pastes method of the Pastebin API.
     Mostly for internal use on the Pastebin.list_pastes method when
     the parse flag is true.
+
+    The parser makes a single pass over the response: the text of each
+    field is stored by tag name in a record for the current <paste>
+    element, and the record becomes a PastebinPaste when the element
+    closes. Fields that are empty or missing are None, and fields
+    unknown to PastebinPaste are ignored.
     '''
     def __init__(self):
         HTMLParser.__init__(self)
-        self._tups = []
+        self._record = None
+        self._field = None
+        self._text = []
+        self._pastes = []
+        self._seen_paste = False
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
 
     def get_pastes(self, data):
         self.feed(data)
         return self._get_pastes()
 
+    def feed_pastes(self, data):
+        '''
+        Feed the next piece of a list_pastes response to the parser.
+
+        args:
+            data (bytes or str): a piece of the response body; bytes
+                                 may split a multi-byte character
+
+        returns:
+            a list of the PastebinPaste objects completed by data
+        '''
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        self.feed(data)
+        pastes, self._pastes = self._pastes, []
+        return pastes
+
+    def close_pastes(self):
+        '''
+        Flush the parser once the whole response has been fed.
+
+        returns:
+            a list of the PastebinPaste objects still pending
+        '''
+        self.feed(self._decoder.decode(b'', final=True))
+        self.close()
+        pastes, self._pastes = self._pastes, []
+        return pastes
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'paste':
+            self._record = dict.fromkeys(_PASTE_FIELDS)
+            self._seen_paste = True
+        elif self._record is not None and tag in _PASTE_FIELDS:
+            self._field = tag
+            self._text = []
+
+    def handle_endtag(self, tag):
+        if tag == self._field:
+            if self._text:
+                self._record[tag] = ''.join(self._text)
+            self._field = None
+        elif tag == 'paste' and self._record is not None:
+            self._pastes.append(PastebinPaste(**self._record))
+            self._record = None
+
     def handle_data(self, data):
-        tag = self.get_starttag_text()[1:-1]
-        data = data
-        if data != '\r\n':
-            tup = (tag, data)
-            self._tups.append(tup)
+        # whitespace between elements is not inside any field
+        if self._field is not None:
+            self._text.append(data)
 
     def _get_pastes(self):
-        if not self._tups:
+        if not self._seen_paste:
             msg = '''please call the PastebinPasteListParser.feed(data)
-                method to get a list of tuples from the
-                Pastebin list_pastes API before using this method'''
+                method with a response from the Pastebin list_pastes
+                API before using this method'''
             raise AttributeError(msg)
-        pastes = []
-        n_pastes = len(self._tups) // 10
-        ind = 0
-        while ind < n_pastes:
-            paste = PastebinPaste(
-                self._tups[10*ind + 0][1], # paste_key
-                self._tups[10*ind + 1][1], # paste_date
-                self._tups[10*ind + 2][1], # paste_title
-                self._tups[10*ind + 3][1], # paste_size
-                self._tups[10*ind + 4][1], # paste_expire_date
-                self._tups[10*ind + 5][1], # paste_private
-                self._tups[10*ind + 6][1], # paste_format_long
-                self._tups[10*ind + 7][1], # paste_format_short
-                self._tups[10*ind + 8][1], # paste_url
-                self._tups[10*ind + 9][1]  # paste_hits
-            )
-            ind += 1
-            pastes.append(paste)
-        return pastes
+        return self._pastes
 
 
 class PastebinUserParser(HTMLParser):
@@ -381,80 +1153,228 @@ class PastebinUserParser(HTMLParser):
         return user
 
 
-class PastebinPaste:
+class PastePrivacy(IntEnum):
+    '''
+    The api_paste_private values of the Pastebin API.
+    '''
+    PUBLIC = 0
+    UNLISTED = 1
+    PRIVATE = 2
+
+
+def _to_int(value):
+    if value is None or isinstance(value, int):
+        return value
+    return int(value)
+
+
+def _to_privacy(value):
+    if value is None:
+        return None
+    return PastePrivacy(_to_int(value))
+
+
+def _to_datetime(value):
+    '''
+    Convert a unix timestamp from the API to an aware UTC datetime;
+    0 (used for pastes that never expire) becomes None.
+    '''
+    if value is None or isinstance(value, datetime):
+        return value
+    value = int(value)
+    if value == 0:
+        return None
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+class _Record:
+    '''
+    Shared behaviour of the immutable PastebinPaste and PastebinUser
+    records.
+
+    Subclasses list their public attributes, in constructor order, in
+    _fields and name the field identifying a record in _key. Records
+    are equal when all fields are equal, hash by their key field and
+    are ordered by it.
+    '''
+    __slots__ = ()
+    _fields = ()
+    _key = None
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def __reduce__(self):
+        return (type(self), self._values())
+
+    def __hash__(self):
+        return hash(getattr(self, self._key))
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __ne__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() != other._values()
+
+    def __lt__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return getattr(self, self._key) < getattr(other, self._key)
+
+    def __le__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return getattr(self, self._key) <= getattr(other, self._key)
+
+    def __gt__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return getattr(self, self._key) > getattr(other, self._key)
+
+    def __ge__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return getattr(self, self._key) >= getattr(other, self._key)
+
+
+class PastebinPaste(_Record):
     '''
     This class encapsulates a Pastebin paste.
 
+    Pastes are immutable, hash by paste_key and sort by paste_key.
+    The raw strings of the API are converted on construction, except
+    for the two dates, which are converted the first time they are
+    read and then cached.
+
     attributes:
-        paste_key (bytes)
-        paste_date (bytes)
-        paste_title (bytes)
+        paste_key (str)
+        paste_date (datetime.datetime): UTC
+        paste_title (str)
         paste_size (int)
-        paste_expire_date (bytes)
-        paste_private (int)
-        paste_format_long (byes)
-        paste_format_short (bytes)
-        paste_url (bytes)
+        paste_expire_date (datetime.datetime): UTC, None if the paste
+                                               never expires
+        paste_private (PastePrivacy)
+        paste_format_long (str)
+        paste_format_short (str)
+        paste_url (str)
         paste_hits (int)
     '''
+    __slots__ = ('paste_key', '_paste_date', 'paste_title', 'paste_size',
+                 '_paste_expire_date', 'paste_private', 'paste_format_long',
+                 'paste_format_short', 'paste_url', 'paste_hits')
+    _fields = ('paste_key', 'paste_date', 'paste_title', 'paste_size',
+               'paste_expire_date', 'paste_private', 'paste_format_long',
+               'paste_format_short', 'paste_url', 'paste_hits')
+    _key = 'paste_key'
+
     def __init__(self, paste_key, paste_date, paste_title, paste_size,
                  paste_expire_date, paste_private, paste_format_long,
                  paste_format_short, paste_url, paste_hits):
-        self.paste_key = paste_key
-        self.paste_date = paste_date
-        self.paste_title = paste_title
-        self.paste_size = paste_size
-        self.paste_expire_date = paste_expire_date
-        self.paste_private = paste_private
-        self.paste_format_long = paste_format_long
-        self.paste_format_short = paste_format_short
-        self.paste_url = paste_url
-        self.paste_hits = paste_hits
+        _set = object.__setattr__
+        _set(self, 'paste_key', paste_key)
+        _set(self, '_paste_date', paste_date)
+        _set(self, 'paste_title', paste_title)
+        _set(self, 'paste_size', _to_int(paste_size))
+        _set(self, '_paste_expire_date', paste_expire_date)
+        _set(self, 'paste_private', _to_privacy(paste_private))
+        _set(self, 'paste_format_long', paste_format_long)
+        _set(self, 'paste_format_short', paste_format_short)
+        _set(self, 'paste_url', paste_url)
+        _set(self, 'paste_hits', _to_int(paste_hits))
+
+    # the date slots hold the raw API value until first read, then the
+    # converted datetime (or None)
+
+    @property
+    def paste_date(self):
+        value = self._paste_date
+        if value is not None and not isinstance(value, datetime):
+            value = _to_datetime(value)
+            object.__setattr__(self, '_paste_date', value)
+        return value
+
+    @property
+    def paste_expire_date(self):
+        value = self._paste_expire_date
+        if value is not None and not isinstance(value, datetime):
+            value = _to_datetime(value)
+            object.__setattr__(self, '_paste_expire_date', value)
+        return value
 
     def __repr__(self):
         _repr = 'PastebinPaste({}, {}, {}, {}, {}, {}, {}, {}, {}, {})'
-        return _repr.format(*[getattr(self, str(key))
-                              for key in self.__dict__.keys()])
+        return _repr.format(*self._values())
 
 
-class PastebinUser:
+class PastebinUser(_Record):
     '''
     This class encapsulates a Pastebin user.
 
     Some of these attributes are not necessarily set to anything
-    other than None.
+    other than None. Users are immutable, hash by user_name and sort
+    by user_name.
 
     attributes:
-        user_name (bytes)
-        user_format_short (bytes)
-        user_expiration (bytes)
-        user_avatar_url (bytes)
-        user_private (int)
-        user_website (bytes)
-        user_email (bytes)
-        user_location (bytes)
-        user_account_type (int)
+        user_name (str)
+        user_format_short (str)
+        user_expiration (str)
+        user_avatar_url (str)
+        user_private (PastePrivacy): the default paste privacy
+        user_website (str)
+        user_email (str)
+        user_location (str)
+        user_account_type (int): 0 for normal, 1 for PRO accounts
     '''
+    __slots__ = ('user_name', 'user_format_short', 'user_expiration',
+                 'user_avatar_url', 'user_private', 'user_website',
+                 'user_email', 'user_location', 'user_account_type')
+    _fields = __slots__
+    _key = 'user_name'
+
     def __init__(self, user_name=None, user_format_short=None,
                  user_expiration=None,
                  user_avatar_url=None, user_private=None,
                  user_website=None, user_email=None,
                  user_location=None, user_account_type=None):
-        self.user_name = user_name
-        self.user_format_short = user_format_short
-        self.user_expiration = user_expiration
-        self.user_avatar_url = user_avatar_url
-        self.user_private = user_private
-        self.user_website = user_website
-        self.user_email = user_email
-        self.user_location = user_location
-        self.user_account_type = user_account_type
+        _set = object.__setattr__
+        _set(self, 'user_name', user_name)
+        _set(self, 'user_format_short', user_format_short)
+        _set(self, 'user_expiration', user_expiration)
+        _set(self, 'user_avatar_url', user_avatar_url)
+        _set(self, 'user_private', _to_privacy(user_private))
+        _set(self, 'user_website', user_website)
+        _set(self, 'user_email', user_email)
+        _set(self, 'user_location', user_location)
+        _set(self, 'user_account_type', _to_int(user_account_type))
 
     def __repr__(self):
         _repr = '''PastebinUser(user_name={}, user_format_short={}, user_expiration={}, user_avatar_url={}, user_private={}, user_website={}, user_email={}, user_location={}, user_account_type={})'''
-        return _repr.format(*[getattr(self, str(key))
-                              for key in self.__dict__.keys()])
+        return _repr.format(*self._values())
+
+
+# imported last: the asyncio client builds on the parsers defined above
+from .aio import AsyncConnectionPool, AsyncPastebin, AsyncResponse
+from .mirror import AccountMirror, SyncSummary
 
 
 __all__ = ['Pastebin', 'PastebinPasteListParser', 'PastebinPaste',
-           'PastebinUserParser', 'PastebinUser']
+           'PastebinUserParser', 'PastebinUser', 'PastePrivacy',
+           'PastebinHTTPError', 'RequestEvent', 'MetricsRegistry',
+           'Transport', 'ConnectionPool', 'PooledResponse',
+           'UrllibTransport', 'MemoryTransport', 'MemoryResponse',
+           'BatchResult', 'DeleteSummary', 'TokenBucket', 'RateLimiter',
+           'RetryPolicy', 'ResponseCache', 'SessionStore',
+           'MemorySessionStore', 'FileSessionStore', 'RawCache',
+           'AccountMirror', 'SyncSummary', 'SearchIndex', 'SearchHit',
+           'PasteDedupe', 'AsyncPastebin', 'AsyncConnectionPool',
+           'AsyncResponse']
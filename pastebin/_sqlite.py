@@ -0,0 +1,101 @@
+'''
+The SQLite connection handling shared by AccountMirror, SearchIndex
+and PasteDedupe.
+'''
+
+
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    '''
+    A SQLite database that may be shared by several threads, through
+    one connection guarded by a lock, and opened by several processes.
+
+    Subclasses set _schema, run on every open, and _count, the query
+    behind len().
+
+    args:
+        path (str): the database file, ':memory:' for a private
+                    in-memory database
+
+    kwargs:
+        timeout (float): seconds to wait for another process to finish
+                         writing
+
+    methods:
+        close
+    '''
+    _schema = ''
+    _count = None
+
+    def __init__(self, path=':memory:', timeout=30.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=timeout,
+                                           isolation_level=None,
+                                           check_same_thread=False)
+        if path != ':memory:':
+            # readers are not blocked while another connection writes
+            self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(self._schema)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._execute(self._count)[0][0]
+
+    def _execute(self, sql, parameters=()):
+        '''
+        Run one statement, committed on its own.
+
+        returns:
+            the rows it returned (list)
+        '''
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _read(self, operations):
+        '''
+        Run operations(connection) in a read transaction, so that the
+        rows it reads are not changed by other connections halfway.
+
+        returns:
+            what operations returns
+        '''
+        return self._transaction(operations, 'BEGIN')
+
+    def _write(self, operations):
+        '''
+        Run operations(connection) in a transaction, which takes the
+        write lock first so that no other connection changes the rows
+        it reads.
+
+        returns:
+            what operations returns
+        '''
+        return self._transaction(operations, 'BEGIN IMMEDIATE')
+
+    def _transaction(self, operations, begin):
+        with self._lock:
+            connection = self._connection
+            connection.execute(begin)
+            try:
+                result = operations(connection)
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            return result
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
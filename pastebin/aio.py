@@ -0,0 +1,616 @@
+'''
+An asyncio flavour of the Pastebin API wrapper.
+
+AsyncPastebin mirrors the blocking Pastebin class method for method,
+but every request goes through a small HTTP/1.1 client written on
+asyncio streams, so one event loop can keep many requests in flight.
+'''
+
+
+import asyncio
+import ssl
+import time
+import weakref
+from email.parser import Parser
+from http.client import BadStatusLine, HTTPMessage, IncompleteRead
+from urllib.parse import urlsplit
+
+from . import (PASTEBIN_URL, STREAM_CHUNK_SIZE, USER_AGENT,
+               PastebinPasteListParser, PastebinUserParser, _api_keys,
+               _api_option, _encode)
+from .exceptions import PastebinHTTPError
+from .pool import _resend_safely
+from .retry import RetryPolicy
+from .upload import UploadSource, is_streamable
+
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class AsyncConnectionPool:
+    '''
+    A pool of persistent asyncio stream connections, keyed by host.
+    Unlike ConnectionPool, it always connects directly, whatever the
+    proxy settings of the environment.
+
+    kwargs:
+        max_size (int): the number of idle connections kept per host
+        idle_timeout (float): seconds an idle connection may sit in the
+                              pool before it is discarded
+        timeout (float): seconds allowed for connecting and for each
+                         read from the server
+        ssl_context (ssl.SSLContext): context used for https hosts
+
+    methods:
+        request
+        close
+    '''
+
+    def __init__(self, max_size=10, idle_timeout=60.0, timeout=None,
+                 ssl_context=None):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self._idle = {}
+        self._closed = False
+
+    def __repr__(self):
+        return 'AsyncConnectionPool(max_size={}, idle_timeout={})'.format(
+            self.max_size, self.idle_timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def _new_connection(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            connect = asyncio.open_connection(host, port,
+                                              ssl=self.ssl_context,
+                                              server_hostname=host)
+        else:
+            connect = asyncio.open_connection(host, port)
+        return await asyncio.wait_for(connect, self.timeout)
+
+    def _get_connection(self, key):
+        now = time.monotonic()
+        idle = self._idle.get(key, [])
+        while idle:
+            reader, writer, last_used = idle.pop()
+            if now - last_used <= self.idle_timeout and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    def _release(self, key, reader, writer, reusable=True):
+        idle = self._idle.setdefault(key, [])
+        if reusable and not self._closed and len(idle) < self.max_size:
+            idle.append((reader, writer, time.monotonic()))
+        else:
+            writer.close()
+
+    async def _send(self, key, conn, method, path, body, headers):
+        writer = conn[1]
+        host = key[1]
+        if key[2] != _DEFAULT_PORTS.get(key[0]):
+            host = '{}:{}'.format(host, key[2])
+        lines = ['{} {} HTTP/1.1'.format(method, path),
+                 'Host: {}'.format(host)]
+        for name, value in headers.items():
+            lines.append('{}: {}'.format(name, value))
+        if body is not None:
+            lines.append('Content-Length: {}'.format(len(body)))
+        head = '\r\n'.join(lines) + '\r\n\r\n'
+        writer.write(bytes(head, encoding='latin-1'))
+        if isinstance(body, bytes):
+            writer.write(body)
+        elif body is not None:
+            # a FormBody, drained a chunk at a time so that it is never
+            # buffered in full
+            for chunk in body:
+                writer.write(chunk)
+                await writer.drain()
+        await writer.drain()
+
+    async def _receive(self, key, conn, method):
+        reader, writer = conn
+        status_line = await self._readline(reader)
+        if not status_line:
+            raise ConnectionResetError('connection closed by server')
+        return await AsyncResponse._start(self, key, reader, writer,
+                                          method, status_line)
+
+    async def _readline(self, reader):
+        return await asyncio.wait_for(reader.readline(), self.timeout)
+
+    async def request(self, method, url, body=None, headers=None):
+        '''
+        Send a request over a pooled connection.
+
+        args:
+            method (str)
+            url (str)
+
+        kwargs:
+            body (bytes)
+            headers (dict)
+
+        returns:
+            AsyncResponse object
+
+        raises:
+            ValueError if the pool has been closed
+        '''
+        if self._closed:
+            raise ValueError('request on a closed AsyncConnectionPool')
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname,
+               parts.port or _DEFAULT_PORTS[parts.scheme])
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        headers = headers or {}
+        conn = self._get_connection(key)
+        if conn is not None:
+            sent = False
+            try:
+                await self._send(key, conn, method, path, body, headers)
+                sent = True
+                return await self._receive(key, conn, method)
+            except (ConnectionError, IncompleteRead) as error:
+                conn[1].close()
+                # the server may have dropped the keep-alive connection
+                # just as it was reused
+                if not _resend_safely(method, sent, error):
+                    raise
+            except BaseException:
+                conn[1].close()
+                raise
+        conn = await self._new_connection(key)
+        try:
+            await self._send(key, conn, method, path, body, headers)
+            return await self._receive(key, conn, method)
+        except BaseException:
+            conn[1].close()
+            raise
+
+    def close(self):
+        '''
+        Close every idle connection and refuse new requests.
+        '''
+        self._closed = True
+        idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for _, writer, _ in conns:
+                writer.close()
+
+
+class AsyncResponse:
+    '''
+    An HTTP/1.1 response read from an asyncio stream.
+
+    The connection goes back to its pool once the body has been read
+    to the end, or is closed if the response is closed early.
+
+    attributes:
+        status (int)
+        reason (str)
+        headers (http.client.HTTPMessage)
+
+    methods:
+        read
+        close
+    '''
+
+    def __init__(self, pool, key, reader, writer, status, reason, headers):
+        self._pool = pool
+        self._key = key
+        self._reader = reader
+        self._writer = writer
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._chunked = 'chunked' in headers.get('Transfer-Encoding',
+                                                 '').lower()
+        length = headers.get('Content-Length')
+        self._remaining = int(length) if length is not None else None
+        self._will_close = headers.get('Connection', '').lower() == 'close'
+        self._chunk_left = 0
+        self._done = False
+
+    @classmethod
+    async def _start(cls, pool, key, reader, writer, method, status_line):
+        parts = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise BadStatusLine(status_line)
+        status = int(parts[1])
+        reason = parts[2] if len(parts) > 2 else ''
+        lines = []
+        while True:
+            line = await pool._readline(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            lines.append(line.decode('latin-1'))
+        headers = Parser(_class=HTTPMessage).parsestr(''.join(lines))
+        response = cls(pool, key, reader, writer, status, reason, headers)
+        if (method == 'HEAD' or status in (204, 304) or 100 <= status < 200
+                or response._remaining == 0):
+            response._finish()
+        return response
+
+    def __repr__(self):
+        return 'AsyncResponse({}, {})'.format(self.status, self.reason)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def isclosed(self):
+        return self._done
+
+    def _finish(self, reusable=True):
+        if self._done:
+            return
+        self._done = True
+        reusable = reusable and not self._will_close
+        self._pool._release(self._key, self._reader, self._writer, reusable)
+
+    async def _read_some(self, amt):
+        reader = self._reader
+        timeout = self._pool.timeout
+        if self._chunked:
+            if self._chunk_left == 0:
+                line = await asyncio.wait_for(reader.readline(), timeout)
+                size = int(line.split(b';', 1)[0].strip() or b'0', 16)
+                if size == 0:
+                    # skip any trailers up to the terminating blank line
+                    while line not in (b'\r\n', b'\n', b''):
+                        line = await asyncio.wait_for(reader.readline(),
+                                                      timeout)
+                    self._finish()
+                    return b''
+                self._chunk_left = size
+            want = self._chunk_left if amt is None else min(amt,
+                                                            self._chunk_left)
+            data = await asyncio.wait_for(reader.readexactly(want), timeout)
+            self._chunk_left -= len(data)
+            if self._chunk_left == 0:
+                await asyncio.wait_for(reader.readexactly(2), timeout)
+            return data
+        if self._remaining is None:
+            data = await asyncio.wait_for(reader.read(amt or 65536), timeout)
+            if not data:
+                self._finish(reusable=False)
+            return data
+        want = self._remaining if amt is None else min(amt, self._remaining)
+        data = await asyncio.wait_for(reader.readexactly(want), timeout)
+        self._remaining -= len(data)
+        if self._remaining == 0:
+            self._finish()
+        return data
+
+    async def read(self, amt=None):
+        '''
+        Read up to amt bytes of the body, or all of it if amt is None.
+        '''
+        if self._done:
+            return b''
+        try:
+            if amt is not None:
+                return await self._read_some(amt)
+            chunks = []
+            while not self._done:
+                chunks.append(await self._read_some(None))
+            return b''.join(chunks)
+        except asyncio.IncompleteReadError as error:
+            self._finish(reusable=False)
+            raise IncompleteRead(error.partial)
+
+    def close(self):
+        self._finish(reusable=False)
+
+
+class AsyncPastebin:
+    '''
+    An asyncio Pastebin API wrapper.
+
+    Every method is a coroutine with the same arguments as its
+    counterpart on Pastebin.
+
+    attributes:
+        api_key (bytes)
+        user_key (bytes)
+        pool (AsyncConnectionPool)
+        rate_limiter (RateLimiter)
+        retry_policy (RetryPolicy)
+        base_url (str)
+
+    methods:
+        close
+        login
+        create_paste
+        create_logged_in_paste
+        list_pastes
+        list_trending_pastes
+        delete_paste
+        get_user_information
+    '''
+
+    def __init__(self, api_key, pool=None, rate_limiter=None,
+                 retry_policy=None, base_url=PASTEBIN_URL):
+        self.api_key = bytes(api_key, encoding='utf-8')
+        self.user_key = None
+        self.base_url = base_url.rstrip('/')
+        self.pool = pool if pool is not None else AsyncConnectionPool()
+        self.rate_limiter = rate_limiter
+        self.retry_policy = (retry_policy if retry_policy is not None
+                             else RetryPolicy())
+
+    def __repr__(self):
+        return 'AsyncPastebin({})'.format(self.api_key)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        '''
+        Close the connection pool used by this instance.
+        '''
+        self.pool.close()
+
+    async def _request(self, url, data=None, **kwargs):
+        '''
+        The coroutine counterpart of Pastebin._request.
+
+        returns:
+            AsyncResponse object
+
+        raises:
+            PastebinHTTPError if the response code is not 200 once
+            self.retry_policy has given up
+        '''
+        headers = {'User-Agent' : USER_AGENT}
+        if data is None:
+            method = 'GET'
+            api_option = 'raw'
+            api_keys = [self.api_key]
+            body = None
+        else:
+            method = 'POST'
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            api_option = _api_option(data)
+            api_keys = _api_keys(data)
+            body = _encode(data)
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(api_option, *api_keys)
+            try:
+                response = await self.pool.request(method, url, body=body,
+                                                   headers=headers)
+                if response.status == 200:
+                    return response
+                response.close()
+                raise PastebinHTTPError(response.status, response.reason,
+                                        response.headers)
+            except Exception as error:
+                if not self.retry_policy.is_retryable(api_option, attempt,
+                                                      error):
+                    raise
+                await asyncio.sleep(self.retry_policy.backoff(attempt, error))
+
+    async def login(self, user_name, user_password):
+        '''
+        Use the Pastebin members system to login.
+
+        returns:
+           Pastebin API user key (bytes)
+        '''
+        data = {
+            'api_dev_key' : self.api_key,
+            'api_user_name' : user_name,
+            'api_user_password' : user_password
+        }
+        response = await self._request(
+            self.base_url + '/api/api_login.php', data=data)
+        self.user_key = await response.read()
+        return self.user_key
+
+    async def create_paste(self, paste_code, user_key=None, paste_name=None,
+                           paste_format=None, paste_private=0,
+                           paste_expire_date=None):
+        '''
+        Create a new paste. See Pastebin.create_paste; files and
+        iterables are streamed in the same way, though reading them
+        blocks the event loop. There is no deduplication.
+
+        returns:
+            AsyncResponse object
+        '''
+        source = None
+        if is_streamable(paste_code):
+            paste_code = source = UploadSource(paste_code)
+        data = {
+            'api_dev_key' : self.api_key,
+            'api_option' : b'paste',
+            'api_paste_code' : paste_code,
+        }
+        if user_key:
+            data['api_user_key'] = user_key
+        if paste_name:
+            data['api_paste_name'] = paste_name
+        if paste_format:
+            data['api_paste_format'] = paste_format
+        data['api_paste_private'] = paste_private
+        if paste_expire_date:
+            data['api_paste_expire_date'] = paste_expire_date
+        try:
+            response = await self._request(
+                self.base_url + '/api/api_post.php', data=data)
+        finally:
+            if source is not None:
+                source.close()
+        return response
+
+    async def create_logged_in_paste(self, paste_code, paste_name=None,
+                                     paste_format=None, paste_private=0,
+                                     paste_expire_date=None):
+        '''
+        Create a new logged in paste. Must call AsyncPastebin.login
+        first. See Pastebin.create_logged_in_paste.
+
+        returns:
+            AsyncResponse object
+
+        raises:
+            AttributeError if self.user_key is not set
+        '''
+        if not self.user_key:
+            raise AttributeError('''user_key is not set. Login first to
+                                 create a logged in paste.''')
+        response = await self.create_paste(
+            paste_code, user_key=self.user_key, paste_name=paste_name,
+            paste_format=paste_format, paste_private=paste_private,
+            paste_expire_date=paste_expire_date)
+        return response
+
+    def _stream_pastes(self, response):
+        pastes = self._iter_pastes(response)
+        # see Pastebin._stream_pastes
+        weakref.finalize(pastes, response.close)
+        return pastes
+
+    async def _iter_pastes(self, response):
+        parser = PastebinPasteListParser()
+        try:
+            while True:
+                chunk = await response.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                for paste in parser.feed_pastes(chunk):
+                    yield paste
+            for paste in parser.close_pastes():
+                yield paste
+        finally:
+            response.close()
+
+    async def list_pastes(self, results_limit=5, parse=False, stream=False):
+        '''
+        List all the pastes created by a user.
+        Must call AsyncPastebin.login first.
+
+        returns:
+            AsyncResponse object, a list of PastebinPaste objects if
+            parse is true, or an async generator of them if stream is
+            true as well
+
+        raises:
+            AttributeError if self.user_key is not set
+        '''
+        if not self.user_key:
+            raise AttributeError('''user_key is not set.
+                                 Login first to list user pastes.''')
+        data = {
+            'api_dev_key' : self.api_key,
+            'api_user_key' : self.user_key,
+            'api_results_limit' : results_limit,
+            'api_option' : b'list'
+        }
+        response = await self._request(
+            self.base_url + '/api/api_post.php', data=data)
+        if parse and stream:
+            return self._stream_pastes(response)
+        if parse:
+            response = (await response.read()).decode(encoding='utf-8')
+            parser = PastebinPasteListParser()
+            pastes = parser.get_pastes(response)
+            return pastes
+        return response
+
+    async def list_trending_pastes(self, parse=False, stream=False):
+        '''
+        List the 18 currently trending pastes.
+
+        returns:
+            AsyncResponse object, a list of PastebinPaste objects if
+            parse is true, or an async generator of them if stream is
+            true as well
+        '''
+        data = {
+            'api_dev_key' : self.api_key,
+            'api_option' : b'trends'
+        }
+        response = await self._request(
+            self.base_url + '/api/api_post.php', data=data)
+        if parse and stream:
+            return self._stream_pastes(response)
+        if parse:
+            response = (await response.read()).decode(encoding='utf-8')
+            parser = PastebinPasteListParser()
+            pastes = parser.get_pastes(response)
+            return pastes
+        return response
+
+    async def delete_paste(self, paste_key):
+        '''
+        Delete pastes created by a user.
+
+        returns:
+            AsyncResponse object
+
+        raises:
+            AttributeError if self.user_key is not set
+        '''
+        if not self.user_key:
+            raise AttributeError('''user_key is not set.
+                                 Login first to delete a paste.''')
+        data = {
+            'api_dev_key' : self.api_key,
+            'api_user_key' : self.user_key,
+            'api_paste_key' : paste_key,
+            'api_option' : b'delete'
+        }
+        response = await self._request(
+            self.base_url + '/api/api_post.php', data=data)
+        return response
+
+    async def get_user_information(self, parse=False):
+        '''
+        Obtain a user's personal information and settings.
+        Must be logged in first.
+
+        returns:
+            AsyncResponse object, or a PastebinUser object if parse
+            is true
+
+        raises:
+            AttributeError if self.user_key is not set
+        '''
+        if not self.user_key:
+            raise AttributeError('''user_key is not set.
+                                 Login first to get user information.''')
+        data = {
+            'api_dev_key' : self.api_key,
+            'api_user_key' : self.user_key,
+            'api_option' : b'userdetails'
+        }
+        response = await self._request(
+            self.base_url + '/api/api_post.php', data=data)
+        if parse:
+            response = (await response.read()).decode(encoding='utf-8')
+            parser = PastebinUserParser()
+            user = parser.get_user_information(response)
+            return user
+        return response
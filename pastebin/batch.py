@@ -0,0 +1,117 @@
+'''
+Helpers for running many Pastebin API calls on a worker pool.
+'''
+
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class BatchResult:
+    '''
+    The outcome of one item of a batch call.
+
+    attributes:
+        index (int): the position of the item in the input
+        item: the input item
+        value: whatever the call returned, None if it failed
+        error (Exception): the exception raised, None if it succeeded
+    '''
+
+    def __init__(self, index, item, value=None, error=None):
+        self.index = index
+        self.item = item
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return 'BatchResult({}, value={!r})'.format(self.index,
+                                                        self.value)
+        return 'BatchResult({}, error={!r})'.format(self.index, self.error)
+
+
+class DeleteSummary:
+    '''
+    The outcome of a Pastebin.delete_pastes call.
+
+    attributes:
+        deleted (list): the paste keys that were removed
+        failed (dict): paste key -> the exception raised for it
+    '''
+
+    def __init__(self):
+        self.deleted = []
+        self.failed = {}
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def __repr__(self):
+        return 'DeleteSummary(deleted={}, failed={})'.format(
+            len(self.deleted), len(self.failed))
+
+
+def _call(func, index, item):
+    try:
+        return BatchResult(index, item, value=func(item))
+    except Exception as error:
+        return BatchResult(index, item, error=error)
+
+
+def run_batch(func, items, max_concurrency=4, ordered=False):
+    '''
+    Call func on every item using a pool of worker threads.
+
+    Items are pulled from the iterable lazily, so no more than
+    2 * max_concurrency calls are queued at any time. An exception
+    raised by func is captured in that item's BatchResult and does not
+    stop the batch.
+
+    args:
+        func (callable): called with a single item
+        items (iterable)
+
+    kwargs:
+        max_concurrency (int): the number of worker threads
+        ordered (bool): yield results in input order instead of in
+                        order of completion
+
+    returns:
+        a generator of BatchResult objects
+    '''
+    if max_concurrency < 1:
+        raise ValueError('max_concurrency must be at least 1')
+    items = enumerate(items)
+    pending = set()
+    finished = {}
+    next_index = 0
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        while True:
+            # results held back for ordering count against the window
+            # too, so a slow head item cannot make the buffer grow
+            while (not exhausted and
+                   len(pending) + len(finished) < 2 * max_concurrency):
+                try:
+                    index, item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(_call, func, index, item))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if not ordered:
+                    yield result
+                    continue
+                finished[result.index] = result
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
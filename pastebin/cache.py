@@ -0,0 +1,130 @@
+'''
+In-process caching of parsed Pastebin API responses.
+'''
+
+
+import threading
+import time
+
+
+class _Flight:
+    '''
+    A load in progress; callers arriving while it runs wait for it
+    instead of starting their own.
+    '''
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    '''
+    A thread-safe TTL cache with single-flight loading.
+
+    A value is fresh for ttl seconds. For a further stale_ttl seconds
+    it is still returned, while one background thread reloads it.
+    When a key is missing or too old, the first caller loads it and
+    every concurrent caller for the same key waits for that one load.
+
+    kwargs:
+        ttl (float): seconds a value is served without reloading
+        stale_ttl (float): seconds past ttl a value may be served while
+                           it is refreshed in the background
+
+    methods:
+        get
+        invalidate
+        clear
+    '''
+
+    def __init__(self, ttl=60.0, stale_ttl=0.0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'ResponseCache(ttl={}, stale_ttl={})'.format(self.ttl,
+                                                           self.stale_ttl)
+
+    def _load(self, key, loader, flight):
+        try:
+            flight.value = loader()
+        except Exception as error:
+            flight.error = error
+        with self._lock:
+            # an invalidate() during the load drops the flight, and its
+            # result with it
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+                if flight.error is None:
+                    self._entries[key] = (flight.value, time.monotonic())
+        flight.done.set()
+
+    def get(self, key, loader):
+        '''
+        Return the cached value for key, calling loader to fill it.
+
+        args:
+            key: any hashable
+            loader (callable): takes no arguments and returns the value
+
+        returns:
+            the cached or freshly loaded value
+
+        raises:
+            whatever loader raised, to every caller waiting on it
+        '''
+        now = time.monotonic()
+        refresh = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored = entry
+                age = now - stored
+                if age < self.ttl:
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    if key not in self._flights:
+                        refresh = self._flights[key] = _Flight()
+                else:
+                    entry = None
+            if entry is None:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+        if entry is not None:
+            if refresh is not None:
+                thread = threading.Thread(target=self._load,
+                                          args=(key, loader, refresh))
+                thread.daemon = True
+                thread.start()
+            return value
+        if leader:
+            self._load(key, loader, flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def invalidate(self, key):
+        '''
+        Drop the value for key, and the result of any load of it that
+        is still running.
+        '''
+        with self._lock:
+            self._entries.pop(key, None)
+            self._flights.pop(key, None)
+
+    def clear(self):
+        '''
+        Drop every cached value.
+        '''
+        with self._lock:
+            self._entries.clear()
+            self._flights.clear()
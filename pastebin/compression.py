@@ -0,0 +1,128 @@
+'''
+Transparent decoding of gzip and deflate response bodies.
+
+Bodies are decompressed as they are read, a chunk at a time, so a
+compressed list of pastes can still be parsed while it arrives.
+'''
+
+
+import zlib
+
+
+ACCEPT_ENCODING = 'gzip, deflate'
+WIRE_CHUNK_SIZE = 8192
+
+# gzip or zlib framing, told apart by the header
+_AUTO_WBITS = 32 + zlib.MAX_WBITS
+# the headerless deflate streams some servers send for deflate
+_RAW_WBITS = -zlib.MAX_WBITS
+
+
+def decode_response(response):
+    '''
+    Wrap response in a DecodedResponse if its body is gzip or deflate
+    encoded.
+
+    returns:
+        response itself or a DecodedResponse
+    '''
+    headers = getattr(response, 'headers', None)
+    if headers is None:
+        return response
+    encoding = (headers.get('Content-Encoding') or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip', 'deflate'):
+        return DecodedResponse(response, encoding)
+    return response
+
+
+class DecodedResponse:
+    '''
+    Decompresses the body of a response while it is read.
+
+    Any attribute not defined here is looked up on the wrapped
+    response.
+
+    attributes:
+        encoding (str): the Content-Encoding being decoded
+        wire_bytes (int): compressed bytes read from the wrapped
+                          response so far
+    '''
+
+    def __init__(self, response, encoding):
+        self._response = response
+        self.encoding = encoding
+        self.wire_bytes = 0
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self._decoder = zlib.decompressobj(_AUTO_WBITS)
+        self._started = False
+        self._buffer = b''
+        self._eof = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _decompress(self, data, limit):
+        try:
+            decoded = self._decoder.decompress(data, limit)
+        except zlib.error:
+            if self._started or self.encoding != 'deflate':
+                raise
+            self._decoder = zlib.decompressobj(_RAW_WBITS)
+            decoded = self._decoder.decompress(data, limit)
+        self._started = True
+        return decoded
+
+    def _decode_more(self, limit=0):
+        '''
+        Decode at most limit more bytes (0 for no limit), reading from
+        the wire only when the decoder has no input left.
+        '''
+        if self._decoder.unconsumed_tail:
+            return self._decompress(self._decoder.unconsumed_tail, limit)
+        if self._decoder.eof:
+            # anything after the end of the stream is padding; read it
+            # anyway so the connection can be reused
+            while True:
+                wire = self._response.read(WIRE_CHUNK_SIZE)
+                if not wire:
+                    break
+                self.wire_bytes += len(wire)
+            self._eof = True
+            return b''
+        wire = self._response.read(WIRE_CHUNK_SIZE)
+        if not wire:
+            self._eof = True
+            return self._decoder.flush()
+        self.wire_bytes += len(wire)
+        return self._decompress(wire, limit)
+
+    def read(self, amt=None):
+        if amt is None:
+            chunks = [self._buffer]
+            self._buffer = b''
+            while not self._eof:
+                chunks.append(self._decode_more())
+            return b''.join(chunks)
+        while len(self._buffer) < amt and not self._eof:
+            self._buffer += self._decode_more(amt - len(self._buffer))
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def peek(self, n=1):
+        while len(self._buffer) < n and not self._eof:
+            self._buffer += self._decode_more(n - len(self._buffer))
+        return self._buffer
+
+    def isclosed(self):
+        return self._eof and not self._buffer
+
+    def close(self):
+        self._response.close()
@@ -0,0 +1,185 @@
+'''
+Content-hash deduplication for Pastebin.create_paste.
+
+A paste is identified by the SHA-256 of its code, name, format,
+privacy, expiry option and user key. With
+Pastebin(dedupe=PasteDedupe('dedupe.db')), creating a paste identical
+to one created before returns the url of the existing paste instead of
+uploading it again, as long as that paste has most of the lifetime
+asked for left.
+'''
+
+
+import hashlib
+import time
+
+from ._sqlite import SQLiteStore
+
+
+# months are counted short, so a paste is never taken to outlive its
+# real expiry date
+EXPIRE_SECONDS = {
+    'N' : None, '10M' : 600, '1H' : 3600, '1D' : 86400, '1W' : 604800,
+    '2W' : 1209600, '1M' : 28 * 86400, '6M' : 181 * 86400,
+    '1Y' : 365 * 86400
+}
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS pastes (
+    digest TEXT PRIMARY KEY,
+    paste_url TEXT NOT NULL,
+    paste_key TEXT NOT NULL,
+    expires_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS pastes_key ON pastes (paste_key);
+CREATE INDEX IF NOT EXISTS pastes_expire ON pastes (expires_at);
+'''
+
+
+def _bytes(value):
+    if value is None:
+        return b''
+    if isinstance(value, bytes):
+        return value
+    return bytes(str(value), encoding='utf-8')
+
+
+def paste_digest(chunks, paste_name=None, paste_format=None,
+                 paste_private=0, user_key=None, paste_expire_date=None):
+    '''
+    args:
+        chunks (iterable): the paste code, as bytes or str chunks
+
+    kwargs:
+        as for Pastebin.create_paste
+
+    returns:
+        the SHA-256 identifying a paste (str)
+    '''
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(_bytes(chunk))
+    # every other field is length-prefixed, so that no two pastes
+    # produce the same input
+    for field in (paste_name, paste_format, int(paste_private or 0),
+                  user_key, paste_expire_date or 'N'):
+        field = _bytes(field)
+        digest.update(_bytes(len(field)) + b':' + field)
+    return digest.hexdigest()
+
+
+def expires_at(paste_expire_date, now=None):
+    '''
+    returns:
+        the unix time a paste created now with paste_expire_date
+        expires (int), None if it never expires
+
+    raises:
+        KeyError if paste_expire_date is not a Pastebin option
+    '''
+    seconds = EXPIRE_SECONDS[_bytes(paste_expire_date or 'N').decode(
+        encoding='utf-8')]
+    if seconds is None:
+        return None
+    return int(now if now is not None else time.time()) + seconds
+
+
+class PasteDedupe(SQLiteStore):
+    '''
+    A map from paste digests to the urls of pastes already created,
+    stored in SQLite so that processes sharing the database file share
+    the pastes.
+
+    args and kwargs:
+        as for SQLiteStore; path is ':memory:' for a private in-memory
+        map
+
+    kwargs:
+        min_remaining (float): the fraction of the lifetime asked for
+                               that a paste which expires must still
+                               have left to be reused
+
+    methods:
+        lookup
+        record
+        discard
+        purge
+        close
+    '''
+    _schema = _SCHEMA
+    _count = 'SELECT COUNT(*) FROM pastes'
+
+    def __init__(self, path=':memory:', timeout=30.0, min_remaining=0.9):
+        SQLiteStore.__init__(self, path, timeout=timeout)
+        self.min_remaining = min_remaining
+
+    def lookup(self, digest, expires_at=None, now=None):
+        '''
+        Find a paste created before that is still live.
+
+        args:
+            digest (str): from paste_digest
+
+        kwargs:
+            expires_at (int): when the paste asked for would expire,
+                              None for never; a paste that expires
+                              is only returned for one that does too,
+                              and while it has min_remaining of the
+                              time until expires_at left
+            now (int): the current unix time
+
+        returns:
+            the url of the paste (str), None if there is none
+        '''
+        now = int(now if now is not None else time.time())
+        rows = self._execute(
+            'SELECT paste_url, expires_at FROM pastes WHERE digest = ?',
+            (digest,))
+        if not rows:
+            return None
+        paste_url, stored = rows[0]
+        if stored is not None and stored <= now:
+            self._execute('DELETE FROM pastes WHERE digest = ? AND '
+                          'expires_at <= ?', (digest, now))
+            return None
+        if (stored is None) != (expires_at is None):
+            return None
+        if stored is not None and (stored - now <
+                                   (expires_at - now) * self.min_remaining):
+            # live, but it would expire well before the paste asked for
+            return None
+        return paste_url
+
+    def record(self, digest, paste_url, expires_at=None):
+        '''
+        Remember a paste that was just created.
+
+        args:
+            digest (str): from paste_digest
+            paste_url (str or bytes)
+
+        kwargs:
+            expires_at (int): when the paste expires, None for never
+        '''
+        paste_url = _bytes(paste_url).decode(encoding='utf-8').strip()
+        paste_key = paste_url.rstrip('/').rsplit('/', 1)[-1]
+        self._execute('INSERT OR REPLACE INTO pastes VALUES (?, ?, ?, ?)',
+                      (digest, paste_url, paste_key, expires_at))
+
+    def discard(self, paste_key):
+        '''
+        Forget a paste, such as one that was deleted.
+        '''
+        self._execute('DELETE FROM pastes WHERE paste_key = ?',
+                      (_bytes(paste_key).decode(encoding='utf-8'),))
+
+    def purge(self, now=None):
+        '''
+        Forget every expired paste.
+
+        returns:
+            the number of pastes forgotten (int)
+        '''
+        now = int(now if now is not None else time.time())
+        return self._write(lambda connection: connection.execute(
+            'DELETE FROM pastes WHERE expires_at <= ?', (now,)).rowcount)
@@ -0,0 +1,23 @@
+'''
+Exceptions raised by the Pastebin API wrapper.
+'''
+
+
+from http.client import HTTPException
+
+
+class PastebinHTTPError(HTTPException):
+    '''
+    Raised when the Pastebin API answers with a status other than 200.
+
+    attributes:
+        status (int)
+        reason (str)
+        headers (http.client.HTTPMessage): the response headers, if any
+    '''
+
+    def __init__(self, status, reason='', headers=None):
+        HTTPException.__init__(self, '{} {}'.format(status, reason).strip())
+        self.status = status
+        self.reason = reason
+        self.headers = headers
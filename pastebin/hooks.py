@@ -0,0 +1,129 @@
+'''
+Per-request instrumentation for Pastebin.
+
+Hooks registered with Pastebin.add_hook are called with a RequestEvent
+once for every HTTP request: when its body has been read (and parsed,
+if the caller asked for parsed results), or as soon as the request
+failed. Nothing is timed or wrapped while no hook is registered.
+'''
+
+
+import time
+
+
+class RequestEvent:
+    '''
+    What one HTTP request to Pastebin did and how long it took. Times
+    are in seconds, measured with time.perf_counter.
+
+    attributes:
+        endpoint (str): the url requested
+        api_option (str): login for api_login.php, raw for a GET
+        attempt (int): 1 for the first try, higher for retries
+        payload_bytes (int): the size of the request body
+        connect_time (float): the time spent opening a connection, 0.0
+                              if one was reused, None if the transport
+                              does not report it
+        ttfb (float): the time until the status line and headers
+                      arrived, connecting included
+        total_time (float): the time until the body was read or the
+                            request failed
+        response_bytes (int): the size of the body as read, after
+                              any decompression
+        wire_bytes (int): the size of the body as received
+        status (int): the HTTP status, None if no response arrived
+        parse_time (float): the time spent parsing the body, None if
+                            it was not parsed
+        error (Exception): what the attempt raised, None on success
+    '''
+    __slots__ = ('endpoint', 'api_option', 'attempt', 'payload_bytes',
+                 'connect_time', 'ttfb', 'total_time', 'response_bytes',
+                 'wire_bytes', 'status', 'parse_time', 'error')
+
+    def __init__(self, endpoint, api_option, attempt, payload_bytes):
+        self.endpoint = endpoint
+        self.api_option = api_option
+        self.attempt = attempt
+        self.payload_bytes = payload_bytes
+        self.connect_time = None
+        self.ttfb = None
+        self.total_time = None
+        self.response_bytes = 0
+        self.wire_bytes = 0
+        self.status = None
+        self.parse_time = None
+        self.error = None
+
+    def __repr__(self):
+        return 'RequestEvent({})'.format(', '.join(
+            '{}={!r}'.format(name, getattr(self, name))
+            for name in self.__slots__))
+
+
+class InstrumentedResponse:
+    '''
+    Wraps a transport response, counting the bytes read from it and
+    reporting its RequestEvent once the body has been read to the end
+    or the response is closed.
+
+    A caller that parses the body sets defer before reading and calls
+    finish(parse_time) itself, so the event carries the parse time.
+
+    Any attribute not defined here is looked up on the wrapped
+    response.
+    '''
+
+    def __init__(self, response, event, start, emit):
+        self._response = response
+        self.event = event
+        self.defer = False
+        self._start = start
+        self._emit = emit
+        self._read_done = False
+        self._emitted = False
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _done_reading(self):
+        if not self._read_done:
+            self._read_done = True
+            self.event.total_time = time.perf_counter() - self._start
+            self.event.wire_bytes = getattr(self._response, 'wire_bytes',
+                                            self.event.response_bytes)
+            if not self.defer:
+                self.finish()
+
+    def finish(self, parse_time=None):
+        '''
+        Report the event to the hooks, at most once.
+        '''
+        if self._emitted:
+            return
+        self._emitted = True
+        if self.event.total_time is None:
+            self.event.total_time = time.perf_counter() - self._start
+        if parse_time is not None:
+            self.event.parse_time = parse_time
+        self._emit(self.event)
+
+    def read(self, amt=None):
+        data = self._response.read(amt)
+        self.event.response_bytes += len(data)
+        isclosed = getattr(self._response, 'isclosed', None)
+        if amt is None or not data or (isclosed is not None and isclosed()):
+            self._done_reading()
+        return data
+
+    def close(self):
+        self._response.close()
+        self._done_reading()
@@ -0,0 +1,245 @@
+'''
+Request metrics for Pastebin clients, built on the RequestEvents of
+pastebin.hooks.
+
+    metrics = MetricsRegistry()
+    pastebin = Pastebin(api_key, metrics=metrics)
+    ...
+    print(metrics.to_prometheus())
+'''
+
+
+import threading
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+
+class _Histogram:
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, buckets, value):
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self, buckets):
+        cumulative = 0
+        counts = {}
+        for bound, count in zip(buckets, self.counts):
+            cumulative += count
+            counts[bound] = cumulative
+        return {'count' : self.count, 'sum' : self.sum, 'buckets' : counts}
+
+
+class _OptionMetrics:
+    __slots__ = ('statuses', 'errors', 'retries', 'request_bytes',
+                 'response_bytes', 'wire_bytes', 'duration', 'ttfb', 'parse')
+
+    def __init__(self, size):
+        self.statuses = {}
+        self.errors = {}
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.wire_bytes = 0
+        self.duration = _Histogram(size)
+        self.ttfb = _Histogram(size)
+        self.parse = _Histogram(size)
+
+
+def _pool_stats(transports):
+    totals = {}
+    for transport in transports:
+        for name, value in transport.stats().items():
+            totals[name] = totals.get(name, 0) + value
+    return totals
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+class MetricsRegistry:
+    '''
+    Thread-safe counters and latency histograms per api_option.
+
+    Register it with Pastebin(metrics=registry), or call attach(client)
+    later; several clients may share one registry. GETs of raw pastes
+    are counted under raw, and login requests under login.
+
+    kwargs:
+        buckets (tuple): histogram upper bounds, in seconds
+
+    methods:
+        attach
+        observe
+        snapshot
+        to_prometheus
+        reset
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._options = {}
+        self._transports = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'MetricsRegistry(buckets={})'.format(self.buckets)
+
+    def attach(self, client):
+        '''
+        Observe every request of client, and report the utilization of
+        its transport if that has a stats() method.
+
+        args:
+            client (Pastebin)
+        '''
+        client.add_hook(self.observe)
+        if hasattr(client.transport, 'stats'):
+            with self._lock:
+                self._transports.append(client.transport)
+
+    def observe(self, event):
+        '''
+        Record one RequestEvent; this is the hook attach registers.
+        '''
+        option = event.api_option or 'none'
+        with self._lock:
+            metrics = self._options.get(option)
+            if metrics is None:
+                metrics = self._options[option] = _OptionMetrics(
+                    len(self.buckets))
+            if event.status is not None:
+                metrics.statuses[event.status] = (
+                    metrics.statuses.get(event.status, 0) + 1)
+            if event.error is not None:
+                name = type(event.error).__name__
+                metrics.errors[name] = metrics.errors.get(name, 0) + 1
+            if event.attempt > 1:
+                metrics.retries += 1
+            metrics.request_bytes += event.payload_bytes
+            metrics.response_bytes += event.response_bytes
+            metrics.wire_bytes += event.wire_bytes
+            if event.total_time is not None:
+                metrics.duration.observe(self.buckets, event.total_time)
+            if event.ttfb is not None:
+                metrics.ttfb.observe(self.buckets, event.ttfb)
+            if event.parse_time is not None:
+                metrics.parse.observe(self.buckets, event.parse_time)
+
+    def snapshot(self):
+        '''
+        returns:
+            a dict with a requests entry, api_option -> its counters
+            and histograms, and a pool entry summing the stats() of
+            every attached transport
+        '''
+        with self._lock:
+            requests = {}
+            for option, metrics in self._options.items():
+                requests[option] = {
+                    'requests' : sum(metrics.statuses.values()),
+                    'statuses' : dict(metrics.statuses),
+                    'errors' : dict(metrics.errors),
+                    'retries' : metrics.retries,
+                    'request_bytes' : metrics.request_bytes,
+                    'response_bytes' : metrics.response_bytes,
+                    'wire_bytes' : metrics.wire_bytes,
+                    'duration' : metrics.duration.snapshot(self.buckets),
+                    'ttfb' : metrics.ttfb.snapshot(self.buckets),
+                    'parse' : metrics.parse.snapshot(self.buckets),
+                }
+            transports = list(self._transports)
+        return {'requests' : requests, 'pool' : _pool_stats(transports)}
+
+    def to_prometheus(self):
+        '''
+        returns:
+            the metrics in the Prometheus text exposition format (str)
+        '''
+        snapshot = self.snapshot()
+        lines = []
+
+        def header(name, kind, text):
+            lines.append('# HELP {} {}'.format(name, text))
+            lines.append('# TYPE {} {}'.format(name, kind))
+
+        requests = sorted(snapshot['requests'].items())
+        header('pastebin_requests_total', 'counter',
+               'HTTP responses received, by api_option and status.')
+        for option, metrics in requests:
+            for status, count in sorted(metrics['statuses'].items()):
+                lines.append('pastebin_requests_total{{api_option="{}",'
+                             'status="{}"}} {}'.format(_label(option),
+                                                        status, count))
+        header('pastebin_errors_total', 'counter',
+               'Failed request attempts, by api_option and error type.')
+        for option, metrics in requests:
+            for error, count in sorted(metrics['errors'].items()):
+                lines.append('pastebin_errors_total{{api_option="{}",'
+                             'error="{}"}} {}'.format(_label(option),
+                                                       _label(error), count))
+        for name, key, text in (
+                ('pastebin_retries_total', 'retries',
+                 'Request attempts after the first.'),
+                ('pastebin_request_bytes_total', 'request_bytes',
+                 'Request body bytes sent.'),
+                ('pastebin_response_bytes_total', 'response_bytes',
+                 'Response body bytes read, after decompression.'),
+                ('pastebin_response_wire_bytes_total', 'wire_bytes',
+                 'Response body bytes received.')):
+            header(name, 'counter', text)
+            for option, metrics in requests:
+                lines.append('{}{{api_option="{}"}} {}'.format(
+                    name, _label(option), metrics[key]))
+        for name, key, text in (
+                ('pastebin_request_duration_seconds', 'duration',
+                 'Time from sending a request to reading its body.'),
+                ('pastebin_request_ttfb_seconds', 'ttfb',
+                 'Time from sending a request to its response headers.'),
+                ('pastebin_parse_duration_seconds', 'parse',
+                 'Time spent parsing response bodies.')):
+            header(name, 'histogram', text)
+            for option, metrics in requests:
+                histogram = metrics[key]
+                label = _label(option)
+                for bound, count in sorted(histogram['buckets'].items()):
+                    lines.append('{}_bucket{{api_option="{}",le="{}"}} {}'
+                                 .format(name, label, bound, count))
+                lines.append('{}_bucket{{api_option="{}",le="+Inf"}} {}'
+                             .format(name, label, histogram['count']))
+                lines.append('{}_sum{{api_option="{}"}} {}'.format(
+                    name, label, histogram['sum']))
+                lines.append('{}_count{{api_option="{}"}} {}'.format(
+                    name, label, histogram['count']))
+        pool = snapshot['pool']
+        if pool:
+            header('pastebin_pool_connections', 'gauge',
+                   'Pooled connections, by state.')
+            for state in ('idle', 'in_use'):
+                lines.append('pastebin_pool_connections{{state="{}"}} {}'
+                             .format(state, pool.get(state, 0)))
+            for name in ('opened', 'reused'):
+                metric = 'pastebin_pool_connections_{}_total'.format(name)
+                header(metric, 'counter',
+                       'Pooled connections {} so far.'.format(name))
+                lines.append('{} {}'.format(metric, pool.get(name, 0)))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        '''
+        Forget every recorded request; attached clients stay attached.
+        '''
+        with self._lock:
+            self._options.clear()
@@ -0,0 +1,255 @@
+'''
+A local SQLite mirror of the pastes of a Pastebin account, kept up to
+date by Pastebin.sync_account and queried without touching the API.
+
+    mirror = AccountMirror('pastes.db')
+    pastebin.sync_account(mirror)
+    mirror.query(paste_format='python', since=last_week)
+'''
+
+
+import time
+from datetime import datetime
+
+from . import PastebinPaste
+from ._sqlite import SQLiteStore
+
+
+_COLUMNS = ('paste_key', 'paste_date', 'paste_title', 'paste_size',
+            'paste_expire_date', 'paste_private', 'paste_format_long',
+            'paste_format_short', 'paste_url', 'paste_hits')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS pastes (
+    paste_key TEXT PRIMARY KEY,
+    paste_date INTEGER,
+    paste_title TEXT,
+    paste_size INTEGER,
+    paste_expire_date INTEGER,
+    paste_private INTEGER,
+    paste_format_long TEXT,
+    paste_format_short TEXT,
+    paste_url TEXT,
+    paste_hits INTEGER
+);
+CREATE INDEX IF NOT EXISTS pastes_date ON pastes (paste_date);
+CREATE INDEX IF NOT EXISTS pastes_format ON pastes (paste_format_short);
+CREATE INDEX IF NOT EXISTS pastes_expire ON pastes (paste_expire_date);
+CREATE TABLE IF NOT EXISTS sync (
+    name TEXT PRIMARY KEY,
+    value INTEGER
+);
+'''
+
+_SELECT = 'SELECT {} FROM pastes'.format(', '.join(_COLUMNS))
+_INSERT = 'INSERT INTO pastes ({}) VALUES ({})'.format(
+    ', '.join(_COLUMNS), ', '.join('?' * len(_COLUMNS)))
+_UPDATE = 'UPDATE pastes SET {} WHERE paste_key = ?'.format(
+    ', '.join('{} = ?'.format(column) for column in _COLUMNS[1:]))
+
+
+def _timestamp(value):
+    '''
+    A datetime or unix timestamp as an int; None stays None.
+    '''
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+def _row(paste):
+    private = paste.paste_private
+    return (paste.paste_key, _timestamp(paste.paste_date), paste.paste_title,
+            paste.paste_size, _timestamp(paste.paste_expire_date),
+            None if private is None else int(private),
+            paste.paste_format_long, paste.paste_format_short,
+            paste.paste_url, paste.paste_hits)
+
+
+class SyncSummary:
+    '''
+    The outcome of a Pastebin.sync_account call.
+
+    attributes:
+        inserted (list): the keys of pastes new to the mirror
+        updated (list): the keys of pastes whose metadata changed
+        deleted (list): the keys of pastes no longer in the account
+        unchanged (int): the number of pastes left as they were
+        complete (bool): False if the listing may have been cut short
+                         by results_limit, in which case nothing was
+                         deleted
+    '''
+
+    def __init__(self, complete=True):
+        self.inserted = []
+        self.updated = []
+        self.deleted = []
+        self.unchanged = 0
+        self.complete = complete
+
+    @property
+    def changed(self):
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def __repr__(self):
+        return ('SyncSummary(inserted={}, updated={}, deleted={}, '
+                'unchanged={})'.format(len(self.inserted), len(self.updated),
+                                       len(self.deleted), self.unchanged))
+
+
+class AccountMirror(SQLiteStore):
+    '''
+    PastebinPaste metadata stored in SQLite, indexed by key, date,
+    format and expiry date.
+
+    One mirror may be shared by several threads, and several processes
+    may open the same database file; each sync is applied in a single
+    transaction, so readers see the mirror before or after it.
+
+    args and kwargs:
+        as for SQLiteStore; path is ':memory:' for a private in-memory
+        mirror
+
+    methods:
+        apply
+        get
+        query
+        expired
+        keys
+        close
+    '''
+    _schema = _SCHEMA
+    _count = 'SELECT COUNT(*) FROM pastes'
+
+    def __contains__(self, paste_key):
+        return bool(self._execute(
+            'SELECT 1 FROM pastes WHERE paste_key = ?', (paste_key,)))
+
+    def apply(self, pastes, complete=True):
+        '''
+        Bring the mirror in line with a listing of the account, writing
+        only the rows that differ from it.
+
+        args:
+            pastes (iterable): the PastebinPastes listed
+
+        kwargs:
+            complete (bool): whether pastes is the whole account; if
+                             not, mirrored pastes missing from it are
+                             kept
+
+        returns:
+            SyncSummary object
+        '''
+        rows = {}
+        for paste in pastes:
+            rows[paste.paste_key] = _row(paste)
+
+        def operations(connection):
+            # a concurrent sync cannot change the rows between the diff
+            # and the writes
+            summary = SyncSummary(complete=complete)
+            current = {row[0] : row for row in connection.execute(_SELECT)}
+            inserts, updates = [], []
+            for paste_key, row in rows.items():
+                existing = current.get(paste_key)
+                if existing is None:
+                    inserts.append(row)
+                    summary.inserted.append(paste_key)
+                elif existing != row:
+                    updates.append(row[1:] + row[:1])
+                    summary.updated.append(paste_key)
+                else:
+                    summary.unchanged += 1
+            if complete:
+                summary.deleted = [paste_key for paste_key in current
+                                   if paste_key not in rows]
+            connection.executemany(_INSERT, inserts)
+            connection.executemany(_UPDATE, updates)
+            connection.executemany(
+                'DELETE FROM pastes WHERE paste_key = ?',
+                [(paste_key,) for paste_key in summary.deleted])
+            connection.execute('INSERT OR REPLACE INTO sync VALUES (?, ?)',
+                               ('synced_at', int(time.time())))
+            return summary
+
+        return self._write(operations)
+
+    @property
+    def synced_at(self):
+        '''
+        The unix time of the last sync (int), None if there was none.
+        '''
+        rows = self._execute("SELECT value FROM sync WHERE name = 'synced_at'")
+        return rows[0][0] if rows else None
+
+    def get(self, paste_key):
+        '''
+        returns:
+            the mirrored PastebinPaste, None if there is no such paste
+        '''
+        rows = self._execute(_SELECT + ' WHERE paste_key = ?', (paste_key,))
+        return PastebinPaste(*rows[0]) if rows else None
+
+    def query(self, paste_format=None, private=None, since=None, until=None,
+              expires_before=None, order_by='paste_date', descending=True,
+              limit=None):
+        '''
+        Select mirrored pastes; every filter given must match.
+
+        kwargs:
+            paste_format (str): a paste_format_short such as 'python'
+            private (int or PastePrivacy)
+            since (datetime or int): created at or after this time
+            until (datetime or int): created before this time
+            expires_before (datetime or int): set to expire before this
+                                              time
+            order_by (str): a PastebinPaste attribute
+            descending (bool)
+            limit (int)
+
+        returns:
+            a list of PastebinPaste objects
+        '''
+        if order_by not in _COLUMNS:
+            raise ValueError('cannot order by {!r}'.format(order_by))
+        clauses, parameters = [], []
+        for clause, value in (
+                ('paste_format_short = ?', paste_format),
+                ('paste_private = ?',
+                 None if private is None else int(private)),
+                ('paste_date >= ?', _timestamp(since)),
+                ('paste_date < ?', _timestamp(until)),
+                ('paste_expire_date < ?', _timestamp(expires_before))):
+            if value is not None:
+                clauses.append(clause)
+                parameters.append(value)
+        sql = _SELECT
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY {} {}'.format(order_by,
+                                        'DESC' if descending else 'ASC')
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(int(limit))
+        return [PastebinPaste(*row) for row in self._execute(sql, parameters)]
+
+    def expired(self, now=None):
+        '''
+        returns:
+            the mirrored pastes whose expiry date has passed, oldest
+            first (list)
+        '''
+        return self.query(expires_before=now if now is not None
+                          else int(time.time()),
+                          order_by='paste_expire_date', descending=False)
+
+    def keys(self):
+        '''
+        returns:
+            the keys of every mirrored paste (set)
+        '''
+        return {row[0] for row in
+                self._execute('SELECT paste_key FROM pastes')}
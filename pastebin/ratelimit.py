@@ -0,0 +1,170 @@
+'''
+Client-side rate limiting for Pastebin API calls.
+'''
+
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    '''
+    A thread-safe token bucket.
+
+    Tokens refill continuously at rate per second up to capacity.
+    Callers reserve a token and are told how long to wait for it, so
+    the lock is never held while sleeping.
+
+    args:
+        rate (float): tokens added per second
+
+    kwargs:
+        capacity (float): the largest burst allowed, defaults to rate
+                          (but at least one token)
+
+    methods:
+        reserve
+        try_acquire
+        acquire
+    '''
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None
+                              else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'TokenBucket(rate={}, capacity={})'.format(self.rate,
+                                                          self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def reserve(self, tokens=1):
+        '''
+        Take tokens from the bucket, going into debt if necessary.
+
+        returns:
+            the number of seconds to wait before the tokens are
+            actually available (float)
+        '''
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self, tokens=1):
+        '''
+        Take tokens only if they are available right now.
+
+        returns:
+            True if the tokens were taken (bool)
+        '''
+        with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def acquire(self, tokens=1):
+        '''
+        Block until tokens are available.
+        '''
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class RateLimiter:
+    '''
+    Token buckets per API key and api_option, shared by every request
+    made through a Pastebin or AsyncPastebin instance.
+
+    Each request takes one token from the bucket of its developer key
+    and, for logged in calls, one from the bucket of its user key, so
+    several clients sharing a RateLimiter also share its budget.
+
+    kwargs:
+        rates (dict): api_option -> rate per second, or a
+                      (rate, capacity) tuple; the options used by the
+                      wrapper are login, paste, list, trends, delete,
+                      userdetails and raw, which GETs of raw pastes
+                      use
+        default (float or tuple): the rate for options missing from
+                                  rates, unlimited if None
+
+    methods:
+        reserve
+        acquire
+        acquire_async
+    '''
+
+    def __init__(self, rates=None, default=None):
+        self.rates = dict(rates or {})
+        self.default = default
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'RateLimiter(rates={}, default={})'.format(self.rates,
+                                                          self.default)
+
+    def _bucket(self, key, api_option):
+        rate = self.rates.get(api_option, self.default)
+        if rate is None:
+            return None
+        with self._lock:
+            bucket = self._buckets.get((key, api_option))
+            if bucket is None:
+                if isinstance(rate, tuple):
+                    bucket = TokenBucket(*rate)
+                else:
+                    bucket = TokenBucket(rate)
+                self._buckets[(key, api_option)] = bucket
+            return bucket
+
+    def reserve(self, api_option, *keys):
+        '''
+        Take a token for api_option from the bucket of every key.
+
+        args:
+            api_option (str)
+            keys (bytes): the developer key and, if any, the user key
+
+        returns:
+            the number of seconds to wait before sending (float)
+        '''
+        delay = 0.0
+        for key in keys:
+            bucket = self._bucket(key, api_option)
+            if bucket is not None:
+                delay = max(delay, bucket.reserve())
+        return delay
+
+    def acquire(self, api_option, *keys):
+        '''
+        Block the calling thread until a request may be sent.
+        '''
+        delay = self.reserve(api_option, *keys)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, api_option, *keys):
+        '''
+        Suspend the calling coroutine until a request may be sent.
+        '''
+        delay = self.reserve(api_option, *keys)
+        if delay > 0:
+            await asyncio.sleep(delay)
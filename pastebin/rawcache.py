@@ -0,0 +1,332 @@
+'''
+A content-addressed cache of raw paste contents, on disk with a memory
+tier on top, for Pastebin.fetch_raw and Pastebin.iter_raw.
+
+On disk, every distinct content is stored once under its SHA-256 in
+objects/, and keys/ maps each paste_key to a hash and size:
+
+    path/objects/3f/3f5a...   the content
+    path/keys/AbCd1234        "3f5a... 1234"
+
+Both are written to a temporary file and renamed into place, so a
+reader sees either nothing or a complete file, and several processes
+can share one cache directory. Contents are evicted least recently
+used first once the objects outgrow max_size, down to EVICT_TO of it.
+'''
+
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+# the fraction of max_size the objects are evicted down to once they
+# outgrow it
+EVICT_TO = 0.9
+
+_KEY_NAME = re.compile(r'[A-Za-z0-9_-]{1,200}')
+
+
+def _key_name(paste_key):
+    if isinstance(paste_key, bytes):
+        paste_key = paste_key.decode(encoding='utf-8')
+    if _KEY_NAME.fullmatch(paste_key):
+        return paste_key
+    return 'x' + paste_key.encode('utf-8').hex()
+
+
+class _Writer:
+    '''
+    Receives a content as it is downloaded and stores it once it is
+    complete; an abandoned download leaves nothing behind.
+    '''
+
+    def __init__(self, cache, name):
+        self._cache = cache
+        self._name = name
+        self._hash = hashlib.sha256()
+        self._size = 0
+        fd, self._temp_path = tempfile.mkstemp(dir=cache._temp_dir,
+                                               prefix='.raw-')
+        self._file = os.fdopen(fd, 'wb')
+        self._done = False
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self._size += len(chunk)
+
+    def commit(self):
+        if self._done:
+            return
+        self._done = True
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._cache._store(self._name, self._temp_path,
+                           self._hash.hexdigest(), self._size)
+
+    def abort(self):
+        if self._done:
+            return
+        self._done = True
+        self._file.close()
+        self._cache._unlink(self._temp_path)
+
+
+class RawCache:
+    '''
+    A size-bounded LRU cache of raw paste contents, keyed by paste_key
+    and stored by content hash.
+
+    args:
+        path (str): the cache directory, created if missing
+
+    kwargs:
+        max_size (int): bytes of content kept on disk
+        memory_size (int): bytes of content kept in memory; contents
+                           larger than a quarter of it stay on disk only
+
+    methods:
+        get
+        open
+        put
+        writer
+        discard
+        clear
+    '''
+
+    def __init__(self, path, max_size=256 * 1024 * 1024,
+                 memory_size=16 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self.memory_size = memory_size
+        self._objects_dir = os.path.join(path, 'objects')
+        self._keys_dir = os.path.join(path, 'keys')
+        self._temp_dir = os.path.join(path, 'tmp')
+        for directory in (self._objects_dir, self._keys_dir, self._temp_dir):
+            os.makedirs(directory, exist_ok=True)
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'RawCache({!r}, max_size={})'.format(self.path, self.max_size)
+
+    def _object_path(self, digest):
+        return os.path.join(self._objects_dir, digest[:2], digest)
+
+    def _key_path(self, name):
+        return os.path.join(self._keys_dir, name)
+
+    def _lookup(self, name):
+        try:
+            with open(self._key_path(name), encoding='ascii') as entry:
+                digest, size = entry.read().split()
+        except (FileNotFoundError, ValueError):
+            return None, None
+        return digest, int(size)
+
+    def _remember(self, name, digest, data):
+        if len(data) > self.memory_size // 4:
+            return
+        with self._lock:
+            previous = self._memory.pop(name, None)
+            if previous is not None:
+                self._memory_used -= len(previous[1])
+            self._memory[name] = (digest, data)
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_size:
+                _, (_, dropped) = self._memory.popitem(last=False)
+                self._memory_used -= len(dropped)
+
+    def _from_memory(self, name, size):
+        with self._lock:
+            entry = self._memory.get(name)
+            if entry is None:
+                return None
+            if size is not None and len(entry[1]) != size:
+                return None
+            self._memory.move_to_end(name)
+            return entry[1]
+
+    def open(self, paste_key, size=None):
+        '''
+        Open the cached content of a paste for reading.
+
+        args:
+            paste_key (str)
+
+        kwargs:
+            size (int): the expected length, as in paste_size; a cached
+                        content of another length is a miss
+
+        returns:
+            a binary file object, or bytes if the content is held in
+            memory, None on a miss
+        '''
+        name = _key_name(paste_key)
+        data = self._from_memory(name, size)
+        if data is not None:
+            return data
+        digest, stored_size = self._lookup(name)
+        if digest is None or (size is not None and stored_size != size):
+            return None
+        path = self._object_path(digest)
+        try:
+            content = open(path, 'rb')
+        except FileNotFoundError:
+            # evicted by another process; drop the dangling key
+            self._unlink(self._key_path(name))
+            return None
+        try:
+            # the modification time orders eviction
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        if stored_size <= self.memory_size // 4:
+            with content:
+                data = content.read()
+            self._remember(name, digest, data)
+            return data
+        return content
+
+    def get(self, paste_key, size=None):
+        '''
+        returns:
+            the cached content of a paste (bytes), None on a miss
+        '''
+        content = self.open(paste_key, size=size)
+        if content is None or isinstance(content, bytes):
+            return content
+        with content:
+            return content.read()
+
+    def writer(self, paste_key):
+        '''
+        Start storing the content of a paste as it arrives.
+
+        returns:
+            an object with write(chunk), commit() and abort()
+        '''
+        return _Writer(self, _key_name(paste_key))
+
+    def put(self, paste_key, content):
+        '''
+        Store the content of a paste.
+
+        args:
+            paste_key (str)
+            content (bytes or iterable of bytes)
+        '''
+        writer = self.writer(paste_key)
+        try:
+            if isinstance(content, (bytes, bytearray, memoryview)):
+                writer.write(content)
+            else:
+                for chunk in content:
+                    writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+
+    def _store(self, name, temp_path, digest, size):
+        path = self._object_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        new = not os.path.exists(path)
+        try:
+            if new:
+                os.replace(temp_path, path)
+            else:
+                # stored for another paste already, and counted then
+                os.unlink(temp_path)
+                os.utime(path)
+        except FileNotFoundError:
+            # removed by clear while it was being written, or the
+            # stored copy was evicted meanwhile
+            return
+        fd, entry_path = tempfile.mkstemp(dir=self._temp_dir, prefix='.key-')
+        with os.fdopen(fd, 'w', encoding='ascii') as entry:
+            entry.write('{} {}'.format(digest, size))
+        os.replace(entry_path, self._key_path(name))
+        with self._lock:
+            entry = self._memory.pop(name, None)
+            if entry is not None:
+                self._memory_used -= len(entry[1])
+            if self._disk_used is None:
+                self._disk_used = self._scan()[1]
+            elif new:
+                self._disk_used += size
+            over = self._disk_used > self.max_size
+        if over:
+            self._evict()
+
+    def _scan(self):
+        objects = []
+        total = 0
+        for prefix in os.scandir(self._objects_dir):
+            if not prefix.is_dir():
+                continue
+            for item in os.scandir(prefix.path):
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                objects.append((stat.st_mtime, stat.st_size, item.path))
+                total += stat.st_size
+        return objects, total
+
+    def _evict(self):
+        # evicting down to a low-water mark leaves room for many more
+        # writes before the next scan; the keys of evicted contents are
+        # dropped by open once it finds them dangling
+        objects, total = self._scan()
+        objects.sort()
+        low_water = self.max_size * EVICT_TO
+        for _, size, path in objects:
+            if total <= low_water:
+                break
+            self._unlink(path)
+            total -= size
+        with self._lock:
+            self._disk_used = total
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def discard(self, paste_key):
+        '''
+        Forget a paste; its content stays stored for other pastes with
+        the same content until it is evicted.
+        '''
+        name = _key_name(paste_key)
+        with self._lock:
+            entry = self._memory.pop(name, None)
+            if entry is not None:
+                self._memory_used -= len(entry[1])
+        self._unlink(self._key_path(name))
+
+    def clear(self):
+        '''
+        Drop every cached content, from memory and disk, along with
+        the temporary files of downloads that were never finished.
+        Downloads still in progress are lost.
+        '''
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            self._disk_used = 0
+        for directory in (self._keys_dir, self._objects_dir,
+                          self._temp_dir):
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    self._unlink(os.path.join(root, name))
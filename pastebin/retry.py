@@ -0,0 +1,103 @@
+'''
+Retrying of transient Pastebin API failures.
+'''
+
+
+import random
+import socket
+from http.client import BadStatusLine, IncompleteRead
+from urllib.error import URLError
+
+from .exceptions import PastebinHTTPError
+
+
+class RetryPolicy:
+    '''
+    Decides whether a failed request is tried again and how long to
+    wait first.
+
+    Delays use exponential backoff with full jitter: before attempt
+    n + 1 the client sleeps a random time between 0 and
+    min(backoff_cap, backoff_base * 2 ** (n - 1)) seconds, or for the
+    server's Retry-After if that is longer.
+
+    kwargs:
+        max_attempts (int): the total number of attempts, 1 disables
+                            retrying
+        backoff_base (float): seconds
+        backoff_cap (float): seconds
+        retry_statuses (tuple): HTTP statuses worth retrying
+        retry_exceptions (tuple): exception classes worth retrying
+        retry_paste (bool): creating a paste is not idempotent, so a
+                            request with api_option=paste is only
+                            retried if this is true
+
+    methods:
+        is_retryable
+        backoff
+    '''
+
+    def __init__(self, max_attempts=3, backoff_base=0.5, backoff_cap=30.0,
+                 retry_statuses=(429, 500, 502, 503, 504),
+                 retry_exceptions=(ConnectionError, TimeoutError,
+                                   socket.timeout, URLError, IncompleteRead,
+                                   BadStatusLine),
+                 retry_paste=False):
+        if max_attempts < 1:
+            raise ValueError('max_attempts must be at least 1')
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_exceptions = tuple(retry_exceptions)
+        self.retry_paste = retry_paste
+
+    def __repr__(self):
+        return 'RetryPolicy(max_attempts={}, backoff_base={}, ' \
+               'backoff_cap={})'.format(self.max_attempts,
+                                        self.backoff_base, self.backoff_cap)
+
+    def is_retryable(self, api_option, attempt, error):
+        '''
+        args:
+            api_option (str): the api_option sent, raw for a GET
+            attempt (int): the number of the attempt that failed,
+                           starting at 1
+            error (Exception): what the attempt raised
+
+        returns:
+            True if another attempt should be made (bool)
+        '''
+        if attempt >= self.max_attempts:
+            return False
+        if api_option == 'paste' and not self.retry_paste:
+            return False
+        if isinstance(error, PastebinHTTPError):
+            return error.status in self.retry_statuses
+        return isinstance(error, self.retry_exceptions)
+
+    def backoff(self, attempt, error=None):
+        '''
+        args:
+            attempt (int): the number of the attempt that failed
+
+        kwargs:
+            error (Exception): what the attempt raised; the Retry-After
+                               header of a PastebinHTTPError is honoured
+
+        returns:
+            the number of seconds to wait (float)
+        '''
+        ceiling = min(self.backoff_cap,
+                      self.backoff_base * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        retry_after = None
+        if getattr(error, 'headers', None) is not None:
+            retry_after = error.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                delay = max(delay, min(self.backoff_cap, float(retry_after)))
+            except ValueError:
+                # an HTTP date rather than a number of seconds
+                pass
+        return delay
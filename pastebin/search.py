@@ -0,0 +1,311 @@
+'''
+A full-text index over paste contents, stored in SQLite and updated a
+paste at a time by Pastebin.index_pastes.
+
+    index = SearchIndex('search.db')
+    for result in pastebin.index_pastes(index, mirror.query()):
+        ...
+    index.search('connection refused')
+
+Contents are split into lowercase word tokens, and each token maps to
+the pastes containing it and how often. A query matches the pastes
+containing every one of its tokens, best first.
+'''
+
+
+import hashlib
+import math
+import re
+import zlib
+from collections import Counter
+
+from ._sqlite import SQLiteStore
+
+
+# longer runs of word characters are hashes, base64 and the like,
+# which nobody searches for by their middle
+MAX_TOKEN_LENGTH = 64
+
+_TOKEN = re.compile(r'\w+')
+_SPACE = re.compile(r'\s+')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    paste_key TEXT UNIQUE NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    content BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    document INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (term, document)
+) WITHOUT ROWID;
+'''
+
+
+def _text(content):
+    if isinstance(content, str):
+        return content
+    return bytes(content).decode(encoding='utf-8', errors='replace')
+
+
+def tokenize(text):
+    '''
+    returns:
+        the lowercase word tokens of text, in order (list)
+    '''
+    return [token for token in _TOKEN.findall(text.lower())
+            if len(token) <= MAX_TOKEN_LENGTH]
+
+
+def _delete(connection, document):
+    '''
+    Drop a document and its postings, which are found by tokenizing
+    its content again rather than through an index on postings that
+    every insert would have to update.
+    '''
+    content, = connection.execute(
+        'SELECT content FROM documents WHERE id = ?', (document,)).fetchone()
+    terms = set(tokenize(_text(zlib.decompress(content))))
+    connection.executemany(
+        'DELETE FROM postings WHERE term = ? AND document = ?',
+        [(term, document) for term in terms])
+    connection.execute('DELETE FROM documents WHERE id = ?', (document,))
+
+
+def _snippet(text, terms, size):
+    pattern = re.compile(r'(?<!\w)(?:{})(?!\w)'.format(
+        '|'.join(re.escape(term) for term in terms)), re.IGNORECASE)
+    match = pattern.search(text)
+    start = 0 if match is None else max(0, match.start() - size // 3)
+    end = start + size
+    snippet = _SPACE.sub(' ', text[start:end]).strip()
+    if start > 0:
+        snippet = '...' + snippet
+    if end < len(text):
+        snippet += '...'
+    return snippet
+
+
+class SearchHit:
+    '''
+    One paste matching a SearchIndex query.
+
+    attributes:
+        paste_key (str)
+        snippet (str): the text around the first match
+        score (float): higher is a better match
+    '''
+
+    def __init__(self, paste_key, snippet, score):
+        self.paste_key = paste_key
+        self.snippet = snippet
+        self.score = score
+
+    def __repr__(self):
+        return 'SearchHit({!r}, {!r}, score={:.3f})'.format(
+            self.paste_key, self.snippet, self.score)
+
+
+class SearchIndex(SQLiteStore):
+    '''
+    An inverted index of paste contents in a SQLite database.
+
+    Adding a paste whose content is unchanged does nothing, so the
+    index can be fed the same pastes on every run. One index may be
+    shared by several threads, and several processes may open the same
+    database file.
+
+    args and kwargs:
+        as for SQLiteStore; path is ':memory:' for a private in-memory
+        index
+
+    methods:
+        add
+        add_many
+        remove
+        prune
+        indexed
+        search
+        keys
+        close
+    '''
+    _schema = _SCHEMA
+    _count = 'SELECT COUNT(*) FROM documents'
+
+    def __contains__(self, paste_key):
+        return bool(self._execute(
+            'SELECT 1 FROM documents WHERE paste_key = ?', (paste_key,)))
+
+    def indexed(self, paste_key, size=None):
+        '''
+        returns:
+            True if the paste is indexed, and with the given size if
+            size is not None (bool)
+        '''
+        rows = self._execute(
+            'SELECT size FROM documents WHERE paste_key = ?', (paste_key,))
+        return bool(rows) and (size is None or rows[0][0] == size)
+
+    def add(self, paste_key, content):
+        '''
+        Index the content of a paste, replacing what was indexed for
+        it before.
+
+        args:
+            paste_key (str)
+            content (bytes or str)
+
+        returns:
+            False if the same content was already indexed, else True
+        '''
+        return self.add_many([(paste_key, content)])[0]
+
+    def add_many(self, items):
+        '''
+        Index the contents of many pastes in a single transaction,
+        which is much faster than adding them one at a time.
+
+        args:
+            items (iterable): (paste_key, content) pairs
+
+        returns:
+            a list of bools, as add returns for each item
+        '''
+        documents = []
+        for paste_key, content in items:
+            if isinstance(content, str):
+                content = bytes(content, encoding='utf-8')
+            counts = Counter(tokenize(_text(content)))
+            documents.append((paste_key, hashlib.sha256(content).hexdigest(),
+                              len(content), zlib.compress(content),
+                              sorted(counts.items())))
+
+        def operations(connection):
+            added = []
+            for paste_key, digest, size, compressed, counts in documents:
+                row = connection.execute(
+                    'SELECT id, digest FROM documents WHERE paste_key = ?',
+                    (paste_key,)).fetchone()
+                if row is not None and row[1] == digest:
+                    added.append(False)
+                    continue
+                if row is not None:
+                    _delete(connection, row[0])
+                document = connection.execute(
+                    'INSERT INTO documents (paste_key, digest, size, content) '
+                    'VALUES (?, ?, ?, ?)',
+                    (paste_key, digest, size, compressed)).lastrowid
+                connection.executemany(
+                    'INSERT INTO postings VALUES (?, ?, ?)',
+                    [(term, document, count) for term, count in counts])
+                added.append(True)
+            return added
+
+        return self._write(operations)
+
+    def remove(self, paste_key):
+        '''
+        Drop a paste from the index.
+
+        returns:
+            True if it was indexed (bool)
+        '''
+        def operations(connection):
+            row = connection.execute(
+                'SELECT id FROM documents WHERE paste_key = ?',
+                (paste_key,)).fetchone()
+            if row is None:
+                return False
+            _delete(connection, row[0])
+            return True
+
+        return self._write(operations)
+
+    def prune(self, paste_keys):
+        '''
+        Drop every indexed paste whose key is not in paste_keys, such
+        as the keys() of an AccountMirror after a sync.
+
+        returns:
+            the number of pastes dropped (int)
+        '''
+        keep = set(paste_keys)
+
+        def operations(connection):
+            rows = connection.execute('SELECT id, paste_key FROM documents')
+            dropped = [document for document, paste_key in rows
+                       if paste_key not in keep]
+            for document in dropped:
+                _delete(connection, document)
+            return len(dropped)
+
+        return self._write(operations)
+
+    def search(self, query, limit=20, snippet_size=120):
+        '''
+        Find the pastes containing every token of query.
+
+        Pastes are ranked by how often they contain each token,
+        weighted towards tokens that few pastes contain.
+
+        args:
+            query (str)
+
+        kwargs:
+            limit (int): the most hits to return
+            snippet_size (int): the length of each snippet
+
+        returns:
+            a list of SearchHit objects, best first
+        '''
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+
+        def operations(connection):
+            total = connection.execute(
+                'SELECT COUNT(*) FROM documents').fetchone()[0]
+            postings = []
+            for term in terms:
+                counts = dict(connection.execute(
+                    'SELECT document, count FROM postings WHERE term = ?',
+                    (term,)))
+                if not counts:
+                    return []
+                postings.append(counts)
+            postings.sort(key=len)
+            scores = {}
+            for document in postings[0]:
+                if all(document in counts for counts in postings[1:]):
+                    scores[document] = sum(
+                        counts[document] * math.log(1 + total / len(counts))
+                        for counts in postings)
+            best = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+            found = []
+            for document, score in best:
+                row = connection.execute(
+                    'SELECT paste_key, content FROM documents WHERE id = ?',
+                    (document,)).fetchone()
+                if row is not None:
+                    found.append((row[0], row[1], score))
+            return found
+
+        # one transaction, so that a paste removed by another process
+        # cannot vanish between its postings and its document
+        return [SearchHit(paste_key,
+                          _snippet(_text(zlib.decompress(content)), terms,
+                                   snippet_size),
+                          score)
+                for paste_key, content, score in self._read(operations)]
+
+    def keys(self):
+        '''
+        returns:
+            the keys of every indexed paste (set)
+        '''
+        return {row[0] for row in
+                self._execute('SELECT paste_key FROM documents')}
@@ -0,0 +1,192 @@
+'''
+Stores for Pastebin user keys, so that clients can share a login
+instead of each calling api_login.php.
+'''
+
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # no inter-process locking on this platform; writes are still atomic
+    fcntl = None
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode(encoding='utf-8')
+    return value
+
+
+class SessionStore:
+    '''
+    Base class for user_key stores.
+
+    Subclasses implement get, set and delete. get_or_create and
+    discard are built on those, and stores that can make them atomic
+    should override them.
+
+    methods:
+        get
+        set
+        delete
+        get_or_create
+        discard
+    '''
+
+    def get(self, user_name):
+        '''
+        returns:
+            the stored user_key (bytes), None if there is none
+        '''
+        raise NotImplementedError
+
+    def set(self, user_name, user_key):
+        raise NotImplementedError
+
+    def delete(self, user_name):
+        raise NotImplementedError
+
+    def get_or_create(self, user_name, create):
+        '''
+        Return the stored user_key, calling create() to obtain and
+        store one if there is none.
+        '''
+        user_key = self.get(user_name)
+        if user_key is None:
+            user_key = create()
+            self.set(user_name, user_key)
+        return user_key
+
+    def discard(self, user_name, user_key):
+        '''
+        Delete the stored user_key, but only if it is still user_key;
+        another client may already have replaced it.
+        '''
+        if self.get(user_name) == user_key:
+            self.delete(user_name)
+
+
+class MemorySessionStore(SessionStore):
+    '''
+    A user_key store shared by the threads of one process.
+    '''
+
+    def __init__(self):
+        self._keys = {}
+        self._lock = threading.RLock()
+
+    def get(self, user_name):
+        return self._keys.get(_text(user_name))
+
+    def set(self, user_name, user_key):
+        self._keys[_text(user_name)] = user_key
+
+    def delete(self, user_name):
+        self._keys.pop(_text(user_name), None)
+
+    def get_or_create(self, user_name, create):
+        with self._lock:
+            return SessionStore.get_or_create(self, user_name, create)
+
+    def discard(self, user_name, user_key):
+        with self._lock:
+            SessionStore.discard(self, user_name, user_key)
+
+
+class FileSessionStore(SessionStore):
+    '''
+    A user_key store in a JSON file shared by several processes.
+
+    Writes go to a temporary file that replaces the store atomically,
+    and every operation holds a lock on path + '.lock' (where fcntl is
+    available), so only one process logs in for a user name while the
+    others wait for its key.
+
+    args:
+        path (str)
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._lock_path = path + '.lock'
+        self._thread_lock = threading.RLock()
+
+    def __repr__(self):
+        return 'FileSessionStore({!r})'.format(self.path)
+
+    @contextmanager
+    def _locked(self, exclusive):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file,
+                            fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as store:
+                return json.load(store)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, keys):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.session-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as store:
+                json.dump(keys, store)
+                store.flush()
+                os.fsync(store.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def get(self, user_name):
+        with self._locked(exclusive=False):
+            user_key = self._read().get(_text(user_name))
+        if user_key is None:
+            return None
+        return bytes(user_key, encoding='utf-8')
+
+    def set(self, user_name, user_key):
+        with self._locked(exclusive=True):
+            keys = self._read()
+            keys[_text(user_name)] = _text(user_key)
+            self._write(keys)
+
+    def delete(self, user_name):
+        with self._locked(exclusive=True):
+            keys = self._read()
+            if keys.pop(_text(user_name), None) is not None:
+                self._write(keys)
+
+    def get_or_create(self, user_name, create):
+        with self._locked(exclusive=True):
+            user_key = self._read().get(_text(user_name))
+            if user_key is not None:
+                return bytes(user_key, encoding='utf-8')
+            user_key = create()
+            keys = self._read()
+            keys[_text(user_name)] = _text(user_key)
+            self._write(keys)
+            return user_key
+
+    def discard(self, user_name, user_key):
+        with self._locked(exclusive=True):
+            keys = self._read()
+            if keys.get(_text(user_name)) == _text(user_key):
+                del keys[_text(user_name)]
+                self._write(keys)
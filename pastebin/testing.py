@@ -0,0 +1,445 @@
+'''
+A local stand-in for the Pastebin API, for offline tests, benchmarks
+and load tests.
+
+    with FakePastebinServer() as server:
+        pastebin = Pastebin(server.api.dev_key, base_url=server.url)
+        pastebin.login('user', 'password')
+
+FakePastebinAPI.respond can also back a MemoryTransport, which skips
+the sockets altogether.
+'''
+
+
+import gzip
+import random
+import string
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+from .ratelimit import TokenBucket
+
+
+_EXPIRE_SECONDS = {
+    'N' : None, '10M' : 600, '1H' : 3600, '1D' : 86400, '1W' : 604800,
+    '2W' : 1209600, '1M' : 2592000, '6M' : 15552000, '1Y' : 31536000
+}
+_KEY_CHARACTERS = string.ascii_letters + string.digits
+
+
+class FakePastebinAPI:
+    '''
+    An in-memory model of api_login.php, api_post.php, api_raw.php and
+    the public /raw/ pages, answering the way pastebin.com does,
+    including its 200 "Bad API request" errors.
+
+    kwargs:
+        dev_key (str): the only api_dev_key accepted
+        users (dict): user name -> password
+        latency (float): seconds every request is delayed by
+        error_rate (float): the fraction of requests answered with
+                            error_status instead of being handled
+        error_status (int)
+        rate_limit (float): requests per second allowed per dev key;
+                            requests over it are answered with 429
+        seed (int): seeds the generated paste and user keys
+        compress (bool): gzip 200 bodies for clients that accept it
+
+    attributes:
+        calls (collections.Counter): requests handled per api_option,
+                                     login for api_login.php
+
+    methods:
+        add_paste
+        paste_code
+        fail_next
+        expire_user_key
+        handle
+        respond
+    '''
+
+    def __init__(self, dev_key='dev-key', users=None, latency=0.0,
+                 error_rate=0.0, error_status=503, rate_limit=None,
+                 seed=None, compress=False):
+        self.dev_key = dev_key
+        self.users = dict(users if users is not None
+                          else {'user' : 'password'})
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.compress = compress
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._pastes = {}
+        self._user_keys = {}
+        self._failures = []
+        self._buckets = {}
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return 'FakePastebinAPI(dev_key={!r})'.format(self.dev_key)
+
+    def _new_key(self, length):
+        return ''.join(self._random.choice(_KEY_CHARACTERS)
+                       for _ in range(length))
+
+    def add_paste(self, content, user_name=None, title='Untitled',
+                  paste_format='text', private=0, expire_date='N', hits=0):
+        '''
+        Store a paste directly, as if it had been created earlier.
+
+        returns:
+            the new paste key (str)
+        '''
+        if isinstance(content, str):
+            content = bytes(content, encoding='utf-8')
+        now = int(time.time())
+        seconds = _EXPIRE_SECONDS[expire_date]
+        with self._lock:
+            paste_key = self._new_key(8)
+            self._pastes[paste_key] = {
+                'key' : paste_key,
+                'owner' : user_name,
+                'date' : now,
+                'title' : title,
+                'size' : len(content),
+                'expire' : now + seconds if seconds else 0,
+                'private' : int(private),
+                'format' : paste_format,
+                'hits' : hits,
+                'content' : content,
+            }
+        return paste_key
+
+    def paste_code(self, paste_key):
+        '''
+        returns:
+            the stored content of a paste (bytes), None if there is no
+            such paste
+        '''
+        with self._lock:
+            paste = self._pastes.get(paste_key)
+        return paste['content'] if paste is not None else None
+
+    def fail_next(self, status=503, count=1):
+        '''
+        Answer the next count requests with status.
+        '''
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def expire_user_key(self, user_name):
+        '''
+        Forget the user key of user_name, so requests made with it are
+        rejected and the next login issues a new one.
+        '''
+        with self._lock:
+            self._user_keys.pop(user_name, None)
+
+    def _user_for_key(self, user_key):
+        for user_name, key in self._user_keys.items():
+            if key == user_key:
+                return user_name
+        return None
+
+    def _live_pastes(self):
+        now = time.time()
+        expired = [key for key, paste in self._pastes.items()
+                   if paste['expire'] and paste['expire'] <= now]
+        for key in expired:
+            del self._pastes[key]
+        return list(self._pastes.values())
+
+    def _paste_xml(self, paste):
+        fields = (
+            ('paste_key', paste['key']),
+            ('paste_date', paste['date']),
+            ('paste_title', paste['title']),
+            ('paste_size', paste['size']),
+            ('paste_expire_date', paste['expire']),
+            ('paste_private', paste['private']),
+            ('paste_format_long',
+             'None' if paste['format'] == 'text'
+             else paste['format'].capitalize()),
+            ('paste_format_short', paste['format']),
+            ('paste_url', 'https://pastebin.com/' + paste['key']),
+            ('paste_hits', paste['hits']),
+        )
+        lines = ['<paste>']
+        for tag, value in fields:
+            lines.append('<{0}>{1}</{0}>'.format(tag, escape(str(value))))
+        lines.append('</paste>')
+        return '\r\n'.join(lines) + '\r\n'
+
+    def _pastes_xml(self, pastes):
+        if not pastes:
+            return 'No pastes found.'
+        return ''.join(self._paste_xml(paste) for paste in pastes)
+
+    def _throttled(self, dev_key):
+        if self.rate_limit is None:
+            return False
+        bucket = self._buckets.get(dev_key)
+        if bucket is None:
+            bucket = self._buckets[dev_key] = TokenBucket(self.rate_limit)
+        return not bucket.try_acquire()
+
+    def handle(self, method, path, form):
+        '''
+        Answer one request.
+
+        args:
+            method (str)
+            path (str)
+            form (dict): the decoded POST fields, str -> str
+
+        returns:
+            a (status, headers, body) tuple of (int, dict, bytes)
+        '''
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._failures:
+                return self._error(self._failures.pop(0))
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self._error(self.error_status)
+            if self._throttled(form.get('api_dev_key')):
+                return self._error(429)
+            text = self._dispatch(method, path, form)
+        if isinstance(text, tuple):
+            return text
+        body = text if isinstance(text, bytes) else bytes(text,
+                                                          encoding='utf-8')
+        return 200, {'Content-Type' : 'text/plain; charset=utf-8'}, body
+
+    def respond(self, method, url, body, headers):
+        '''
+        Answer one raw HTTP request; pass this method to
+        MemoryTransport to use the API without a server.
+
+        args:
+            method (str)
+            url (str)
+            body (bytes): the urlencoded form, None for a GET
+            headers (dict)
+
+        returns:
+            a (status, headers, body) tuple of (int, dict, bytes)
+        '''
+        form = {name : values[0] for name, values
+                in parse_qs((body or b'').decode(encoding='utf-8'),
+                            keep_blank_values=True).items()}
+        status, response_headers, body = self.handle(
+            method, urlsplit(url).path, form)
+        accept = ''.join(value for name, value in headers.items()
+                         if name.lower() == 'accept-encoding')
+        if self.compress and status == 200 and 'gzip' in accept:
+            body = gzip.compress(body)
+            response_headers = dict(response_headers,
+                                    **{'Content-Encoding' : 'gzip'})
+        return status, response_headers, body
+
+    def _error(self, status):
+        return status, {'Retry-After' : '0'}, b''
+
+    def _dispatch(self, method, path, form):
+        if path == '/api/api_login.php' and method == 'POST':
+            self.calls['login'] += 1
+            return self._login(form)
+        if path.startswith('/raw/') and method == 'GET':
+            self.calls['raw'] += 1
+            paste = self._pastes.get(path[len('/raw/'):])
+            if paste is None or paste['private'] == 2:
+                return 404, {}, b'Not Found'
+            paste['hits'] += 1
+            return paste['content']
+        if path == '/api/api_raw.php' and method == 'POST':
+            self.calls['show_paste'] += 1
+            return self._show_paste(form)
+        if path == '/api/api_post.php' and method == 'POST':
+            option = form.get('api_option', '')
+            self.calls[option] += 1
+            if form.get('api_dev_key') != self.dev_key:
+                return 'Bad API request, invalid api_dev_key'
+            handler = getattr(self, '_option_' + option, None)
+            if handler is None:
+                return 'Bad API request, invalid api_option'
+            user_key = form.get('api_user_key')
+            user_name = self._user_for_key(user_key) if user_key else None
+            if user_key and user_name is None:
+                return 'Bad API request, invalid api_user_key'
+            return handler(form, user_name)
+        return 404, {}, b'Not Found'
+
+    def _login(self, form):
+        if form.get('api_dev_key') != self.dev_key:
+            return 'Bad API request, invalid api_dev_key'
+        user_name = form.get('api_user_name')
+        if (user_name not in self.users or
+                self.users[user_name] != form.get('api_user_password')):
+            return 'Bad API request, invalid login'
+        if user_name not in self._user_keys:
+            self._user_keys[user_name] = self._new_key(32)
+        return self._user_keys[user_name]
+
+    def _show_paste(self, form):
+        if form.get('api_dev_key') != self.dev_key:
+            return 'Bad API request, invalid api_dev_key'
+        if form.get('api_option') != 'show_paste':
+            return 'Bad API request, invalid api_option'
+        user_name = self._user_for_key(form.get('api_user_key'))
+        if user_name is None:
+            return 'Bad API request, invalid api_user_key'
+        paste = self._pastes.get(form.get('api_paste_key'))
+        if paste is None or paste['owner'] != user_name:
+            return ('Bad API request, invalid permission to view this '
+                    'paste or invalid api_paste_key')
+        return paste['content']
+
+    def _option_paste(self, form, user_name):
+        if 'api_paste_code' not in form:
+            return 'Bad API request, api_paste_code was empty'
+        private = int(form.get('api_paste_private') or 0)
+        if private == 2 and user_name is None:
+            return 'Bad API request, invalid api_paste_private'
+        expire_date = form.get('api_paste_expire_date') or 'N'
+        if expire_date not in _EXPIRE_SECONDS:
+            return 'Bad API request, invalid api_paste_expire_date'
+        paste_key = self.add_paste(
+            form['api_paste_code'], user_name=user_name,
+            title=form.get('api_paste_name') or 'Untitled',
+            paste_format=form.get('api_paste_format') or 'text',
+            private=private, expire_date=expire_date)
+        return 'https://pastebin.com/' + paste_key
+
+    def _option_list(self, form, user_name):
+        if user_name is None:
+            return 'Bad API request, invalid api_user_key'
+        limit = int(form.get('api_results_limit') or 50)
+        if not 1 <= limit <= 1000:
+            return 'Bad API request, invalid api_results_limit'
+        pastes = [paste for paste in self._live_pastes()
+                  if paste['owner'] == user_name]
+        pastes.sort(key=lambda paste: paste['date'], reverse=True)
+        return self._pastes_xml(pastes[:limit])
+
+    def _option_trends(self, form, user_name):
+        pastes = [paste for paste in self._live_pastes()
+                  if paste['private'] == 0]
+        pastes.sort(key=lambda paste: paste['hits'], reverse=True)
+        return self._pastes_xml(pastes[:18])
+
+    def _option_delete(self, form, user_name):
+        paste = self._pastes.get(form.get('api_paste_key'))
+        if user_name is None or paste is None or paste['owner'] != user_name:
+            return 'Bad API request, invalid permission to remove paste'
+        del self._pastes[paste['key']]
+        return 'Paste Removed'
+
+    def _option_userdetails(self, form, user_name):
+        if user_name is None:
+            return 'Bad API request, invalid api_user_key'
+        fields = (
+            ('user_name', user_name),
+            ('user_format_short', 'text'),
+            ('user_expiration', 'N'),
+            ('user_avatar_url', 'https://pastebin.com/i/guest.png'),
+            ('user_private', 1),
+            ('user_website', ''),
+            ('user_email', user_name + '@example.com'),
+            ('user_location', ''),
+            ('user_account_type', 0),
+        )
+        lines = ['<user>']
+        for tag, value in fields:
+            lines.append('<{0}>{1}</{0}>'.format(tag, escape(str(value))))
+        lines.append('</user>')
+        return '\r\n'.join(lines)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes; with Nagle on, the
+    # body waits for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        status, headers, body = self.server.api.respond(
+            self.command, self.path, self.rfile.read(length),
+            dict(self.headers))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class FakePastebinServer:
+    '''
+    Serves a FakePastebinAPI over HTTP/1.1 with keep-alive, on a
+    background thread.
+
+    kwargs:
+        api (FakePastebinAPI): defaults to a new FakePastebinAPI()
+        host (str)
+        port (int): 0 picks a free port
+
+    attributes:
+        api (FakePastebinAPI)
+        url (str): pass as base_url to Pastebin or AsyncPastebin
+
+    methods:
+        start
+        stop
+    '''
+
+    def __init__(self, api=None, host='127.0.0.1', port=0):
+        self.api = api if api is not None else FakePastebinAPI()
+        self._server = _ThreadingHTTPServer((host, port), _Handler)
+        self._server.api = self.api
+        self._thread = None
+
+    def __repr__(self):
+        return 'FakePastebinServer({!r})'.format(self.url)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
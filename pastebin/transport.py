@@ -0,0 +1,195 @@
+'''
+Transports carry the HTTP requests of a Pastebin client.
+
+A transport has request(method, url, body=None, headers=None) and
+close(). request returns a response with status, reason, headers,
+read(amt), peek(n) and close(), like http.client.HTTPResponse, and
+must not raise for non-200 statuses; Pastebin decides what to retry.
+
+    ConnectionPool   pooled keep-alive http.client connections, the
+                     default
+    UrllibTransport  urllib.request, one connection per request
+    MemoryTransport  an in-process handler, no sockets at all
+'''
+
+
+import io
+import ssl
+from http.client import HTTPMessage, responses
+from urllib.request import (HTTPErrorProcessor, HTTPSHandler, Request,
+                            build_opener)
+
+
+class Transport:
+    '''
+    Base class for transports.
+
+    methods:
+        request
+        close
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request(self, method, url, body=None, headers=None):
+        '''
+        Send one request.
+
+        args:
+            method (str)
+            url (str)
+
+        kwargs:
+            body (bytes or iterable of bytes)
+            headers (dict)
+
+        returns:
+            a response object, whatever its status
+        '''
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class _KeepErrorResponses(HTTPErrorProcessor):
+    '''
+    Hand every response back to the caller instead of raising
+    urllib.error.HTTPError for non-2xx statuses.
+    '''
+
+    def http_response(self, request, response):
+        return response
+
+    https_response = http_response
+
+
+class UrllibTransport(Transport):
+    '''
+    Sends each request with urllib.request on a new connection, as the
+    wrapper originally did. Proxy settings from the environment apply.
+
+    kwargs:
+        timeout (float): socket timeout of every request
+        ssl_context (ssl.SSLContext): context used for https hosts
+    '''
+
+    def __init__(self, timeout=None, ssl_context=None):
+        self.timeout = timeout
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self._opener = build_opener(HTTPSHandler(context=self.ssl_context),
+                                    _KeepErrorResponses())
+        self._closed = False
+
+    def __repr__(self):
+        return 'UrllibTransport(timeout={})'.format(self.timeout)
+
+    def request(self, method, url, body=None, headers=None):
+        '''
+        returns:
+            http.client.HTTPResponse object
+
+        raises:
+            ValueError if the transport has been closed
+        '''
+        if self._closed:
+            raise ValueError('request on a closed UrllibTransport')
+        request = Request(url, data=body, headers=headers or {},
+                          method=method)
+        if self.timeout is None:
+            return self._opener.open(request)
+        return self._opener.open(request, timeout=self.timeout)
+
+    def close(self):
+        self._closed = True
+
+
+class MemoryResponse:
+    '''
+    A response held in memory, with the reading interface of
+    http.client.HTTPResponse.
+
+    args:
+        status (int)
+        headers (dict)
+        body (bytes)
+    '''
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.reason = responses.get(status, '')
+        self.headers = HTTPMessage()
+        for name, value in headers.items():
+            self.headers[name] = value
+        if 'Content-Length' not in self.headers:
+            self.headers['Content-Length'] = str(len(body))
+        self._body = io.BufferedReader(io.BytesIO(body))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def read(self, amt=None):
+        if self._body.closed:
+            return b''
+        return self._body.read(amt)
+
+    def peek(self, n=0):
+        if self._body.closed:
+            return b''
+        return self._body.peek(n)
+
+    def isclosed(self):
+        return self._body.closed or not self._body.peek(1)
+
+    def close(self):
+        self._body.close()
+
+
+class MemoryTransport(Transport):
+    '''
+    Answers requests by calling a handler in the same process, for
+    tests and benchmarks that should not touch the network.
+
+        transport = MemoryTransport(FakePastebinAPI().respond)
+
+    args:
+        handler (callable): handler(method, url, body, headers) returns
+                            a (status, headers, body) tuple of
+                            (int, dict, bytes)
+    '''
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._closed = False
+
+    def __repr__(self):
+        return 'MemoryTransport({!r})'.format(self.handler)
+
+    def request(self, method, url, body=None, headers=None):
+        '''
+        returns:
+            MemoryResponse object
+
+        raises:
+            ValueError if the transport has been closed
+        '''
+        if self._closed:
+            raise ValueError('request on a closed MemoryTransport')
+        if body is not None and not isinstance(body, (bytes, bytearray)):
+            body = b''.join(body)
+        status, headers, body = self.handler(method, url, body,
+                                             dict(headers or {}))
+        return MemoryResponse(status, headers, body)
+
+    def close(self):
+        self._closed = True
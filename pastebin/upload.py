@@ -0,0 +1,181 @@
+'''
+Streaming application/x-www-form-urlencoded bodies, so a large
+paste_code is percent-encoded and sent a chunk at a time instead of
+being copied into memory in full.
+'''
+
+
+import io
+import tempfile
+from urllib.parse import quote_plus, urlencode
+
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# iterators are spooled to a temporary file, kept in memory up to this
+SPOOL_SIZE = 1024 * 1024
+# bytes-like paste codes this large are streamed rather than encoded
+# in one piece
+STREAM_THRESHOLD = 256 * 1024
+
+# the bytes quote_plus leaves alone; a space becomes a single '+' and
+# every other byte three '%XX' bytes
+_SAFE = bytes(byte for byte in range(256)
+              if quote_plus(bytes([byte])) == chr(byte))
+
+
+def encoded_length(chunk):
+    '''
+    returns:
+        the length of quote_plus(chunk) without building it (int)
+    '''
+    escaped = len(chunk.translate(None, _SAFE)) - chunk.count(b' ')
+    return len(chunk) + 2 * escaped
+
+
+def is_streamable(value):
+    '''
+    returns:
+        True if value should be sent as an UploadSource (bool)
+    '''
+    if isinstance(value, (str, int)):
+        return False
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value) >= STREAM_THRESHOLD or not isinstance(value, bytes)
+    return hasattr(value, 'read') or hasattr(value, '__iter__')
+
+
+class UploadSource:
+    '''
+    A paste body that can be read from the start as many times as a
+    request is sent, a chunk at a time.
+
+    args:
+        source: a bytes-like object, a binary file object, or an
+                iterable of bytes; files are read from their current
+                position, and iterables are spooled to a temporary
+                file (in memory up to SPOOL_SIZE bytes)
+
+    kwargs:
+        chunk_size (int)
+
+    methods:
+        chunks
+        encoded_chunks
+        close
+    '''
+
+    def __init__(self, source, chunk_size=UPLOAD_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._view = None
+        self._file = None
+        self._start = 0
+        self._spooled = False
+        self._encoded_length = None
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._view = memoryview(source).cast('B')
+        elif hasattr(source, 'read') and _seekable(source):
+            self._file = source
+            self._start = source.tell()
+        else:
+            if hasattr(source, 'read'):
+                source = iter(lambda: source.read(chunk_size), b'')
+            self._file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            self._spooled = True
+            for chunk in source:
+                if isinstance(chunk, str):
+                    chunk = bytes(chunk, encoding='utf-8')
+                self._file.write(chunk)
+            self._start = 0
+
+    def __repr__(self):
+        return 'UploadSource(chunk_size={})'.format(self.chunk_size)
+
+    def chunks(self):
+        '''
+        Yield the raw body from its start, chunk_size bytes at a time.
+        '''
+        if self._view is not None:
+            for offset in range(0, len(self._view), self.chunk_size):
+                yield self._view[offset:offset + self.chunk_size].tobytes()
+            return
+        self._file.seek(self._start)
+        while True:
+            chunk = self._file.read(self.chunk_size)
+            if not chunk:
+                break
+            if isinstance(chunk, str):
+                chunk = bytes(chunk, encoding='utf-8')
+            yield chunk
+
+    def encoded_chunks(self):
+        '''
+        Yield the body percent-encoded as quote_plus would, a chunk at
+        a time.
+        '''
+        for chunk in self.chunks():
+            yield bytes(quote_plus(chunk), encoding='ascii')
+
+    @property
+    def encoded_length(self):
+        '''
+        The length of the percent-encoded body, found by reading it
+        once without keeping it.
+        '''
+        if self._encoded_length is None:
+            self._encoded_length = sum(encoded_length(chunk)
+                                       for chunk in self.chunks())
+        return self._encoded_length
+
+    def close(self):
+        '''
+        Drop a spooled copy; files passed in are left to the caller.
+        '''
+        if self._spooled:
+            self._file.close()
+
+
+def _seekable(source):
+    try:
+        return source.seekable()
+    except (AttributeError, ValueError, io.UnsupportedOperation):
+        return False
+
+
+class FormBody:
+    '''
+    A urlencoded form whose UploadSource fields are encoded while it
+    is sent. Iterating yields the body in chunks, and len() is its
+    exact Content-Length, so transports need not buffer it.
+
+    args:
+        data (dict): field name -> value; UploadSource values are
+                     streamed, everything else is encoded as urlencode
+                     would
+    '''
+
+    def __init__(self, data):
+        self._parts = []
+        fields = []
+        for name, value in data.items():
+            separator = '&' if fields or self._parts else ''
+            if isinstance(value, UploadSource):
+                fields.append(separator + urlencode([(name, '')]))
+                self._parts.append(bytes(''.join(fields), encoding='utf-8'))
+                self._parts.append(value)
+                fields = []
+            else:
+                fields.append(separator + urlencode([(name, value)]))
+        if fields:
+            self._parts.append(bytes(''.join(fields), encoding='utf-8'))
+
+    def __len__(self):
+        return sum(part.encoded_length if isinstance(part, UploadSource)
+                   else len(part) for part in self._parts)
+
+    def __iter__(self):
+        for part in self._parts:
+            if isinstance(part, UploadSource):
+                for chunk in part.encoded_chunks():
+                    yield chunk
+            else:
+                yield part
@@ -7,39 +7,1762 @@ Provides automated tests for the Pastebin API wrapper.
 '''
 
 
+import asyncio
+import gc
+import gzip
+import io
+import os
+import pickle
+import tempfile
+from datetime import datetime, timezone
+import threading
+import time
+import tracemalloc
+import zlib
+from http.client import HTTPException
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 from unittest import TestCase, TestSuite
 
+from pastebin import _encode
+from pastebin import (AccountMirror, AsyncConnectionPool, AsyncPastebin,
+                      ConnectionPool, FileSessionStore,
+                      MemoryResponse, MemorySessionStore, MemoryTransport,
+                      MetricsRegistry, PasteDedupe, Pastebin,
+                      PastebinHTTPError, PastebinPaste,
+                      PastebinPasteListParser, PastebinUser, PastePrivacy,
+                      RateLimiter, RawCache, ResponseCache, RetryPolicy,
+                      SearchIndex, TokenBucket, UrllibTransport)
+from pastebin.batch import run_batch
+from pastebin.compression import decode_response
+from pastebin.dedupe import paste_digest
+from pastebin.transport import Transport
+from pastebin.upload import FormBody, UploadSource
+from pastebin.pool import PooledResponse
+from pastebin.testing import FakePastebinAPI, FakePastebinServer
 
-class RequestTestCase(TestCase):
-    pass
 
-class LoginTestCase(TestCase):
-    pass
+_PASTE_XML = (
+    '<paste>\r\n'
+    '<paste_key>{key}</paste_key>\r\n'
+    '<paste_date>1338651990</paste_date>\r\n'
+    '<paste_title>caf\u00e9 {key}</paste_title>\r\n'
+    '<paste_size>{size}</paste_size>\r\n'
+    '<paste_expire_date>0</paste_expire_date>\r\n'
+    '<paste_private>1</paste_private>\r\n'
+    '<paste_format_long>Python</paste_format_long>\r\n'
+    '<paste_format_short>python</paste_format_short>\r\n'
+    '<paste_url>https://pastebin.com/{key}</paste_url>\r\n'
+    '<paste_hits>{size}</paste_hits>\r\n'
+    '</paste>\r\n'
+)
 
-class CreatePasteTestCase(TestCase):
-    pass
 
-class CreateLoggedInPasteTestCase(TestCase):
-    pass
+def _paste_list(count):
+    return ''.join(_PASTE_XML.format(key='k{:07d}'.format(i), size=i)
+                   for i in range(count))
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        type(self).connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ChunkedHandler(_KeepAliveHandler):
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in filter(None, (body[:1], body[1:])):
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class _FlakyHandler(_KeepAliveHandler):
+    failures = 2
+
+    def do_POST(self):
+        if type(self).failures:
+            type(self).failures -= 1
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        _KeepAliveHandler.do_POST(self)
+
+
+class _DropPasteHandler(_KeepAliveHandler):
+    '''
+    Accepts a paste, then drops the connection without answering.
+    '''
+    pastes = 0
+
+    def do_POST(self):
+        if b'api_option=paste' not in self.rfile.peek():
+            _KeepAliveHandler.do_POST(self)
+            return
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        type(self).pastes += 1
+        self.close_connection = True
+
+
+class _ClosingHandler(_KeepAliveHandler):
+    '''
+    Answers as if the connection were kept alive, then closes it.
+    '''
+    def do_POST(self):
+        _KeepAliveHandler.do_POST(self)
+        self.close_connection = True
+
+
+class _ProxyHandler(_KeepAliveHandler):
+    '''
+    Answers with the request line target and proxy credentials it was
+    sent, as a forward proxy would see them.
+    '''
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = bytes('{} {}'.format(
+            self.path, self.headers.get('Proxy-Authorization')),
+            encoding='utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+
+class _ServerTestCase(TestCase):
+    handler = _KeepAliveHandler
+
+    def setUp(self):
+        self.handler.connections = 0
+        self.server = _ThreadingHTTPServer(('127.0.0.1', 0), self.handler)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:{}/'.format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _FakeServerTestCase(TestCase):
+    def setUp(self):
+        self.server = FakePastebinServer(FakePastebinAPI(seed=0))
+        self.server.start()
+        self.api = self.server.api
+        self.pastebin = Pastebin(self.api.dev_key, base_url=self.server.url,
+                                 retry_policy=RetryPolicy(backoff_base=0))
+
+    def tearDown(self):
+        self.pastebin.close()
+        self.server.stop()
+
+
+class RequestTestCase(_ServerTestCase):
+    handler = _FlakyHandler
+
+    def setUp(self):
+        _ServerTestCase.setUp(self)
+        _FlakyHandler.failures = 2
+
+    def test_transient_status_is_retried(self):
+        with Pastebin('dev', retry_policy=RetryPolicy(backoff_base=0)) as pb:
+            response = pb._request(self.url, data={'api_dev_key' : b'dev',
+                                                   'api_option' : b'list'})
+            self.assertEqual(response.read(),
+                             b'api_dev_key=dev&api_option=list')
+
+    def test_gives_up_after_max_attempts(self):
+        policy = RetryPolicy(max_attempts=2, backoff_base=0)
+        with Pastebin('dev', retry_policy=policy) as pb:
+            with self.assertRaises(PastebinHTTPError) as context:
+                pb._request(self.url, data={'api_dev_key' : b'dev',
+                                            'api_option' : b'list'})
+        self.assertEqual(context.exception.status, 503)
+
+    def test_paste_is_not_retried_by_default(self):
+        with Pastebin('dev', retry_policy=RetryPolicy(backoff_base=0)) as pb:
+            with self.assertRaises(PastebinHTTPError):
+                pb._request(self.url, data={'api_dev_key' : b'dev',
+                                            'api_option' : b'paste'})
+        self.assertEqual(_FlakyHandler.failures, 1)
+
+
+class RetryPolicyTestCase(TestCase):
+    def test_backoff_is_capped_full_jitter(self):
+        policy = RetryPolicy(backoff_base=1, backoff_cap=4)
+        for attempt in range(1, 10):
+            delay = policy.backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(4, 2 ** (attempt - 1)))
+
+    def test_retryable_errors(self):
+        policy = RetryPolicy(max_attempts=3)
+        self.assertTrue(policy.is_retryable('list', 1, ConnectionError()))
+        self.assertTrue(policy.is_retryable('list', 2,
+                                            PastebinHTTPError(502)))
+        self.assertFalse(policy.is_retryable('list', 3, ConnectionError()))
+        self.assertFalse(policy.is_retryable('list', 1,
+                                             PastebinHTTPError(404)))
+        self.assertFalse(policy.is_retryable('list', 1, ValueError()))
+
+    def test_paste_needs_opt_in(self):
+        self.assertFalse(RetryPolicy().is_retryable('paste', 1,
+                                                    ConnectionError()))
+        self.assertTrue(RetryPolicy(retry_paste=True).is_retryable(
+            'paste', 1, ConnectionError()))
+
+
+class ConnectionPoolTestCase(_ServerTestCase):
+    def test_connection_is_reused(self):
+        with ConnectionPool() as pool:
+            for i in range(5):
+                body = bytes(str(i), encoding='utf-8')
+                response = pool.request('POST', self.url, body=body)
+                self.assertEqual(response.read(), body)
+        self.assertEqual(_KeepAliveHandler.connections, 1)
+
+    def test_unread_response_is_not_reused(self):
+        with ConnectionPool() as pool:
+            pool.request('POST', self.url, body=b'a').close()
+            pool.request('POST', self.url, body=b'b').read()
+        self.assertEqual(_KeepAliveHandler.connections, 2)
+
+    def test_idle_timeout_discards_connection(self):
+        with ConnectionPool(idle_timeout=0) as pool:
+            pool.request('POST', self.url, body=b'a').read()
+            pool.request('POST', self.url, body=b'b').read()
+        self.assertEqual(_KeepAliveHandler.connections, 2)
+
+    def test_reused_with_many_open_files(self):
+        # the pool's sockets are given descriptors past FD_SETSIZE
+        files = []
+        try:
+            for _ in range(1100):
+                files.append(open(os.devnull, 'rb'))
+        except OSError:
+            for file in files:
+                file.close()
+            self.skipTest('cannot open enough files')
+        try:
+            with ConnectionPool() as pool:
+                for i in range(5):
+                    pool.request('POST', self.url, body=b'a').read()
+                stats = pool.stats()
+        finally:
+            for file in files:
+                file.close()
+        self.assertEqual((stats['opened'], stats['reused']), (1, 4))
+
+    def test_closed_pool_refuses_requests(self):
+        pool = ConnectionPool()
+        pool.close()
+        with self.assertRaises(ValueError):
+            pool.request('POST', self.url, body=b'a')
+
+
+class DroppedConnectionTestCase(_ServerTestCase):
+    handler = _DropPasteHandler
+
+    def setUp(self):
+        _ServerTestCase.setUp(self)
+        _DropPasteHandler.pastes = 0
+
+    def test_paste_is_not_sent_twice(self):
+        with Pastebin('dev', base_url=self.url) as pastebin:
+            pastebin._request(self.url, data={'api_dev_key' : b'dev',
+                                              'api_option' : b'list'}).read()
+            with self.assertRaises(ConnectionError):
+                pastebin.create_paste(b'x')
+        self.assertEqual(_DropPasteHandler.pastes, 1)
+
+    def test_async_paste_is_not_sent_twice(self):
+        async def run():
+            async with AsyncConnectionPool() as pool:
+                await (await pool.request('POST', self.url,
+                                          body=b'api_option=list')).read()
+                await pool.request('POST', self.url,
+                                   body=b'api_option=paste')
+
+        loop = asyncio.new_event_loop()
+        try:
+            with self.assertRaises(ConnectionError):
+                loop.run_until_complete(run())
+        finally:
+            loop.close()
+        self.assertEqual(_DropPasteHandler.pastes, 1)
+
+
+class StaleConnectionTestCase(_ServerTestCase):
+    handler = _ClosingHandler
+
+    def test_closed_idle_connection_is_replaced(self):
+        with ConnectionPool() as pool:
+            for body in (b'a', b'b'):
+                self.assertEqual(pool.request('POST', self.url,
+                                              body=body).read(), body)
+                # let the server close the connection
+                time.sleep(0.05)
+        self.assertEqual(_ClosingHandler.connections, 2)
+
+
+class ProxyTestCase(_ServerTestCase):
+    handler = _ProxyHandler
+
+    def test_request_goes_through_proxy(self):
+        proxy = 'http://user:secret@' + self.url.split('://', 1)[1]
+        with ConnectionPool(proxies={'http' : proxy}) as pool:
+            for _ in range(2):
+                body = pool.request('POST', 'http://pastebin.invalid/x',
+                                    body=b'a').read()
+                self.assertEqual(body, b'http://pastebin.invalid/x Basic '
+                                 b'dXNlcjpzZWNyZXQ=')
+            self.assertEqual(pool.stats()['reused'], 1)
+
+    def test_https_is_tunnelled(self):
+        pool = ConnectionPool(proxies={'https' : 'proxy.invalid:3128'})
+        conn = pool._new_connection(('https', 'pastebin.com', None))
+        self.assertEqual((conn.host, conn.port), ('proxy.invalid', 3128))
+        self.assertEqual(conn._tunnel_host, 'pastebin.com')
+        pool.close()
+
+    def test_no_proxies(self):
+        with ConnectionPool(proxies={}) as pool:
+            self.assertEqual(pool.request('POST', self.url + 'x',
+                                          body=b'a').read(), b'/x None')
+
+
+class UrllibTransportTestCase(_ServerTestCase):
+    handler = _FlakyHandler
+
+    def test_error_statuses_are_returned(self):
+        _FlakyHandler.failures = 1
+        with UrllibTransport() as transport:
+            response = transport.request('POST', self.url, body=b'a')
+            self.assertEqual(response.status, 503)
+            response.close()
+            response = transport.request('POST', self.url, body=b'b')
+            self.assertEqual(response.peek(1)[:1], b'b')
+            self.assertEqual(response.read(), b'b')
+
+    def test_retried_through_pastebin(self):
+        _FlakyHandler.failures = 2
+        with Pastebin('dev', transport=UrllibTransport(),
+                      retry_policy=RetryPolicy(backoff_base=0)) as pastebin:
+            response = pastebin._request(self.url,
+                                         data={'api_dev_key' : b'dev',
+                                               'api_option' : b'list'})
+            self.assertEqual(response.read(),
+                             b'api_dev_key=dev&api_option=list')
+
+
+class MemoryTransportTestCase(TestCase):
+    def setUp(self):
+        self.api = FakePastebinAPI(seed=0)
+        self.pastebin = Pastebin(self.api.dev_key,
+                                 transport=MemoryTransport(self.api.respond),
+                                 retry_policy=RetryPolicy(backoff_base=0))
+
+    def tearDown(self):
+        self.pastebin.close()
+
+    def test_round_trip(self):
+        self.pastebin.login(b'user', b'password')
+        self.pastebin.create_logged_in_paste(b'x', paste_name=b'mine').read()
+        pastes = list(self.pastebin.list_pastes(parse=True, stream=True))
+        self.assertEqual([paste.paste_title for paste in pastes], ['mine'])
+
+    def test_statuses_and_relogin(self):
+        self.pastebin.session_store = MemorySessionStore()
+        self.pastebin.login(b'user', b'password')
+        self.api.expire_user_key('user')
+        self.api.fail_next(503)
+        user = self.pastebin.get_user_information(parse=True)
+        self.assertEqual(user.user_name, 'user')
+        self.assertEqual(self.api.calls['login'], 2)
+
+    def test_closed_transport_refuses_requests(self):
+        self.pastebin.close()
+        with self.assertRaises(ValueError):
+            self.pastebin.list_trending_pastes()
+
+
+class CompressionTestCase(TestCase):
+    body = bytes(_paste_list(50), encoding='utf-8')
+
+    def _decoded(self, encoding, body):
+        return decode_response(MemoryResponse(
+            200, {'Content-Encoding' : encoding}, body))
+
+    def test_encodings(self):
+        raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        raw = raw.compress(self.body) + raw.flush()
+        for encoding, body in (('gzip', gzip.compress(self.body)),
+                               ('deflate', zlib.compress(self.body)),
+                               ('deflate', raw)):
+            response = self._decoded(encoding, body)
+            self.assertEqual(response.read(), self.body)
+            self.assertEqual(response.wire_bytes, len(body))
+
+    def test_incremental_read(self):
+        response = self._decoded('gzip', gzip.compress(self.body))
+        self.assertEqual(response.peek(7), self.body[:7])
+        chunks = iter(lambda: response.read(100), b'')
+        self.assertEqual(b''.join(chunks), self.body)
+        self.assertTrue(response.isclosed())
+
+    def test_identity_is_not_wrapped(self):
+        response = MemoryResponse(200, {}, b'x')
+        self.assertIs(decode_response(response), response)
+
+    def test_end_to_end(self):
+        api = FakePastebinAPI(compress=True)
+        for number in range(20):
+            api.add_paste('x', user_name='user')
+        events = []
+        with FakePastebinServer(api) as server:
+            with Pastebin(api.dev_key, base_url=server.url) as pastebin:
+                pastebin.login(b'user', b'password')
+                pastebin.add_hook(events.append)
+                pastebin.list_pastes(results_limit=100).read()
+                pastes = list(pastebin.list_pastes(results_limit=100,
+                                                   parse=True, stream=True))
+                stats = pastebin.transport.stats()
+        self.assertEqual(len(pastes), 20)
+        for event in events:
+            self.assertLess(event.wire_bytes, event.response_bytes / 4)
+        self.assertEqual(stats['opened'], 1)
+
+
+class AsyncConnectionPoolTestCase(_ServerTestCase):
+    def _run(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            # let closed transports run their callbacks before the loop
+            # goes away
+            loop.run_until_complete(asyncio.sleep(0))
+            loop.close()
+
+    async def _post_all(self, pool, bodies):
+        responses = []
+        for body in bodies:
+            response = await pool.request('POST', self.url, body=body)
+            responses.append(await response.read())
+        pool.close()
+        return responses
+
+    def test_connection_is_reused(self):
+        bodies = [b'a', b'bb', b'ccc']
+        result = self._run(self._post_all(AsyncConnectionPool(), bodies))
+        self.assertEqual(result, bodies)
+        self.assertEqual(self.handler.connections, 1)
+
+    def test_concurrent_requests(self):
+        async def post(pool, body):
+            response = await pool.request('POST', self.url, body=body)
+            return await response.read()
+
+        async def run():
+            pool = AsyncConnectionPool()
+            bodies = [bytes(str(i), encoding='utf-8') for i in range(20)]
+            result = await asyncio.gather(*[post(pool, b) for b in bodies])
+            pool.close()
+            return bodies, result
+
+        bodies, result = self._run(run())
+        self.assertEqual(result, bodies)
+
+
+class AsyncChunkedResponseTestCase(AsyncConnectionPoolTestCase):
+    handler = _ChunkedHandler
+
+
+class AsyncPastebinTestCase(_FakeServerTestCase):
+    def setUp(self):
+        _FakeServerTestCase.setUp(self)
+        self.loop = asyncio.new_event_loop()
+        self.client = AsyncPastebin(self.api.dev_key,
+                                    base_url=self.server.url,
+                                    retry_policy=RetryPolicy(backoff_base=0))
+
+    def tearDown(self):
+        self.client.close()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+        _FakeServerTestCase.tearDown(self)
+
+    def _run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    async def _read(self, response):
+        return await (await response).read()
+
+    def test_login(self):
+        user_key = self._run(self.client.login(b'user', b'password'))
+        self.assertEqual(self.client.user_key, user_key)
+        self.assertEqual(len(user_key), 32)
+
+    def test_create_paste(self):
+        paste_url = self._run(self._read(self.client.create_paste(b'a')))
+        self.assertEqual(self.api.paste_code(paste_url.rsplit(b'/', 1)[1]
+                                             .decode()), b'a')
+        with self.assertRaises(AttributeError):
+            self._run(self.client.create_logged_in_paste(b'b'))
+        self._run(self.client.login(b'user', b'password'))
+        paste_url = self._run(self._read(
+            self.client.create_logged_in_paste(b'b', paste_private=2)))
+        self.assertTrue(paste_url.startswith(b'https://pastebin.com/'))
+
+    def test_create_paste_from_file_and_iterable(self):
+        content = 'café & co\n'.encode('utf-8') * 20000
+        for paste_code in (io.BytesIO(content),
+                           iter([content[:7], content[7:]])):
+            paste_url = self._run(self._read(
+                self.client.create_paste(paste_code)))
+            self.assertEqual(self.api.paste_code(
+                paste_url.rsplit(b'/', 1)[1].decode()), content)
+
+    def test_list_pastes(self):
+        keys = {self.api.add_paste(str(index), user_name='user')
+                for index in range(3)}
+        self._run(self.client.login(b'user', b'password'))
+        pastes = self._run(self.client.list_pastes(parse=True))
+        self.assertEqual({paste.paste_key for paste in pastes}, keys)
+
+        async def stream():
+            pastes = await self.client.list_pastes(parse=True, stream=True)
+            return [paste.paste_key async for paste in pastes]
+
+        self.assertEqual(set(self._run(stream())), keys)
+
+        async def first():
+            pastes = await self.client.list_pastes(parse=True, stream=True)
+            async for paste in pastes:
+                break
+            await pastes.aclose()
+            return paste
+
+        self.assertIn(self._run(first()).paste_key, keys)
+        body = self._run(self._read(self.client.list_pastes()))
+        self.assertTrue(body.startswith(b'<paste>'))
+
+    def test_list_trending_pastes(self):
+        for hits in (5, 50):
+            self.api.add_paste('x', hits=hits)
+        pastes = self._run(self.client.list_trending_pastes(parse=True))
+        self.assertEqual([paste.paste_hits for paste in pastes], [50, 5])
+
+    def test_delete_paste(self):
+        self._run(self.client.login(b'user', b'password'))
+        key = self.api.add_paste('x', user_name='user')
+        body = self._run(self._read(self.client.delete_paste(key)))
+        self.assertEqual(body, b'Paste Removed')
+        self.assertIsNone(self.api.paste_code(key))
+
+    def test_get_user_information(self):
+        self._run(self.client.login(b'user', b'password'))
+        user = self._run(self.client.get_user_information(parse=True))
+        self.assertEqual(user.user_name, 'user')
+
+    def test_unavailable_is_retried(self):
+        self.api.fail_next(503)
+        body = self._run(self._read(self.client.list_trending_pastes()))
+        self.assertEqual(body, b'No pastes found.')
+        self.assertEqual(self.api.calls['trends'], 1)
+
+
+class FakeServerTestCase(_FakeServerTestCase):
+    def test_injected_errors_are_retried(self):
+        self.api.fail_next(503, count=2)
+        response = self.pastebin.list_trending_pastes()
+        self.assertEqual(response.read(), b'No pastes found.')
+
+    def test_rate_limit_answers_429(self):
+        self.api.rate_limit = 1
+        policy = RetryPolicy(max_attempts=1)
+        with Pastebin(self.api.dev_key, base_url=self.server.url,
+                      retry_policy=policy) as pastebin:
+            pastebin.list_trending_pastes().read()
+            with self.assertRaises(PastebinHTTPError) as context:
+                pastebin.list_trending_pastes()
+        self.assertEqual(context.exception.status, 429)
+
+    def test_latency(self):
+        self.api.latency = 0.05
+        start = time.monotonic()
+        self.pastebin.list_trending_pastes().read()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+
+class HooksTestCase(_FakeServerTestCase):
+    def setUp(self):
+        _FakeServerTestCase.setUp(self)
+        self.events = []
+        self.pastebin.add_hook(self.events.append)
+
+    def test_no_hooks_no_wrapping(self):
+        self.pastebin.remove_hook(self.events.append)
+        response = self.pastebin.list_trending_pastes()
+        self.assertIsInstance(response, PooledResponse)
+        response.read()
+        self.assertEqual(self.events, [])
+
+    def test_raw_response_is_reported_once_read(self):
+        response = self.pastebin.create_paste(b'print(1)')
+        self.assertEqual(self.events, [])
+        body = response.read()
+        event, = self.events
+        self.assertEqual(event.api_option, 'paste')
+        self.assertEqual(event.status, 200)
+        self.assertEqual(event.response_bytes, len(body))
+        self.assertGreater(event.payload_bytes, len(b'print(1)'))
+        self.assertGreaterEqual(event.total_time, event.ttfb)
+        self.assertGreaterEqual(event.ttfb, event.connect_time)
+        self.assertIsNone(event.parse_time)
+
+    def test_parse_time_and_reuse(self):
+        self.pastebin.login(b'user', b'password')
+        self.api.add_paste('x', user_name='user')
+        self.pastebin.list_pastes(parse=True)
+        list(self.pastebin.list_pastes(parse=True, stream=True))
+        self.pastebin.get_user_information(parse=True)
+        login, listed, streamed, user = self.events
+        self.assertGreater(login.connect_time, 0)
+        self.assertIsNone(login.parse_time)
+        for event in (listed, streamed, user):
+            self.assertEqual(event.connect_time, 0.0)
+            self.assertGreater(event.parse_time, 0)
+            self.assertGreater(event.response_bytes, 0)
+
+    def test_failed_attempts_are_reported(self):
+        self.api.add_paste('x')
+        self.api.fail_next(503, count=2)
+        self.pastebin.list_trending_pastes(parse=True)
+        self.assertEqual([event.attempt for event in self.events], [1, 2, 3])
+        self.assertEqual([event.status for event in self.events],
+                         [503, 503, 200])
+        self.assertIsInstance(self.events[0].error, PastebinHTTPError)
+        self.assertIsNone(self.events[2].error)
+
+
+class MetricsTestCase(_FakeServerTestCase):
+    def setUp(self):
+        _FakeServerTestCase.setUp(self)
+        self.metrics = MetricsRegistry(buckets=(0.001, 10))
+        self.metrics.attach(self.pastebin)
+
+    def test_snapshot(self):
+        self.api.add_paste('x')
+        self.api.fail_next(503)
+        self.pastebin.list_trending_pastes(parse=True)
+        self.pastebin.create_paste(b'x').read()
+        snapshot = self.metrics.snapshot()
+        trends = snapshot['requests']['trends']
+        self.assertEqual(trends['statuses'], {503 : 1, 200 : 1})
+        self.assertEqual(trends['errors'], {'PastebinHTTPError' : 1})
+        self.assertEqual(trends['retries'], 1)
+        self.assertEqual(trends['duration']['count'], 2)
+        self.assertEqual(trends['duration']['buckets'][10], 2)
+        self.assertEqual(trends['parse']['count'], 1)
+        self.assertEqual(snapshot['requests']['paste']['requests'], 1)
+        self.assertEqual(snapshot['pool']['in_use'], 0)
+        self.assertEqual(snapshot['pool']['opened'], 1)
+        self.assertEqual(snapshot['pool']['idle'], 1)
+
+    def test_prometheus_text(self):
+        self.api.add_paste('x')
+        self.pastebin.list_trending_pastes(parse=True)
+        text = self.metrics.to_prometheus()
+        self.assertIn('# TYPE pastebin_requests_total counter\n', text)
+        self.assertIn('pastebin_requests_total{api_option="trends",'
+                      'status="200"} 1\n', text)
+        self.assertIn('pastebin_request_duration_seconds_bucket{'
+                      'api_option="trends",le="+Inf"} 1\n', text)
+        self.assertIn('pastebin_pool_connections{state="idle"} 1\n', text)
+
+    def test_constructor_argument(self):
+        metrics = MetricsRegistry()
+        with Pastebin(self.api.dev_key, base_url=self.server.url,
+                      metrics=metrics) as pastebin:
+            pastebin.login(b'user', b'password')
+        self.assertEqual(metrics.snapshot()['requests']['login']['requests'],
+                         1)
+
+
+class LoginTestCase(_FakeServerTestCase):
+    def test_login(self):
+        user_key = self.pastebin.login(b'user', b'password')
+        self.assertEqual(len(user_key), 32)
+        self.assertEqual(self.pastebin.user_key, user_key)
+
+    def test_invalid_login(self):
+        self.assertEqual(self.pastebin.login(b'user', b'wrong'),
+                         b'Bad API request, invalid login')
+
+    def test_session_store_is_shared(self):
+        store = MemorySessionStore()
+        first = Pastebin(self.api.dev_key, base_url=self.server.url,
+                         session_store=store)
+        second = Pastebin(self.api.dev_key, base_url=self.server.url,
+                          session_store=store)
+        with first, second:
+            self.assertEqual(first.login(b'user', b'password'),
+                             second.login(b'user', b'password'))
+        self.assertEqual(self.api.calls['login'], 1)
+
+    def test_rejected_key_logs_in_again(self):
+        self.pastebin.session_store = MemorySessionStore()
+        old_key = self.pastebin.login(b'user', b'password')
+        self.api.expire_user_key('user')
+        user = self.pastebin.get_user_information(parse=True)
+        self.assertEqual(user.user_name, 'user')
+        self.assertNotEqual(self.pastebin.user_key, old_key)
+
+
+class SessionStoreTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'sessions.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_file_store_round_trip(self):
+        store = FileSessionStore(self.path)
+        self.assertIsNone(store.get(b'me'))
+        store.set(b'me', b'key1')
+        self.assertEqual(FileSessionStore(self.path).get('me'), b'key1')
+        store.delete('me')
+        self.assertIsNone(store.get(b'me'))
+
+    def test_discard_keeps_replaced_key(self):
+        for store in (FileSessionStore(self.path), MemorySessionStore()):
+            store.set('me', b'new')
+            store.discard('me', b'old')
+            self.assertEqual(store.get('me'), b'new')
+            store.discard('me', b'new')
+            self.assertIsNone(store.get('me'))
+
+    def test_get_or_create_logs_in_once(self):
+        calls = []
+
+        def create():
+            calls.append(1)
+            time.sleep(0.02)
+            return b'key'
+
+        def worker():
+            store = FileSessionStore(self.path)
+            self.assertEqual(store.get_or_create('me', create), b'key')
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        leftovers = [name for name in os.listdir(self.directory.name)
+                     if name.startswith('.session-')]
+        self.assertEqual(leftovers, [])
+
+
+class CreatePasteTestCase(_FakeServerTestCase):
+    def test_create_paste(self):
+        paste_url = self.pastebin.create_paste(b'print(1)').read()
+        self.assertTrue(paste_url.startswith(b'https://pastebin.com/'))
+
+    def test_private_paste_needs_login(self):
+        body = self.pastebin.create_paste(b'x', paste_private=2).read()
+        self.assertEqual(body, b'Bad API request, invalid api_paste_private')
+
+    def test_create_pastes(self):
+        pastes = [b'a', {'paste_code' : b'b', 'paste_name' : b'b'},
+                  {'paste_code' : b'c', 'paste_expire_date' : b'2D'}]
+        results = list(self.pastebin.create_pastes(pastes, ordered=True))
+        self.assertEqual([result.ok for result in results],
+                         [True, True, False])
+        self.assertIn('paste_expire_date', str(results[2].error))
+
+
+class DedupeTestCase(_FakeServerTestCase):
+    def setUp(self):
+        _FakeServerTestCase.setUp(self)
+        self.dedupe = PasteDedupe()
+        self.pastebin.dedupe = self.dedupe
+
+    def tearDown(self):
+        self.dedupe.close()
+        _FakeServerTestCase.tearDown(self)
+
+    def _create(self, paste_code, **kwargs):
+        return self.pastebin.create_paste(paste_code, **kwargs).read()
+
+    def test_identical_paste_is_not_uploaded(self):
+        first = self._create(b'build log', paste_name=b'ci')
+        self.assertEqual(self._create('build log', paste_name='ci'), first)
+        self.assertEqual(self.api.calls['paste'], 1)
+        results = list(self.pastebin.create_pastes(
+            [{'paste_code' : b'build log', 'paste_name' : b'ci'}]))
+        self.assertEqual(results[0].value, first)
+        self.assertEqual(self.api.calls['paste'], 1)
+
+    def test_streamed_paste_is_hashed(self):
+        content = b'line\n' * 100000
+        first = self._create(io.BytesIO(content))
+        self.assertEqual(self._create(iter([content[:7], content[7:]])),
+                         first)
+        self.assertEqual(self.api.paste_code(first.rsplit(b'/', 1)[1]
+                                             .decode()), content)
+        self.assertEqual(self.api.calls['paste'], 1)
+
+    def test_other_fields_make_another_paste(self):
+        urls = {self._create(b'x'), self._create(b'x', paste_name=b'n'),
+                self._create(b'x', paste_format=b'python'),
+                self._create(b'x', paste_private=1)}
+        self.assertEqual(len(urls), 4)
+        self.pastebin.login(b'user', b'password')
+        self.pastebin.create_logged_in_paste(b'x').read()
+        self.assertEqual(self.api.calls['paste'], 5)
+
+    def test_expiry(self):
+        short = self._create(b'x', paste_expire_date=b'10M')
+        self.assertEqual(self._create(b'x', paste_expire_date=b'10M'), short)
+        # neither a paste that expires sooner nor one that outlives
+        # the paste asked for can stand in for it
+        never = self._create(b'x', paste_expire_date=b'N')
+        self.assertNotEqual(never, short)
+        self.assertEqual(self._create(b'x'), never)
+        hour = self._create(b'x', paste_expire_date=b'1H')
+        self.assertNotIn(hour, (never, short))
+        self.assertEqual(self.api.calls['paste'], 3)
+        self.dedupe.record(paste_digest([b'y'], paste_expire_date='10M'),
+                           'https://pastebin.com/gone', int(time.time()) - 1)
+        self.assertNotEqual(self._create(b'y', paste_expire_date='10M'),
+                            b'https://pastebin.com/gone')
+        self.assertEqual(self.dedupe.purge(now=time.time() + 3600), 3)
+
+    def test_lookup_never_outlives_request(self):
+        digest = paste_digest([b'x'])
+        now = int(time.time())
+        self.dedupe.record(digest, 'https://pastebin.com/never')
+        self.assertIsNone(self.dedupe.lookup(digest, now + 3600, now=now))
+        self.dedupe.record(digest, 'https://pastebin.com/hour', now + 3600)
+        self.assertIsNone(self.dedupe.lookup(digest, None, now=now))
+        self.assertEqual(self.dedupe.lookup(digest, now + 3600, now=now),
+                         'https://pastebin.com/hour')
+
+    def test_lookup_near_expiry(self):
+        digest = paste_digest([b'x'], paste_expire_date='10M')
+        self.dedupe.record(digest, 'https://pastebin.com/short', 1600)
+        self.assertEqual(self.dedupe.lookup(digest, 1600, now=1000),
+                         'https://pastebin.com/short')
+        self.assertEqual(self.dedupe.lookup(digest, 1660, now=1060),
+                         'https://pastebin.com/short')
+        self.assertIsNone(self.dedupe.lookup(digest, 1661, now=1061))
+        self.assertIsNone(self.dedupe.lookup(digest, 2199, now=1599))
+        self.assertEqual(len(self.dedupe), 1)
+        self.dedupe.min_remaining = 0
+        self.assertEqual(self.dedupe.lookup(digest, 2199, now=1599),
+                         'https://pastebin.com/short')
+
+    def test_failed_and_deleted_pastes_are_not_reused(self):
+        self._create(b'x', paste_private=2)
+        self.pastebin.login(b'user', b'password')
+        url = self.pastebin.create_logged_in_paste(b'x').read()
+        key = url.rsplit(b'/', 1)[1]
+        self.pastebin.delete_paste(key).read()
+        self.assertNotEqual(self.pastebin.create_logged_in_paste(b'x').read(),
+                            url)
+        self.assertEqual(self.api.calls['paste'], 3)
+
+    def test_failed_delete_keeps_paste(self):
+        self.pastebin.login(b'user', b'password')
+        url = self.pastebin.create_logged_in_paste(b'x').read()
+        key = url.rsplit(b'/', 1)[1]
+        self.api.fail_next(503, count=3)
+        with self.assertRaises(PastebinHTTPError):
+            self.pastebin.delete_paste(key)
+        other = self.api.add_paste(b'y', user_name='someone')
+        self.assertNotEqual(self.pastebin.delete_paste(other).read(),
+                            b'Paste Removed')
+        self.assertEqual(self.pastebin.create_logged_in_paste(b'x').read(),
+                         url)
+        self.assertEqual(self.pastebin.delete_paste(key).read(),
+                         b'Paste Removed')
+        self.assertEqual(len(self.dedupe), 0)
+
+    def test_shared_between_clients(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dedupe.db')
+            with PasteDedupe(path) as dedupe:
+                self.pastebin.dedupe = dedupe
+                first = self._create(b'x')
+            other = Pastebin(self.api.dev_key, base_url=self.server.url,
+                             dedupe=PasteDedupe(path))
+            try:
+                self.assertEqual(other.create_paste(b'x').read(), first)
+            finally:
+                other.dedupe.close()
+                other.close()
+        self.assertEqual(self.api.calls['paste'], 1)
+
+
+class _DiscardTransport(Transport):
+    def __init__(self):
+        self.sent = 0
+        self.headers = None
+
+    def request(self, method, url, body=None, headers=None):
+        self.headers = headers
+        for chunk in body:
+            self.sent += len(chunk)
+        return MemoryResponse(200, {}, b'https://pastebin.com/x')
+
+
+class StreamingUploadTestCase(_FakeServerTestCase):
+    code = ('print("caf\u00e9 & ~co")\n' * 50000).encode('utf-8')
+
+    def _key(self, paste_url):
+        return paste_url.rsplit(b'/', 1)[1].decode(encoding='utf-8')
+
+    def test_form_body_matches_urlencode(self):
+        code = bytes(range(256)) * 1024
+        data = {'api_dev_key' : b'dev', 'api_paste_code' : code,
+                'api_paste_private' : 0}
+        expected = _encode(data)
+        for source in (code, bytearray(code), io.BytesIO(code),
+                       iter([code[:1000], code[1000:]])):
+            body = FormBody(dict(data, api_paste_code=UploadSource(
+                source, chunk_size=4099)))
+            self.assertEqual(len(body), len(expected))
+            self.assertEqual(b''.join(body), expected)
+
+    def test_file_and_iterator_uploads(self):
+        for source in (io.BytesIO(self.code), iter([self.code])):
+            paste_url = self.pastebin.create_paste(source).read()
+            self.assertEqual(self.api.paste_code(self._key(paste_url)),
+                             self.code)
+
+    def test_relogin_resends_from_the_start(self):
+        self.pastebin.session_store = MemorySessionStore()
+        self.pastebin.login(b'user', b'password')
+        self.api.expire_user_key('user')
+        stream = io.BytesIO(b'skipped' + self.code)
+        stream.read(len(b'skipped'))
+        paste_url = self.pastebin.create_logged_in_paste(stream).read()
+        self.assertEqual(self.api.paste_code(self._key(paste_url)),
+                         self.code)
+
+    def test_memory_is_bounded(self):
+        transport = _DiscardTransport()
+        with tempfile.TemporaryFile() as paste:
+            for _ in range(64):
+                paste.write(self.code[:128 * 1024])
+            paste.seek(0)
+            with Pastebin('dev', transport=transport) as pastebin:
+                tracemalloc.start()
+                try:
+                    pastebin.create_paste(paste).read()
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+        self.assertEqual(int(transport.headers['Content-Length']),
+                         transport.sent)
+        self.assertGreater(transport.sent, 8 * 1024 * 1024)
+        self.assertLess(peak, 1024 * 1024)
+
+
+class RawPasteTestCase(_FakeServerTestCase):
+    def setUp(self):
+        _FakeServerTestCase.setUp(self)
+        self.content = ('caf\u00e9 line\n' * 10000).encode('utf-8')
+        self.public = self.api.add_paste(self.content, user_name='user')
+        self.private = self.api.add_paste(b'secret', user_name='user',
+                                          private=2)
+
+    def test_iter_raw(self):
+        chunks = list(self.pastebin.iter_raw(self.public, chunk_size=1000))
+        self.assertEqual(b''.join(chunks), self.content)
+        self.assertEqual(max(len(chunk) for chunk in chunks), 1000)
+
+    def test_fetch_raw_into_file(self):
+        with tempfile.TemporaryFile() as output:
+            written = self.pastebin.fetch_raw(self.public, file=output)
+            output.seek(0)
+            self.assertEqual(output.read(), self.content)
+        self.assertEqual(written, len(self.content))
+        stats = self.pastebin.transport.stats()
+        self.assertEqual((stats['in_use'], stats['idle']), (0, 1))
+
+    def test_private_paste_needs_login(self):
+        with self.assertRaises(PastebinHTTPError) as context:
+            self.pastebin.fetch_raw(self.private)
+        self.assertEqual(context.exception.status, 404)
+        with self.assertRaises(AttributeError):
+            self.pastebin.fetch_raw(self.private, logged_in=True)
+        self.pastebin.login(b'user', b'password')
+        self.assertEqual(self.pastebin.fetch_raw(self.private,
+                                                 logged_in=True), b'secret')
+
+    def test_foreign_paste_is_refused(self):
+        other = self.api.add_paste(b'x', user_name='someone')
+        self.pastebin.login(b'user', b'password')
+        with self.assertRaises(HTTPException) as context:
+            self.pastebin.fetch_raw(other, logged_in=True)
+        self.assertIn('invalid permission', str(context.exception))
+
+    def test_raw_gets_are_rate_limited(self):
+        events = []
+        self.pastebin.add_hook(events.append)
+        metrics = MetricsRegistry()
+        metrics.attach(self.pastebin)
+        self.pastebin.rate_limiter = RateLimiter({'raw' : (20, 1)})
+        start = time.monotonic()
+        for _ in range(3):
+            self.pastebin.fetch_raw(self.public)
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertEqual([event.api_option for event in events],
+                         ['raw'] * 3)
+        self.assertEqual(metrics.snapshot()['requests']['raw']['requests'],
+                         3)
+
+
+class RawCacheTestCase(_FakeServerTestCase):
+    def setUp(self):
+        _FakeServerTestCase.setUp(self)
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = RawCache(self.directory.name)
+        self.pastebin.raw_cache = self.cache
+
+    def tearDown(self):
+        _FakeServerTestCase.tearDown(self)
+        self.directory.cleanup()
+
+    def _objects(self):
+        return [name for _, _, files in
+                os.walk(os.path.join(self.directory.name, 'objects'))
+                for name in files]
+
+    def test_listed_paste_is_served_locally(self):
+        self.api.add_paste(b'x' * 5000, user_name='user')
+        self.pastebin.login(b'user', b'password')
+        paste, = self.pastebin.list_pastes(parse=True)
+        self.assertEqual(self.pastebin.fetch_raw(paste), b'x' * 5000)
+        self.assertEqual(self.pastebin.fetch_raw(paste), b'x' * 5000)
+        self.assertEqual(self.pastebin.fetch_raw(paste.paste_key),
+                         b'x' * 5000)
+        self.assertEqual(self.api.calls['raw'], 1)
+
+    def test_changed_size_is_a_miss(self):
+        self.api.add_paste(b'edited', user_name='user')
+        self.pastebin.login(b'user', b'password')
+        paste, = self.pastebin.list_pastes(parse=True)
+        self.cache.put(paste.paste_key, b'stale')
+        self.assertEqual(self.pastebin.fetch_raw(paste), b'edited')
+        self.assertEqual(self.api.calls['raw'], 1)
+        self.assertEqual(self.cache.get(paste.paste_key), b'edited')
+
+    def test_same_content_is_stored_once(self):
+        first = self.api.add_paste(b'shared content')
+        second = self.api.add_paste(b'shared content')
+        self.pastebin.fetch_raw(first)
+        self.pastebin.fetch_raw(second)
+        self.assertEqual(len(self._objects()), 1)
+        self.assertEqual(self.cache.get(second), b'shared content')
+
+    def test_abandoned_download_is_not_stored(self):
+        key = self.api.add_paste(b'y' * 100000)
+        chunks = self.pastebin.iter_raw(key, chunk_size=1000)
+        next(chunks)
+        chunks.close()
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(os.listdir(os.path.join(self.directory.name,
+                                                 'tmp')), [])
+        self.assertEqual(self.pastebin.fetch_raw(key), b'y' * 100000)
+        self.assertEqual(self.cache.get(key), b'y' * 100000)
+
+    def test_unstarted_download_leaves_nothing(self):
+        key = self.api.add_paste(b'y' * 100000)
+        chunks = self.pastebin.iter_raw(key, chunk_size=1000)
+        del chunks
+        gc.collect()
+        self.assertEqual(os.listdir(os.path.join(self.directory.name,
+                                                 'tmp')), [])
+        self.assertEqual(self.pastebin.transport.stats()['in_use'], 0)
+
+    def test_clear_removes_unfinished_downloads(self):
+        writer = self.cache.writer('key')
+        writer.write(b'partial')
+        self.cache.put('other', b'stored')
+        self.cache.clear()
+        self.assertEqual(os.listdir(os.path.join(self.directory.name,
+                                                 'tmp')), [])
+        writer.commit()
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(self.cache.get('other'))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = RawCache(self.directory.name, max_size=2500, memory_size=0)
+        for index, key in enumerate(('a', 'b', 'c')):
+            cache.put(key, bytes([index]) * 1000)
+            if key == 'b':
+                # touch a so that b is the oldest
+                time.sleep(0.01)
+                self.assertIsNotNone(cache.get('a'))
+                time.sleep(0.01)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(len(self._objects()), 2)
+
+    def test_eviction_leaves_headroom(self):
+        cache = RawCache(self.directory.name, max_size=10000, memory_size=0)
+        for index in range(11):
+            cache.put(str(index), bytes([index]) * 1000)
+        self.assertEqual(len(self._objects()), 9)
+        cache.put('11', bytes([11]) * 1000)
+        self.assertEqual(len(self._objects()), 10)
+
+    def test_shared_content_is_counted_once(self):
+        cache = RawCache(self.directory.name, max_size=2500, memory_size=0)
+        for index in range(51):
+            cache.put(str(index), b'x' * 1000)
+            self.assertEqual(cache._disk_used, 1000)
+        cache.put('other', b'y' * 1000)
+        self.assertEqual(cache._disk_used, 2000)
+        self.assertEqual(cache.get('0'), b'x' * 1000)
+        self.assertEqual(len(os.listdir(os.path.join(self.directory.name,
+                                                     'tmp'))), 0)
+
+    def test_memory_tier(self):
+        self.cache.put('key', b'in memory')
+        self.assertEqual(self.cache.get('key'), b'in memory')
+        for name in self._objects():
+            os.unlink(os.path.join(self.directory.name, 'objects',
+                                   name[:2], name))
+        self.assertEqual(self.cache.get('key'), b'in memory')
+        self.cache.discard('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_large_content_is_streamed_from_disk(self):
+        cache = RawCache(self.directory.name, memory_size=1024)
+        cache.put('key', [b'z' * 1000] * 3)
+        with cache.open('key') as content:
+            self.assertEqual(content.read(), b'z' * 3000)
+
+    def test_concurrent_readers(self):
+        contents = [bytes([index]) * 20000 for index in range(8)]
+        keys = [self.api.add_paste(content) for content in contents]
+        errors = []
+
+        def read():
+            cache = RawCache(self.directory.name, memory_size=0)
+            for _ in range(20):
+                for key, content in zip(keys, contents):
+                    data = cache.get(key)
+                    if data is not None and data != content:
+                        errors.append(key)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for key in keys:
+            self.pastebin.fetch_raw(key)
+        for reader in readers:
+            reader.join()
+        self.assertEqual(errors, [])
+        self.assertEqual([self.cache.get(key) for key in keys], contents)
+
+
+class SyncAccountTestCase(_FakeServerTestCase):
+    def setUp(self):
+        _FakeServerTestCase.setUp(self)
+        self.mirror = AccountMirror()
+        self.keys = [self.api.add_paste('print({})'.format(index),
+                                        user_name='user',
+                                        paste_format=('python' if index % 2
+                                                      else 'text'),
+                                        expire_date='1H' if index else 'N')
+                     for index in range(4)]
+        self.pastebin.login(b'user', b'password')
+
+    def tearDown(self):
+        self.mirror.close()
+        _FakeServerTestCase.tearDown(self)
+
+    def test_only_changes_are_applied(self):
+        summary = self.pastebin.sync_account(self.mirror)
+        self.assertEqual(sorted(summary.inserted), sorted(self.keys))
+        self.assertEqual(self.mirror.keys(), set(self.keys))
+        summary = self.pastebin.sync_account(self.mirror)
+        self.assertFalse(summary.changed)
+        self.assertEqual(summary.unchanged, 4)
+        new = self.api.add_paste('new', user_name='user')
+        self.pastebin.fetch_raw(self.keys[1])
+        self.pastebin.delete_paste(self.keys[2]).read()
+        summary = self.pastebin.sync_account(self.mirror)
+        self.assertEqual((summary.inserted, summary.updated, summary.deleted,
+                          summary.unchanged),
+                         ([new], [self.keys[1]], [self.keys[2]], 2))
+        self.assertEqual(self.mirror.get(self.keys[1]).paste_hits, 1)
+        self.assertNotIn(self.keys[2], self.mirror)
+
+    def test_mirrored_pastes_match_the_listing(self):
+        self.pastebin.sync_account(self.mirror)
+        listed = sorted(self.pastebin.list_pastes(results_limit=10,
+                                                  parse=True))
+        self.assertEqual([self.mirror.get(paste.paste_key)
+                          for paste in listed], listed)
+
+    def test_queries(self):
+        self.pastebin.sync_account(self.mirror)
+        python = self.mirror.query(paste_format='python')
+        self.assertEqual(sorted(paste.paste_key for paste in python),
+                         sorted(self.keys[1::2]))
+        self.assertEqual(len(self.mirror.query(limit=3)), 3)
+        self.assertEqual(self.mirror.expired(), [])
+        later = time.time() + 2 * 60 * 60
+        self.assertEqual(len(self.mirror.expired(now=later)), 3)
+        self.assertEqual(self.mirror.query(since=later), [])
+        with self.assertRaises(ValueError):
+            self.mirror.query(order_by='paste_key; DROP TABLE pastes')
+
+    def test_truncated_listing_deletes_nothing(self):
+        self.pastebin.sync_account(self.mirror)
+        summary = self.pastebin.sync_account(self.mirror, results_limit=2)
+        self.assertFalse(summary.complete)
+        self.assertEqual(summary.deleted, [])
+        self.assertEqual(len(self.mirror), 4)
+
+    def test_empty_account_and_errors(self):
+        self.pastebin.sync_account(self.mirror)
+        for key in self.keys:
+            self.pastebin.delete_paste(key).read()
+        self.assertEqual(len(self.pastebin.sync_account(self.mirror).deleted),
+                         4)
+        self.pastebin.user_key = 'unknown'
+        self.api.add_paste('kept', user_name='user')
+        with self.assertRaises(HTTPException):
+            self.pastebin.sync_account(self.mirror)
+        self.assertEqual(len(self.mirror), 0)
+
+    def test_shared_database_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'pastes.db')
+            with AccountMirror(path) as mirror:
+                self.pastebin.sync_account(mirror)
+            with AccountMirror(path) as mirror:
+                self.assertEqual(mirror.keys(), set(self.keys))
+                self.assertIsNotNone(mirror.synced_at)
+
+
+class SearchIndexTestCase(_FakeServerTestCase):
+    def setUp(self):
+        _FakeServerTestCase.setUp(self)
+        self.index = SearchIndex()
+        self.contents = {
+            self.api.add_paste(content, user_name='user') : content
+            for content in (
+                'Traceback: ConnectionError: connection refused',
+                'def connect():\n    return socket.create_connection()',
+                'the connection was refused, refused and refused again',
+                'caf\u00e9 cr\u00e8me br\u00fbl\u00e9e')}
+        self.pastebin.login(b'user', b'password')
+
+    def tearDown(self):
+        self.index.close()
+        _FakeServerTestCase.tearDown(self)
+
+    def _index(self, pastes):
+        results = list(self.pastebin.index_pastes(self.index, pastes,
+                                                  batch_size=3))
+        self.assertTrue(all(result.ok for result in results))
+        return sorted(result.item.paste_key for result in results
+                      if result.value)
+
+    def test_search_skips_vanished_documents(self):
+        self.index.add('a', 'connection refused')
+        self.index.add('b', 'connection refused again')
+        # as if another process removed b between the two reads
+        self.index._execute("DELETE FROM documents WHERE paste_key = 'b'")
+        self.assertEqual([hit.paste_key for hit in
+                          self.index.search('refused')], ['a'])
+
+    def test_index_listed_pastes(self):
+        pastes = self.pastebin.list_pastes(results_limit=10, parse=True)
+        self.assertEqual(self._index(pastes), sorted(self.contents))
+        self.assertEqual(self.index.keys(), set(self.contents))
+        self.assertEqual(self._index(pastes), [])
+        self.assertEqual(self.api.calls['raw'], 4)
+
+    def test_search(self):
+        self._index(self.pastebin.list_pastes(results_limit=10, parse=True))
+        hits = self.index.search('Refused connection')
+        keys = {content : key for key, content in self.contents.items()}
+        self.assertEqual(
+            [hit.paste_key for hit in hits],
+            [keys['the connection was refused, refused and refused again'],
+             keys['Traceback: ConnectionError: connection refused']])
+        self.assertEqual(hits[1].snippet,
+                         'Traceback: ConnectionError: connection refused')
+        self.assertEqual(len(self.index.search('connection', limit=1)), 1)
+        self.assertEqual(len(self.index.search('CR\u00c8ME')), 1)
+        self.assertEqual(self.index.search('refused nowhere'), [])
+        self.assertEqual(self.index.search('...'), [])
+
+    def test_snippet_is_around_the_match(self):
+        self.index.add('key', 'x ' * 500 + 'needle' + ' y' * 500)
+        hit, = self.index.search('needle', snippet_size=40)
+        self.assertTrue(hit.snippet.startswith('...'))
+        self.assertTrue(hit.snippet.endswith('...'))
+        self.assertIn('needle', hit.snippet)
+
+    def test_changed_content_is_reindexed(self):
+        self.assertTrue(self.index.add('key', 'first words'))
+        self.assertFalse(self.index.add('key', 'first words'))
+        self.assertTrue(self.index.add('key', 'second words'))
+        self.assertEqual(self.index.search('first'), [])
+        self.assertEqual(len(self.index.search('words')), 1)
+        self.assertTrue(self.index.remove('key'))
+        self.assertFalse(self.index.remove('key'))
+        self.assertEqual(self.index.search('words'), [])
+
+    def test_prune_and_persistence(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'search.db')
+            with SearchIndex(path) as index:
+                for key, content in self.contents.items():
+                    index.add(key, content)
+                kept = sorted(self.contents)[:2]
+                self.assertEqual(index.prune(kept), 2)
+            with SearchIndex(path) as index:
+                self.assertEqual(index.keys(), set(kept))
+                for key, content in self.contents.items():
+                    keys = [hit.paste_key for hit in index.search(content)]
+                    self.assertEqual(keys, [key] if key in kept else [])
+
+
+class CreateLoggedInPasteTestCase(_FakeServerTestCase):
+    def test_requires_login(self):
+        with self.assertRaises(AttributeError):
+            self.pastebin.create_logged_in_paste(b'x')
+
+    def test_paste_is_listed(self):
+        self.pastebin.login(b'user', b'password')
+        self.pastebin.create_logged_in_paste(b'x', paste_name=b'mine',
+                                             paste_private=2).read()
+        pastes = self.pastebin.list_pastes(parse=True)
+        self.assertEqual([paste.paste_title for paste in pastes], ['mine'])
+        self.assertIs(pastes[0].paste_private, PastePrivacy.PRIVATE)
+
+class BatchTestCase(TestCase):
+    @staticmethod
+    def _work(item):
+        time.sleep(0.01 * (5 - item))
+        if item == 2:
+            raise ValueError(item)
+        return item * 10
+
+    def test_ordered_results(self):
+        results = list(run_batch(self._work, range(5), max_concurrency=3,
+                                 ordered=True))
+        self.assertEqual([r.index for r in results], [0, 1, 2, 3, 4])
+        self.assertEqual([r.value for r in results], [0, 10, None, 30, 40])
+
+    def test_failures_do_not_abort_batch(self):
+        results = list(run_batch(self._work, range(5), max_concurrency=5))
+        self.assertEqual(len(results), 5)
+        failed = [r for r in results if not r.ok]
+        self.assertEqual(len(failed), 1)
+        self.assertIsInstance(failed[0].error, ValueError)
+        self.assertEqual(failed[0].item, 2)
+
+    def test_completion_order(self):
+        results = list(run_batch(self._work, range(5), max_concurrency=5))
+        self.assertEqual(results[0].index, 4)
+
 
 class ListPastesTestCase(TestCase):
-    pass
+    def test_parse(self):
+        pastes = PastebinPasteListParser().get_pastes(_paste_list(3))
+        self.assertEqual([p.paste_key for p in pastes],
+                         ['k0000000', 'k0000001', 'k0000002'])
+        self.assertEqual(pastes[2].paste_title, 'caf\u00e9 k0000002')
+
+    def test_empty_and_unknown_fields_do_not_misalign(self):
+        data = _paste_list(3).replace(
+            '<paste_title>caf\u00e9 k0000001</paste_title>',
+            '<paste_title></paste_title><paste_new>x</paste_new>')
+        pastes = PastebinPasteListParser().get_pastes(data)
+        self.assertIsNone(pastes[1].paste_title)
+        self.assertEqual([p.paste_url for p in pastes],
+                         ['https://pastebin.com/k000000{}'.format(i)
+                          for i in range(3)])
+
+    def test_streaming_parse_matches(self):
+        body = bytes(_paste_list(5), encoding='utf-8')
+        parser = PastebinPasteListParser()
+        streamed = []
+        for i in range(0, len(body), 7):
+            streamed.extend(parser.feed_pastes(body[i:i + 7]))
+        streamed.extend(parser.close_pastes())
+        expected = PastebinPasteListParser().get_pastes(_paste_list(5))
+        self.assertEqual([repr(p) for p in streamed],
+                         [repr(p) for p in expected])
+
+    def test_streaming_yields_early(self):
+        parser = PastebinPasteListParser()
+        first = _PASTE_XML.format(key='first', size=1)
+        self.assertEqual(len(parser.feed_pastes(first)), 1)
+        self.assertEqual(parser.feed_pastes('<paste>\r\n<paste_key>x'), [])
+
+    def test_list_pastes_from_server(self):
+        with FakePastebinServer() as server:
+            for number in range(3):
+                server.api.add_paste('x' * number, user_name='user')
+            server.api.add_paste('other', user_name='someone')
+            with Pastebin(server.api.dev_key,
+                          base_url=server.url) as pastebin:
+                pastebin.login(b'user', b'password')
+                streamed = list(pastebin.list_pastes(results_limit=10,
+                                                     parse=True,
+                                                     stream=True))
+        self.assertEqual(sorted(paste.paste_size for paste in streamed),
+                         [0, 1, 2])
+
+
+class ListTrendingPastesTestCase(_FakeServerTestCase):
+    def test_top_public_pastes_by_hits(self):
+        for hits in range(20):
+            self.api.add_paste('x', hits=hits)
+        self.api.add_paste('x', private=1, hits=100)
+        pastes = self.pastebin.list_trending_pastes(parse=True)
+        self.assertEqual([paste.paste_hits for paste in pastes],
+                         list(range(19, 1, -1)))
+
+    def test_cache_avoids_requests(self):
+        self.api.add_paste('x')
+        self.pastebin.trending_cache = ResponseCache(ttl=60)
+        first = self.pastebin.list_trending_pastes(parse=True)
+        second = self.pastebin.list_trending_pastes(parse=True, stream=True)
+        self.assertEqual(first, list(second))
+        self.assertEqual(self.api.calls['trends'], 1)
+
+    def test_unfinished_stream_releases_connection(self):
+        for _ in range(18):
+            self.api.add_paste('x', title='t' * 1000)
+        pastes = self.pastebin.list_trending_pastes(parse=True, stream=True)
+        next(pastes)
+        pastes.close()
+        self.assertEqual(self.pastebin.transport.stats()['in_use'], 0)
+        pastes = self.pastebin.list_trending_pastes(parse=True, stream=True)
+        del pastes
+        gc.collect()
+        self.assertEqual(self.pastebin.transport.stats()['in_use'], 0)
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def _loader(self, delay=0.0):
+        def load():
+            self.calls += 1
+            time.sleep(delay)
+            return self.calls
+        return load
+
+    def test_fresh_value_is_reused(self):
+        cache = ResponseCache(ttl=60)
+        self.assertEqual(cache.get('k', self._loader()), 1)
+        self.assertEqual(cache.get('k', self._loader()), 1)
+        self.assertEqual(cache.get('other', self._loader()), 2)
+
+    def test_expired_value_is_reloaded(self):
+        cache = ResponseCache(ttl=0)
+        cache.get('k', self._loader())
+        self.assertEqual(cache.get('k', self._loader()), 2)
+
+    def test_single_flight(self):
+        cache = ResponseCache(ttl=60)
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(cache.get('k',
+                                                    self._loader(0.05))))
+                   for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [1] * 50)
+
+    def test_stale_while_revalidate(self):
+        cache = ResponseCache(ttl=0, stale_ttl=60)
+        cache.get('k', self._loader())
+        self.assertEqual(cache.get('k', self._loader(0.05)), 1)
+        time.sleep(0.1)
+        self.assertEqual(self.calls, 2)
+
+    def test_errors_reach_caller_and_are_not_cached(self):
+        cache = ResponseCache(ttl=60)
+
+        def fail():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            cache.get('k', fail)
+        self.assertEqual(cache.get('k', self._loader()), 1)
+
+    def test_invalidate(self):
+        cache = ResponseCache(ttl=60)
+        cache.get('k', self._loader())
+        cache.invalidate('k')
+        self.assertEqual(cache.get('k', self._loader()), 2)
+
+class DeletePasteTestCase(_FakeServerTestCase):
+    def setUp(self):
+        _FakeServerTestCase.setUp(self)
+        self.pastebin.login(b'user', b'password')
+
+    def test_delete_paste(self):
+        paste_key = self.api.add_paste('x', user_name='user')
+        self.assertEqual(self.pastebin.delete_paste(paste_key).read(),
+                         b'Paste Removed')
+        self.assertEqual(self.pastebin.list_pastes().read(),
+                         b'No pastes found.')
+
+    def test_delete_pastes(self):
+        mine = [self.api.add_paste('x', user_name='user') for _ in range(5)]
+        other = self.api.add_paste('x', user_name='someone')
+        summary = self.pastebin.delete_pastes(mine + [other])
+        self.assertEqual(sorted(summary.deleted), sorted(mine))
+        self.assertEqual(list(summary.failed), [other])
+        self.assertFalse(summary.ok)
+
+    def _timed_delete(self, count, rate):
+        keys = [self.api.add_paste('x', user_name='user')
+                for _ in range(count)]
+        start = time.monotonic()
+        summary = self.pastebin.delete_pastes(keys, rate=rate)
+        self.assertEqual(sorted(summary.deleted), sorted(keys))
+        return time.monotonic() - start
+
+    def test_delete_pastes_rate(self):
+        # a burst of 20, then 5 more at 20 per second
+        self.assertGreaterEqual(self._timed_delete(25, 20), 0.24)
+
+    def test_delete_pastes_rate_and_rate_limiter(self):
+        self.pastebin.rate_limiter = RateLimiter({'delete' : 20})
+        # the slower rate limiter governs
+        self.assertGreaterEqual(self._timed_delete(25, 1000), 0.24)
+        self.pastebin.rate_limiter = RateLimiter({'delete' : 1000})
+        self.assertGreaterEqual(self._timed_delete(25, 20), 0.24)
+
+
+class TokenBucketTestCase(TestCase):
+    def test_burst_is_free(self):
+        bucket = TokenBucket(10, capacity=3)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+
+    def test_debt_is_paid_in_order(self):
+        bucket = TokenBucket(10, capacity=1)
+        bucket.reserve()
+        first, second = bucket.reserve(), bucket.reserve()
+        self.assertAlmostEqual(first, 0.1, places=2)
+        self.assertAlmostEqual(second, 0.2, places=2)
+
+    def test_acquire_blocks(self):
+        bucket = TokenBucket(50, capacity=1)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+class RateLimiterTestCase(TestCase):
+    def test_unlisted_option_is_unlimited(self):
+        limiter = RateLimiter({'paste': (1, 1)})
+        for _ in range(5):
+            self.assertEqual(limiter.reserve('list', b'dev'), 0)
+
+    def test_buckets_per_key_and_option(self):
+        limiter = RateLimiter({'paste': (1, 1), 'delete': (1, 1)})
+        self.assertEqual(limiter.reserve('paste', b'dev'), 0)
+        self.assertEqual(limiter.reserve('delete', b'dev'), 0)
+        self.assertEqual(limiter.reserve('paste', b'other'), 0)
+        self.assertGreater(limiter.reserve('paste', b'dev'), 0)
+
+    def test_user_key_bucket_applies(self):
+        limiter = RateLimiter(default=(1, 1))
+        limiter.reserve('list', b'dev-a', b'user')
+        self.assertGreater(limiter.reserve('list', b'dev-b', b'user'), 0)
+
+    def test_acquire_async(self):
+        limiter = RateLimiter(default=(50, 1))
+
+        async def run():
+            start = time.monotonic()
+            await asyncio.gather(*[limiter.acquire_async('paste', b'dev')
+                                   for _ in range(6)])
+            return time.monotonic() - start
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertGreaterEqual(loop.run_until_complete(run()), 0.09)
+        finally:
+            loop.close()
+
+class GetUserInformationTestCase(_FakeServerTestCase):
+    def test_parse(self):
+        self.pastebin.login(b'user', b'password')
+        user = self.pastebin.get_user_information(parse=True)
+        self.assertEqual(user.user_email, 'user@example.com')
+        self.assertIs(user.user_private, PastePrivacy.UNLISTED)
+        self.assertEqual(user.user_account_type, 0)
+
+    def test_cache_per_user_key(self):
+        self.pastebin.user_cache = ResponseCache(ttl=60)
+        self.pastebin.login(b'user', b'password')
+        for _ in range(3):
+            self.pastebin.get_user_information(parse=True)
+        self.assertEqual(self.api.calls['userdetails'], 1)
+        self.pastebin.invalidate_user_information()
+        self.pastebin.get_user_information(parse=True)
+        self.assertEqual(self.api.calls['userdetails'], 2)
+
+    def test_cache_invalidated_on_login(self):
+        self.pastebin.user_cache = ResponseCache(ttl=60)
+        self.pastebin.login(b'user', b'password')
+        self.pastebin.get_user_information(parse=True)
+        self.pastebin.get_user_information(parse=True)
+        self.assertEqual(self.api.calls['userdetails'], 1)
+        self.api.expire_user_key('user')
+        self.pastebin.login(b'user', b'password')
+        user = self.pastebin.get_user_information(parse=True)
+        self.assertEqual(self.api.calls['userdetails'], 2)
+        self.assertEqual(user.user_name, 'user')
+
+
+class _DictPaste:
+    def __init__(self, *values):
+        for name, value in zip(PastebinPaste.__slots__, values):
+            setattr(self, name, value)
+
+
+class RecordTestCase(TestCase):
+    def _paste(self, key='abc', hits='1'):
+        return PastebinPaste(key, '1338651990', 'title', '15', '0', '0',
+                             'None', 'text', 'https://pastebin.com/' + key,
+                             hits)
+
+    def test_immutable(self):
+        paste = self._paste()
+        with self.assertRaises(AttributeError):
+            paste.paste_hits = '2'
+        with self.assertRaises(AttributeError):
+            del paste.paste_key
+        with self.assertRaises(AttributeError):
+            PastebinUser(user_name='me').user_name = 'you'
+
+    def test_hash_and_equality(self):
+        self.assertEqual(self._paste(), self._paste())
+        self.assertNotEqual(self._paste(hits='1'), self._paste(hits='2'))
+        self.assertEqual(hash(self._paste(hits='1')),
+                         hash(self._paste(hits='2')))
+        self.assertEqual(len({self._paste(), self._paste()}), 1)
+        self.assertEqual(hash(PastebinUser(user_name='me')), hash('me'))
+
+    def test_ordering(self):
+        pastes = [self._paste(key) for key in ('c', 'a', 'b')]
+        self.assertEqual([p.paste_key for p in sorted(pastes)],
+                         ['a', 'b', 'c'])
+
+    def test_repr_and_pickle(self):
+        paste = self._paste()
+        self.assertTrue(repr(paste).startswith('PastebinPaste(abc, '))
+        self.assertEqual(pickle.loads(pickle.dumps(paste)), paste)
+
+    def test_typed_fields(self):
+        paste = PastebinPasteListParser().get_pastes(_paste_list(3))[2]
+        self.assertEqual(paste.paste_size, 2)
+        self.assertEqual(paste.paste_hits, 2)
+        self.assertIs(paste.paste_private, PastePrivacy.UNLISTED)
+        self.assertIsNone(paste.paste_expire_date)
+        self.assertEqual(paste.paste_date,
+                         datetime(2012, 6, 2, 15, 46, 30,
+                                  tzinfo=timezone.utc))
+        user = PastebinUser(user_private='2', user_account_type='1')
+        self.assertIs(user.user_private, PastePrivacy.PRIVATE)
+        self.assertEqual(user.user_account_type, 1)
+
+    def test_dates_are_converted_lazily_once(self):
+        paste = self._paste()
+        self.assertEqual(paste._paste_date, '1338651990')
+        first = paste.paste_date
+        self.assertIsInstance(paste._paste_date, datetime)
+        self.assertIs(paste.paste_date, first)
 
-class ListTrendingPastesTestCase(TestCase):
-    pass
+    def test_memory(self):
+        values = ['abc', '1338651990', 'title', '15', '0', '0', 'None',
+                  'text', 'https://pastebin.com/abc', '1']
 
-class DeletePasteTestCase(TestCase):
-    pass
+        def measure(factory, count=10000):
+            tracemalloc.start()
+            try:
+                records = [factory(*values) for _ in range(count)]
+                size, _ = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            del records
+            return size / count
 
-class GetUserInformationTestCase(TestCase):
-    pass
+        slotted = measure(PastebinPaste)
+        with_dict = measure(_DictPaste)
+        self.assertFalse(hasattr(self._paste(), '__dict__'))
+        self.assertLess(slotted * 1.25, with_dict)
 
 
 tests = [
-    RequestTestCase, LoginTestCase, CreatePasteTestCase,
-    CreateLoggedInPasteTestCase, ListPastesTestCase,
-    ListTrendingPastesTestCase, DeletePasteTestCase,
-    GetUserInformationTestCase
+    RequestTestCase, RetryPolicyTestCase, ConnectionPoolTestCase,
+    DroppedConnectionTestCase, StaleConnectionTestCase,
+    UrllibTransportTestCase, MemoryTransportTestCase, CompressionTestCase,
+    AsyncConnectionPoolTestCase, AsyncChunkedResponseTestCase,
+    AsyncPastebinTestCase, FakeServerTestCase, HooksTestCase, MetricsTestCase,
+    LoginTestCase, SessionStoreTestCase, CreatePasteTestCase, DedupeTestCase,
+    StreamingUploadTestCase, RawPasteTestCase, RawCacheTestCase,
+    SyncAccountTestCase, SearchIndexTestCase, CreateLoggedInPasteTestCase,
+    BatchTestCase, ListPastesTestCase, ListTrendingPastesTestCase,
+    ResponseCacheTestCase, DeletePasteTestCase, TokenBucketTestCase,
+    RateLimiterTestCase, GetUserInformationTestCase, RecordTestCase
 ]
 
 